@@ -1,21 +1,22 @@
 import streamlit as st
 import json
-import zipfile
 import os
-import tempfile
-import base64
-import re
-from io import BytesIO
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-import fitz  # PyMuPDF
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import Color
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PyPDF2 import PdfWriter, PdfReader
-import plotly.graph_objects as go
 import copy
+import time
+import uuid
+from contextlib import closing
+# PyMuPDF, plotly, reportlab and PyPDF2 are imported where they are first
+# used, so a cold start only loads what the first page needs
+from handwriting_tool.archive import COMPRESSION_OPTIONS, DEFAULT_COMPRESSION, StreamingZip
+from handwriting_tool.backends import BACKENDS, DEFAULT_BACKEND, template_page_count
+from handwriting_tool.batch import default_workers, generate_batch
+from handwriting_tool.cache import get_render_cache
+from handwriting_tool.index import CaseSelection
+from handwriting_tool.jobs import CANCELLED as JOB_CANCELLED, FAILED as JOB_FAILED, get_job_runner
+from handwriting_tool.metrics import RunMetrics, to_json, to_prometheus
+from handwriting_tool.preview import DEFAULT_PREVIEW_FORMAT, PREVIEW_FORMATS, encode_background
+from handwriting_tool.specs import DEFAULT_SPECS
+from handwriting_tool.resources import page_raster, shared_case_index, shared_case_store, shared_file
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -31,39 +32,25 @@ st.set_page_config(
 INPUT_FOLDER = os.path.join(os.path.dirname(__file__), "input") if os.path.exists(os.path.join(os.path.dirname(__file__), "input")) else "input"
 PDF_FILE = "empty_form.pdf"
 CASES_FILE = "cases_data.json"
+CASES_JSONL_FILE = "cases_data.jsonl"  # Used when there is no CASES_FILE
 FONT_FILE = "AzzamHandwriting-Regular.ttf"
 
-# Default field specifications with UPDATED PAGE 2 FONT SIZES
-DEFAULT_SPECS = {
-    "page1": {
-        # PAGE 1 FONT SIZES UNCHANGED AS REQUESTED
-        "date": {"x": 1.5, "y": 2.6, "w": 2.5, "h": 0.25, "font": 20},
-        "age_gender": {"x": 2.2, "y": 3.0, "w": 3.0, "h": 0.25, "font": 16.1},
-        "main_theme": {"x": 1.2, "y": 3.6, "w": 6.5, "h": 0.4, "font": 21},
-        "case_summary": {"x": 0.8, "y": 4.3, "w": 7.0, "h": 1.5, "font": 18},
-        "self_reflection_upper": {"x": 0.8, "y": 6.2, "w": 7.0, "h": 0.6, "font": 15},
-        "self_reflection_lower": {"x": 0.8, "y": 7.0, "w": 7.0, "h": 1.0, "font": 15},
-        "signature_mi": {"x": 0.8, "y": 9.8, "w": 3.0, "h": 0.3, "font": 24}
-    },
-    "page2": {
-        # UPDATED PAGE 2 FONT SIZES AS SPECIFIED
-        "epa_row1": {"x": 0.6, "y": 1.8, "w": 1.8, "h": 0.35, "font": 32},
-        "epa_row2": {"x": 0.6, "y": 2.4, "w": 1.8, "h": 0.35, "font": 32},
-        "epa_row3": {"x": 0.6, "y": 3.0, "w": 1.8, "h": 0.35, "font": 32},
-        "epa_row4": {"x": 0.6, "y": 3.6, "w": 1.8, "h": 0.35, "font": 32},
-        "rubric_row1": {"x": 2.5, "y": 1.8, "w": 1.5, "h": 0.35, "font": 24},
-        "rubric_row2": {"x": 2.5, "y": 2.4, "w": 1.5, "h": 0.35, "font": 24},
-        "rubric_row3": {"x": 2.5, "y": 3.0, "w": 1.5, "h": 0.35, "font": 24},
-        "rubric_row4": {"x": 2.5, "y": 3.6, "w": 1.5, "h": 0.35, "font": 24},
-        "strength_row1": {"x": 4.1, "y": 1.8, "w": 1.8, "h": 0.35, "font": 16},
-        "strength_row2": {"x": 4.1, "y": 2.4, "w": 1.8, "h": 0.35, "font": 16},
-        "strength_row3": {"x": 4.1, "y": 3.0, "w": 1.8, "h": 0.35, "font": 16},
-        "strength_row4": {"x": 4.1, "y": 3.6, "w": 1.8, "h": 0.35, "font": 16},
-        "improve_row1": {"x": 6.0, "y": 1.8, "w": 1.8, "h": 0.35, "font": 16},
-        "improve_row2": {"x": 6.0, "y": 2.4, "w": 1.8, "h": 0.35, "font": 16},
-        "improve_row3": {"x": 6.0, "y": 3.0, "w": 1.8, "h": 0.35, "font": 16},
-        "improve_row4": {"x": 6.0, "y": 3.6, "w": 1.8, "h": 0.35, "font": 16}
-    }
+# Resolution the template pages are rasterized at for the preview
+PREVIEW_DPI = 150
+
+# Issues listed by "Check Fit"; the counts cover all of them
+FIT_CHECK_ROWS = 500
+
+# Rows per page of the case browser table
+BROWSER_PAGE_SIZES = [25, 50, 100]
+
+# Seconds between progress refreshes of a running generation job
+JOB_POLL_SECONDS = 1.0
+
+# Batch output formats offered next to "Generate All PDFs"
+OUTPUT_MODES = {
+    "zip": "ZIP - one PDF per case",
+    "combined": "Single PDF - all cases, bookmarked"
 }
 
 def initialize_session_state():
@@ -83,12 +70,20 @@ def initialize_session_state():
     
     # Initialize other session state variables
     for key, default in [
-        ('pdf_images', {}),
         ('current_page', 1),
         ('selected_field', None),
         ('data_loaded', False),
         ('cases_data', []),
+        ('cases_count', 0),
+        ('case_subset', None),
+        ('last_run_metrics', None),
+        ('generation_job_id', None),
+        ('generation_job_ids', []),
+        ('generation_job_shown', None),
+        # Groups this session's jobs so other sessions' runs cannot evict its downloads
+        ('generation_owner', uuid.uuid4().hex),
         ('pdf_bytes', None),
+        ('template_digest', None),
         ('font_bytes', None),
         ('loading_error', None),
         ('show_success_message', None),
@@ -102,7 +97,7 @@ def positions_differ(pos1, pos2):
     for key in ['x', 'y', 'w', 'h']:
         if abs(pos1[key] - pos2[key]) > 0.001:
             return True
-    return False
+    return pos1.get('fit', False) != pos2.get('fit', False)
 
 def check_for_changes(page_key):
     """Check if working positions differ from saved for a specific page"""
@@ -136,108 +131,20 @@ def reset_all_positions():
     st.session_state.has_unsaved_changes = {"page1": False, "page2": False}
     st.session_state.show_success_message = "All positions reset to defaults!"
 
-def inches_to_pixels(inches, dpi=150):
+def inches_to_pixels(inches, dpi=PREVIEW_DPI):
     return int(inches * dpi)
 
-@st.cache_data
-def load_pdf_as_images(pdf_bytes):
-    """Convert PDF to images for display"""
-    images = {}
-    try:
-        pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        dpi = 150
-        
-        for page_num in range(min(2, len(pdf_doc))):
-            page = pdf_doc.load_page(page_num)
-            mat = fitz.Matrix(dpi/72, dpi/72)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("ppm")
-            img = Image.open(BytesIO(img_data))
-            images[page_num + 1] = np.array(img)
-        
-        pdf_doc.close()
-        return images
-    except Exception as e:
-        st.error(f"Error converting PDF to images: {str(e)}")
-        return {}
+def load_page_image(template_digest, page_num, dpi, pdf_bytes):
+    """Template page raster for the preview, shared by all sessions
 
-def transform_case_format(original_case):
-    """Transform case from user's format to expected format"""
-    transformed = {}
-    
-    if 'Date' in original_case:
-        transformed['date'] = original_case['Date']
-    
-    if 'Age & Gender' in original_case:
-        transformed['age_gender'] = original_case['Age & Gender']
-        age_gender = original_case['Age & Gender']
-        age_match = re.search(r'(\d+)', age_gender)
-        if age_match:
-            transformed['age'] = age_match.group(1)
-        
-        gender_lower = age_gender.lower()
-        if 'male' in gender_lower and 'female' not in gender_lower:
-            transformed['gender'] = 'Male'
-        elif 'female' in gender_lower:
-            transformed['gender'] = 'Female'
-        elif 'non-binary' in gender_lower or 'nonbinary' in gender_lower:
-            transformed['gender'] = 'Non-binary'
-        else:
-            transformed['gender'] = ''
-    
-    field_mappings = {
-        'Main theme of the case': 'main_theme',
-        'Case Summary': 'case_summary',
-        'Signature of the MI': 'signature_mi'
-    }
-    
-    for old_key, new_key in field_mappings.items():
-        if old_key in original_case:
-            transformed[new_key] = original_case[old_key]
-    
-    if 'Self Reflection' in original_case:
-        reflection_text = original_case['Self Reflection']
-        transformed['self_reflection'] = {}
-        
-        if 'Did well:' in reflection_text:
-            parts = reflection_text.split('Needs work:')
-            if len(parts) >= 1:
-                did_well = parts[0].replace('Did well:', '').strip()
-                if 'Plan:' in did_well:
-                    did_well = did_well.split('Plan:')[0].strip()
-                transformed['self_reflection']['what_did_right'] = did_well
-            
-            if len(parts) >= 2:
-                needs_work = parts[1].strip()
-                transformed['self_reflection']['needs_development'] = needs_work
-        else:
-            transformed['self_reflection']['what_did_right'] = reflection_text
-            transformed['self_reflection']['needs_development'] = ''
-    
-    transformed['epa_assessment'] = {}
-    
-    if 'EPA tested' in original_case:
-        epas = original_case['EPA tested']
-        if isinstance(epas, list):
-            transformed['epa_assessment']['epa_tested'] = [f"EPA {epa}" if isinstance(epa, (int, float)) else str(epa) for epa in epas]
-        else:
-            transformed['epa_assessment']['epa_tested'] = []
-    
-    if 'Rubric' in original_case:
-        transformed['epa_assessment']['rubric_levels'] = original_case['Rubric'] if isinstance(original_case['Rubric'], list) else []
-    
-    if 'Strength points' in original_case:
-        transformed['epa_assessment']['strength_points'] = original_case['Strength points'] if isinstance(original_case['Strength points'], list) else []
-    
-    if 'Points needing improvement' in original_case:
-        transformed['epa_assessment']['points_needing_improvement'] = original_case['Points needing improvement'] if isinstance(original_case['Points needing improvement'], list) else []
-    
-    if 'case_id' not in transformed:
-        date_part = transformed.get('date', '').replace('-', '')
-        theme_part = transformed.get('main_theme', 'case')[:20].replace(' ', '_').replace('/', '_')
-        transformed['case_id'] = f"case_{date_part}_{theme_part}" if date_part else f"case_{theme_part}"
-    
-    return transformed
+    Pages are only rasterized when first previewed, then memory-mapped from
+    the raster directory. Returns a read-only (height, width, 3) array, or
+    None when the page cannot be rendered.
+    """
+    try:
+        return page_raster(pdf_bytes, page_num, dpi, template_digest)
+    except Exception:
+        return None
 
 def load_input_data():
     """Load all required data from the input folder"""
@@ -253,64 +160,38 @@ def load_input_data():
         errors.append(f"• Missing: {PDF_FILE}")
     else:
         try:
-            with open(pdf_path, 'rb') as f:
-                st.session_state.pdf_bytes = f.read()
-            st.session_state.pdf_images = load_pdf_as_images(st.session_state.pdf_bytes)
-            if not st.session_state.pdf_images:
-                errors.append(f"• Could not process: {PDF_FILE}")
+            # One bytes object per distinct file for every session; rasterized page by page when first previewed
+            pdf_file = shared_file(pdf_path)
+            st.session_state.pdf_bytes = pdf_file.data
+            st.session_state.template_digest = pdf_file.digest
         except Exception as e:
             errors.append(f"• Error loading {PDF_FILE}: {str(e)}")
     
-    # Load cases
+    # Load cases - read once per file content into a columnar store shared by every session
+    cases_file = CASES_FILE
     cases_path = os.path.join(INPUT_FOLDER, CASES_FILE)
+    if not os.path.exists(cases_path) and os.path.exists(os.path.join(INPUT_FOLDER, CASES_JSONL_FILE)):
+        cases_file = CASES_JSONL_FILE
+        cases_path = os.path.join(INPUT_FOLDER, CASES_JSONL_FILE)
+    
     if not os.path.exists(cases_path):
         errors.append(f"• Missing: {CASES_FILE}")
     else:
         try:
-            with open(cases_path, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
-            
-            if isinstance(loaded_data, dict) and 'cases' in loaded_data:
-                cases_array = loaded_data['cases']
-                if isinstance(cases_array, list):
-                    valid_cases = []
-                    for i, case in enumerate(cases_array):
-                        if isinstance(case, dict):
-                            try:
-                                transformed_case = transform_case_format(case)
-                                valid_cases.append(transformed_case)
-                            except Exception as e:
-                                errors.append(f"• Case {i+1} transformation error: {str(e)}")
-                    st.session_state.cases_data = valid_cases
-                else:
-                    errors.append(f"• 'cases' property is not an array")
-                    st.session_state.cases_data = []
-            elif isinstance(loaded_data, list):
-                valid_cases = []
-                for i, case in enumerate(loaded_data):
-                    if isinstance(case, dict):
-                        if 'Date' in case or 'Age & Gender' in case:
-                            try:
-                                transformed_case = transform_case_format(case)
-                                valid_cases.append(transformed_case)
-                            except Exception as e:
-                                errors.append(f"• Case {i+1} transformation error: {str(e)}")
-                        else:
-                            valid_cases.append(case)
-                st.session_state.cases_data = valid_cases
-            else:
-                errors.append(f"• {CASES_FILE} must contain JSON array or object with 'cases' array")
-                st.session_state.cases_data = []
+            cases = shared_case_store(cases_path)
+            errors.extend(f"• {err}" for err in cases.errors)
+            st.session_state.cases_data = cases
+            st.session_state.cases_count = len(cases)
         except Exception as e:
-            errors.append(f"• Error loading {CASES_FILE}: {str(e)}")
+            errors.append(f"• Error loading {cases_file}: {str(e)}")
             st.session_state.cases_data = []
+            st.session_state.cases_count = 0
     
     # Load font
     font_path = os.path.join(INPUT_FOLDER, FONT_FILE)
     if os.path.exists(font_path):
         try:
-            with open(font_path, 'rb') as f:
-                st.session_state.font_bytes = f.read()
+            st.session_state.font_bytes = shared_file(font_path).data
         except:
             pass
     
@@ -322,25 +203,33 @@ def load_input_data():
     st.session_state.loading_error = None
     return True
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_preview_background(template_digest, page_num, dpi, preview_format, _img):
+    """Encoded page background, built once per template page, DPI and format for all sessions"""
+    return encode_background(_img, preview_format)
+
 def create_visual_preview(page_num):
     """Create visual preview with field positions"""
-    if page_num not in st.session_state.pdf_images:
-        return None
+    import plotly.graph_objects as go
     
-    img = st.session_state.pdf_images[page_num]
+    img = load_page_image(st.session_state.template_digest, page_num, PREVIEW_DPI, st.session_state.pdf_bytes)
+    if img is None:
+        return None
     img_height, img_width = img.shape[:2]
     
-    img_pil = Image.fromarray(img)
-    buffer = BytesIO()
-    img_pil.save(buffer, format='PNG')
-    img_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
-    fig = go.Figure()
+    # Only the field rectangles below are rebuilt on each rerun
+    background = get_preview_background(
+        st.session_state.template_digest,
+        page_num,
+        PREVIEW_DPI,
+        st.session_state.get("preview_format", DEFAULT_PREVIEW_FORMAT),
+        img
+    )
     
     # Add PDF image as background
-    fig.add_layout_image(
+    images = [
         dict(
-            source=f"data:image/png;base64,{img_base64}",
+            source=background,
             xref="x", yref="y",
             x=0, y=img_height,
             sizex=img_width, sizey=img_height,
@@ -348,7 +237,9 @@ def create_visual_preview(page_num):
             opacity=1.0,
             layer="below"
         )
-    )
+    ]
+    shapes = []
+    annotations = []
     
     page_key = f"page{page_num}"
     colors = ['red', 'blue', 'green', 'orange', 'purple', 'brown', 'pink', 'gray', 'olive', 'cyan',
@@ -373,7 +264,7 @@ def create_visual_preview(page_num):
             line_width = 2
         
         # Add rectangle shape
-        fig.add_shape(
+        shapes.append(dict(
             type="rect",
             x0=x_px, y0=y_px,
             x1=x_px + w_px, y1=y_px + h_px,
@@ -381,10 +272,10 @@ def create_visual_preview(page_num):
             fillcolor=color,
             opacity=opacity,
             layer="above"
-        )
+        ))
         
         # Add field label
-        fig.add_annotation(
+        annotations.append(dict(
             x=x_px + w_px/2,
             y=y_px + h_px/2,
             text=f"<b>{field_name}</b><br>Font: {spec['font']}pt",
@@ -392,11 +283,13 @@ def create_visual_preview(page_num):
             font=dict(size=9, color="white" if field_name == st.session_state.selected_field else "black"),
             bgcolor="rgba(0,0,0,0.7)" if field_name == st.session_state.selected_field else "rgba(255,255,255,0.7)",
             opacity=0.9
-        )
+        ))
     
     # Status indicator
     status = "⚠️ UNSAVED" if st.session_state.has_unsaved_changes[page_key] else "✅ SAVED"
     
+    # Built in one go: adding shapes one by one re-validates the whole layout each time
+    fig = go.Figure(layout=dict(images=images, shapes=shapes, annotations=annotations))
     fig.update_layout(
         title=dict(
             text=f"📄 Page {page_num} Preview - {status}<br>" +
@@ -429,164 +322,574 @@ def create_visual_preview(page_num):
     
     return fig
 
-def create_filled_pdf(case_data, pdf_bytes, font_bytes=None):
-    """Create filled PDF using PERMANENT saved positions with updated font sizes"""
-    try:
-        if not isinstance(case_data, dict):
-            return None
-            
-        overlay_buffer = BytesIO()
-        
-        original = PdfReader(BytesIO(pdf_bytes))
-        first_page = original.pages[0]
-        page_width = float(first_page.mediabox.width)
-        page_height = float(first_page.mediabox.height)
-        
-        c = canvas.Canvas(overlay_buffer, pagesize=(page_width, page_height))
-        
-        # Setup font
-        font_color = Color(0.102, 0.227, 0.486)
-        font_name = 'Helvetica'
-        
-        if font_bytes:
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.ttf') as tmp_font:
-                    tmp_font.write(font_bytes)
-                    tmp_font_path = tmp_font.name
-                
-                pdfmetrics.registerFont(TTFont('CustomFont', tmp_font_path))
-                font_name = 'CustomFont'
-                os.unlink(tmp_font_path)
-            except:
-                pass
+def generation_inputs():
+    """Snapshot of what a generation job needs; jobs run off the script thread and cannot read session state"""
+    cases = st.session_state.cases_data
+    if st.session_state.case_subset is not None:
+        cases = CaseSelection(cases, st.session_state.case_subset)
+    return {
+        "cases": cases,
+        "cases_count": len(cases),
+        "pdf_bytes": st.session_state.pdf_bytes,
+        "font_bytes": st.session_state.font_bytes,
+        "positions": copy.deepcopy(st.session_state.permanent_saved_positions)
+    }
+
+def generate_zip_download(job, inputs, workers, compression, backend, use_cache):
+    """Job work: render every case into a streamed ZIP; returns the generation result dict"""
+    failed_cases = []
+    cache_stats = {"hits": 0, "misses": 0} if use_cache else None
+    metrics = RunMetrics("zip")
+    page_count = template_page_count(backend, inputs["pdf_bytes"])
+    
+    # Each PDF goes straight into the job's ZIP file on disk as it finishes
+    with StreamingZip(compression, path=job.artifact_path(".zip")) as archive:
+        results = generate_batch(
+            job.watch(inputs["cases"]),
+            inputs["pdf_bytes"],
+            inputs["font_bytes"],
+            inputs["positions"],
+            workers=workers,
+            backend=backend,
+            cache=get_render_cache() if use_cache else None
+        )
         
-        def draw_text(text, spec, page_height):
-            if not text:
-                return
-            
-            text = str(text).strip()
-            if not text:
-                return
-            
-            x_pts = spec['x'] * 72
-            y_pts = (page_height/72 - spec['y'] - spec['h']/2) * 72
-            w_pts = spec['w'] * 72
-            
-            font_size = spec['font']
-            c.setFont(font_name, font_size)
-            c.setFillColor(font_color)
-            
-            # Adjust line height for larger fonts
-            if font_size > 20:
-                line_height = font_size * 1.1
-            else:
-                line_height = font_size + 2
-            
-            if len(text) > 50 and spec['h'] > 0.5:
-                words = text.split()
-                lines = []
-                current_line = ""
-                
-                for word in words:
-                    test_line = f"{current_line} {word}".strip()
-                    text_width = c.stringWidth(test_line, font_name, font_size)
-                    
-                    if text_width <= w_pts - 10:
-                        current_line = test_line
-                    else:
-                        if current_line:
-                            lines.append(current_line)
-                        current_line = word
-                
-                if current_line:
-                    lines.append(current_line)
+        # Closing the results on cancel stops the worker processes
+        with closing(results):
+            for done, result in enumerate(results, start=1):
+                if cache_stats is not None:
+                    cache_stats["hits" if result.cached else "misses"] += 1
                 
-                start_y = y_pts + (len(lines) - 1) * line_height / 2
+                zip_start = time.perf_counter()
+                if result.error:
+                    failed_cases.append(result.error)
+                else:
+                    archive.add(f"{result.case_id}_filled.pdf", result.pdf)
+                metrics.add_result(result, page_count, time.perf_counter() - zip_start)
                 
-                for line in lines:
-                    c.drawString(x_pts + 5, start_y, line)
-                    start_y -= line_height
-            else:
-                c.drawString(x_pts + 5, y_pts, text)
+                job.progress(done, failed=len(failed_cases))
         
-        # Use PERMANENT saved positions
-        saved_specs = st.session_state.permanent_saved_positions
+        generated = archive.count
+        archive.finish()
+    if not generated:
+        job.discard_artifact()
+    
+    return {
+        "generated": generated,
+        "failed_cases": failed_cases,
+        "download": dict(
+            label=f"💾 Download ZIP ({generated} PDFs)",
+            file_name=f"filled_forms_{generated}.zip",
+            mime="application/zip"
+        ),
+        "cache_stats": cache_stats,
+        "metrics": metrics.finish().summary()
+    }
+
+def generate_combined_download(job, inputs):
+    """Job work: render every case into one bookmarked PDF; returns the generation result dict"""
+    from handwriting_tool.combined import render_combined
+    from handwriting_tool.render import resolve_font
+    from handwriting_tool.template import get_compiled_template
+    
+    template = get_compiled_template(inputs["pdf_bytes"])
+    font_name = resolve_font(inputs["font_bytes"])
+    metrics = RunMetrics("combined")
+    
+    combined_pdf, generated, failed_cases = render_combined(
+        job.watch(inputs["cases"]),
+        template,
+        font_name,
+        inputs["positions"],
+        progress=job.progress,
+        metrics=metrics
+    )
+    # Only the path is kept with the job, not the PDF
+    if generated:
+        with open(job.artifact_path(".pdf"), 'wb') as f:
+            f.write(combined_pdf)
+    
+    return {
+        "generated": generated,
+        "failed_cases": failed_cases,
+        "download": dict(
+            label=f"💾 Download PDF ({generated} cases)",
+            file_name=f"filled_forms_{generated}.pdf",
+            mime="application/pdf"
+        ),
+        "cache_stats": None,
+        "metrics": metrics.finish().summary()
+    }
+
+def current_generation_job():
+    """This session's latest generation job, also found again from the URL after a reload
+
+    Only jobs this session started are looked up by id. After a reload the
+    URL holds the job's secret token instead, and the job it names is
+    adopted by the new session; ids alone never give access to a job.
+    """
+    runner = get_job_runner()
+    job_id = st.session_state.generation_job_id
+    if job_id in st.session_state.generation_job_ids:
+        return runner.get(job_id)
+    job = runner.find(st.query_params.get("job"))
+    if job is not None:
+        st.session_state.generation_job_ids.append(job.id)
+        st.session_state.generation_job_id = job.id
+    return job
+
+def dismiss_generation_result(job):
+    """Delete a finished job's output and stop showing its result"""
+    job.discard_artifact()
+    st.session_state.generation_job_id = None
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+def start_generation_job(output_mode, workers=None, compression=None, backend=None, use_cache=False):
+    """Submit generation as a background job; its id is kept in the session, its token in the URL"""
+    inputs = generation_inputs()
+    if output_mode == "combined":
+        work = lambda job: generate_combined_download(job, inputs)
+    else:
+        work = lambda job: generate_zip_download(job, inputs, workers, compression, backend, use_cache)
+    job = get_job_runner().submit(
+        work, label=output_mode, total=inputs["cases_count"], owner=st.session_state.generation_owner
+    )
+    st.session_state.generation_job_ids.append(job.id)
+    st.session_state.generation_job_id = job.id
+    st.query_params["job"] = job.token
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def generation_progress(job_id):
+    """Live progress of a running job, polled without rerunning the rest of the page"""
+    job = get_job_runner().get(job_id)
+    if job is None or not job.running:
+        # Show the result, metrics and download with the rest of the page
+        st.rerun()
+    
+    st.progress(job.done / job.total if job.total else 0.0)
+    eta = f" · ETA {job.eta:.0f}s" if job.eta is not None else ""
+    st.text(f"Processing {job.done}/{job.total} · {job.failed} failed{eta}")
+    
+    if job.cancelling:
+        st.caption("⏹️ Cancelling after the current case...")
+    else:
+        st.button("⏹️ Cancel", on_click=job.cancel, use_container_width=True, key=f"cancel_{job.id}")
+
+def show_generation_result(job, run_metrics_panel):
+    """Outcome of a finished job; its download stays available on later reruns"""
+    first_view = st.session_state.generation_job_shown != job.id
+    st.session_state.generation_job_shown = job.id
+    
+    if job.status == JOB_CANCELLED:
+        st.warning(f"⏹️ Generation cancelled after {job.done}/{job.total} cases")
+        return
+    if job.status == JOB_FAILED:
+        st.error(f"❌ Error: {job.error}")
+        return
+    
+    result = job.result
+    if first_view:
+        st.session_state.last_run_metrics = result["metrics"]
+        show_run_metrics(run_metrics_panel)
+    
+    if not result["generated"]:
+        st.error("❌ No PDFs generated")
+        return
+    
+    st.success(f"✅ Generated {result['generated']} PDFs!")
+    
+    if not job.has_artifact:
+        st.info("📦 This download has expired - generate again for another copy")
+    else:
+        download_col, dismiss_col = st.columns([3, 1])
+        with download_col:
+            # The file is only read when the button is clicked, so reruns hold none of it
+            st.download_button(**result["download"], data=job.read_artifact,
+                               use_container_width=True, key=f"download_{job.id}")
+        with dismiss_col:
+            st.button("🗑️ Dismiss", on_click=dismiss_generation_result, args=(job,),
+                      use_container_width=True, key=f"dismiss_{job.id}",
+                      help="Delete the generated file and clear this result")
+    
+    cache_stats = result["cache_stats"]
+    if cache_stats is not None:
+        st.caption(f"♻️ Render cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    
+    if result["failed_cases"]:
+        with st.expander("⚠️ Issues"):
+            for err in result["failed_cases"]:
+                st.text(err)
+    
+    if first_view:
+        st.balloons()
+
+def case_browser():
+    """Search the loaded cases page by page and optionally limit generation to the matches"""
+    st.session_state.case_subset = None
+    st.markdown("---")
+    if not st.toggle("🗂️ Browse & filter cases", key="case_browser_open",
+                     help="Search by date, theme, EPA, rubric level and summary words"):
+        return
+    
+    cases = st.session_state.cases_data
+    with st.spinner("🔎 Indexing cases..."):
+        index = shared_case_index(cases)
+    
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        date_range = index.date_range
+        dates = st.date_input(
+            "📅 Dates",
+            value=(),
+            min_value=date_range[0] if date_range else None,
+            max_value=date_range[1] if date_range else None,
+            key="browse_dates",
+            disabled=date_range is None,
+            help="First and last day; cases without a date are left out when set"
+        )
+        theme = st.text_input("🏷️ Theme contains", key="browse_theme")
+    with filter_col2:
+        epas = st.multiselect("🎯 EPAs", index.epa_labels, key="browse_epas", help="Cases that tested any of these")
+        levels = st.multiselect("📊 Rubric levels", index.rubric_levels, key="browse_levels",
+                                help="Cases with any of these levels")
+    with filter_col3:
+        text = st.text_input("📝 Summary words", key="browse_text",
+                             help="Every word must start a word of the case summary")
+    
+    dates = tuple(dates) if isinstance(dates, (tuple, list)) else (dates,)
+    query = {
+        "date_from": dates[0] if dates else None,
+        "date_to": dates[-1] if dates else None,
+        "theme": theme.strip() or None,
+        "epas": epas,
+        "rubric_levels": levels,
+        "text": text
+    }
+    filtered = any(query.values())
+    
+    start = time.perf_counter()
+    positions = index.search(**query)
+    elapsed = time.perf_counter() - start
+    matches = len(positions)
+    st.caption(f"**{matches}** of {index.count} cases match · {elapsed * 1000:.1f} ms")
+    
+    # Only the rows of the current page are read and sent to the browser
+    page_col1, page_col2 = st.columns([1, 3])
+    with page_col1:
+        page_size = st.selectbox("Rows per page", BROWSER_PAGE_SIZES, key="browse_page_size")
+    pages = max((matches + page_size - 1) // page_size, 1)
+    if st.session_state.get("browse_page", 1) > pages:
+        st.session_state.browse_page = pages
+    with page_col2:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="browse_page")
+    if matches:
+        st.dataframe(
+            index.rows(positions, (page - 1) * page_size, page * page_size),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    if st.checkbox(
+        "🎯 Generate only the matching cases",
+        key="generate_subset",
+        disabled=not filtered,
+        help="Set a filter first" if not filtered else "Generate PDFs renders these cases instead of all of them"
+    ) and filtered:
+        st.session_state.case_subset = positions
+
+def show_fit_check():
+    """Check every case against the saved positions without rendering and list what does not fit"""
+    from handwriting_tool.fit import ISSUE_KINDS, check_cases
+    from handwriting_tool.render import resolve_font
+    
+    start = time.perf_counter()
+    checked, issues, counts, font_sizes = check_cases(
+        st.session_state.cases_data,
+        resolve_font(st.session_state.font_bytes),
+        st.session_state.permanent_saved_positions
+    )
+    elapsed = time.perf_counter() - start
+    
+    if font_sizes:
+        show_fitted_sizes(font_sizes)
+    
+    if not issues:
+        st.success(f"✅ All {checked} cases fit ({elapsed * 1000:.0f} ms)")
+        return
+    
+    st.warning(f"⚠️ {len(issues)} fields in {len({issue.case_id for issue in issues})} of {checked} cases do not fit")
+    for kind, description in ISSUE_KINDS.items():
+        if counts[kind]:
+            st.write(f"**{counts[kind]}** × {description.lower()}")
+    st.dataframe([{
+        'Case': issue.case_id,
+        'Page': issue.page,
+        'Field': issue.field,
+        'Issue': issue.kind,
+        'Detail': issue.detail
+    } for issue in issues[:FIT_CHECK_ROWS]], use_container_width=True, height=250)
+    if len(issues) > FIT_CHECK_ROWS:
+        st.caption(f"Showing the first {FIT_CHECK_ROWS} of {len(issues)} issues")
+    st.caption(f"Checked in {elapsed * 1000:.0f} ms")
+
+def show_fitted_sizes(font_sizes):
+    """Font sizes auto-fit chose, one row per case and field that was shrunk"""
+    configured = {
+        field_name: spec['font']
+        for fields in st.session_state.permanent_saved_positions.values()
+        for field_name, spec in fields.items()
+    }
+    rows = [{
+        'Case': case_id,
+        'Field': field_name,
+        'Font': configured[field_name],
+        'Fitted': size
+    } for case_id, sizes in font_sizes for field_name, size in sizes.items() if size < configured[field_name]]
+    shrunk_cases = sum(
+        any(size < configured[field_name] for field_name, size in sizes.items()) for _, sizes in font_sizes
+    )
+    
+    with st.expander(f"🔠 Auto-fit shrank {len(rows)} fields in {shrunk_cases} cases"):
+        st.dataframe(rows[:FIT_CHECK_ROWS], use_container_width=True, height=250)
+        if len(rows) > FIT_CHECK_ROWS:
+            st.caption(f"Showing the first {FIT_CHECK_ROWS} of {len(rows)} fields")
+
+def show_run_metrics(container):
+    """Stage timings, latency histogram and throughput of the last generation run"""
+    summary = st.session_state.last_run_metrics
+    if not summary:
+        return
+    
+    with container.container():
+        st.markdown("---")
+        st.subheader("⏱️ Last Run")
+        st.caption(f"{summary['cases']} cases ({summary['label']}) in {summary['wall_seconds']:.2f}s")
         
-        # PAGE 1
-        page1_specs = saved_specs['page1']
+        col_pages, col_bytes = st.columns(2)
+        col_pages.metric("Pages/s", f"{summary['pages_per_second'] or 0:.1f}")
+        col_bytes.metric("MB/s", f"{(summary['bytes_per_second'] or 0) / 1e6:.2f}")
         
-        draw_text(case_data.get('date', ''), page1_specs['date'], page_height)
+        stage_total = sum(summary['stage_seconds'].values()) or 1
+        st.dataframe(
+            [
+                {"Stage": stage, "Total ms": round(seconds * 1000, 1), "Share": f"{seconds / stage_total:.0%}"}
+                for stage, seconds in summary['stage_seconds'].items()
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
         
-        if 'age_gender' in case_data:
-            draw_text(case_data['age_gender'], page1_specs['age_gender'], page_height)
-        else:
-            age_gender = f"{case_data.get('age', '')} {case_data.get('gender', '')}".strip()
-            draw_text(age_gender, page1_specs['age_gender'], page_height)
+        latency = summary['case_latency']
+        if latency['count']:
+            st.caption(f"Per-case latency (mean {latency['mean_seconds'] * 1000:.1f} ms)")
+            st.bar_chart(
+                {f"≤{bucket['le']}s" if bucket['le'] != "+Inf" else ">5s": bucket['count'] for bucket in latency['histogram']},
+                height=160
+            )
         
-        draw_text(case_data.get('main_theme', ''), page1_specs['main_theme'], page_height)
-        draw_text(case_data.get('case_summary', ''), page1_specs['case_summary'], page_height)
+        col_json, col_prom = st.columns(2)
+        col_json.download_button(
+            "📥 JSON",
+            data=to_json(summary),
+            file_name="run_metrics.json",
+            mime="application/json",
+            use_container_width=True,
+            key=f"run_metrics_json_{summary['finished_at']}"
+        )
+        col_prom.download_button(
+            "📥 Prometheus",
+            data=to_prometheus(summary),
+            file_name="run_metrics.prom",
+            mime="text/plain",
+            use_container_width=True,
+            key=f"run_metrics_prom_{summary['finished_at']}"
+        )
+
+def sync_position_inputs(page_key, field_name):
+    """Point the slider and number input states at the field's current working position"""
+    spec = st.session_state.working_positions[page_key][field_name]
+    for kind in ("slider", "num"):
+        for coord in ("x", "y", "w", "h"):
+            st.session_state[f"{kind}_{coord}_{page_key}_{field_name}"] = float(spec[coord])
+    st.session_state[f"fit_{page_key}_{field_name}"] = spec.get('fit', False)
+
+def on_position_input(kind, page_key, field_name, coord):
+    """Widget callback: apply an edit before the rerun draws the preview"""
+    value = st.session_state[f"{kind}_{coord}_{page_key}_{field_name}"]
+    update_working_position(page_key, field_name, coord, value)
+
+def on_fit_toggle(page_key, field_name):
+    """Widget callback: switch auto-fit for a field in the working positions"""
+    st.session_state.working_positions[page_key][field_name]['fit'] = st.session_state[f"fit_{page_key}_{field_name}"]
+    st.session_state.has_unsaved_changes[page_key] = check_for_changes(page_key)
+
+@st.fragment
+def position_editor(current_page):
+    """Save button, preview and position controls - edits rerun only this part of the page"""
+    editor_start = time.perf_counter()
+    page_key = f"page{current_page}"
+    
+    # The sidebar and Generate button show the saved state; refresh the whole
+    # page when it flips instead of on every edit
+    if st.session_state.has_unsaved_changes != st.session_state.unsaved_changes_shown:
+        st.rerun()
+    
+    has_changes = st.session_state.has_unsaved_changes[page_key]
+    
+    if st.button(
+        f"💾 **SAVE PAGE {current_page}**" if has_changes else f"✅ Page {current_page} Saved",
+        type="primary" if has_changes else "secondary",
+        disabled=not has_changes,
+        use_container_width=True,
+        key=f"save_button_{current_page}"
+    ):
+        save_page_positions(page_key)
+        st.rerun()
+    
+    # Visual preview
+    fig = create_visual_preview(current_page)
+    if fig:
+        st.plotly_chart(fig, use_container_width=True, key=f"preview_{current_page}")
+        st.caption(f"⏱️ Preview ready in {(time.perf_counter() - editor_start) * 1000:.0f} ms")
+    else:
+        st.error(f"❌ Could not render page {current_page} of {PDF_FILE}")
+    
+    # Position Controls
+    st.subheader(f"⚙️ Position '{st.session_state.selected_field}'")
+    
+    if st.session_state.selected_field:
+        field_name = st.session_state.selected_field
+        spec = st.session_state.working_positions[page_key][field_name]
+        sync_position_inputs(page_key, field_name)
         
-        reflection = case_data.get('self_reflection', {})
-        if isinstance(reflection, dict):
-            draw_text(reflection.get('what_did_right', ''), page1_specs['self_reflection_upper'], page_height)
-            draw_text(reflection.get('needs_development', ''), page1_specs['self_reflection_lower'], page_height)
+        # Display font size
+        if spec.get('fit'):
+            st.info(f"📝 **Font Size:** up to {spec['font']}pt, shrunk per case to fit the box")
+        else:
+            st.info(f"📝 **Font Size:** {spec['font']}pt (fixed per field type)")
         
-        draw_text(case_data.get('signature_mi', ''), page1_specs['signature_mi'], page_height)
+        st.checkbox(
+            "🔠 Auto-fit font size",
+            key=f"fit_{page_key}_{field_name}",
+            on_change=on_fit_toggle,
+            args=(page_key, field_name),
+            help="Use the largest size up to the field's font size at which each case's text fits the box"
+        )
         
-        # PAGE 2
-        c.showPage()
-        page2_specs = saved_specs['page2']
-        epa_data = case_data.get('epa_assessment', {})
+        # Choose input method
+        input_tabs = st.tabs(["🎚️ Sliders", "🔢 Number Input"])
         
-        if isinstance(epa_data, dict):
-            epas = epa_data.get('epa_tested', [])
-            rubrics = epa_data.get('rubric_levels', [])
-            strengths = epa_data.get('strength_points', [])
-            improvements = epa_data.get('points_needing_improvement', [])
+        with input_tabs[0]:
+            # SLIDER CONTROLS
+            st.markdown("**Use sliders for visual adjustment:**")
             
-            epas = epas if isinstance(epas, list) else []
-            rubrics = rubrics if isinstance(rubrics, list) else []
-            strengths = strengths if isinstance(strengths, list) else []
-            improvements = improvements if isinstance(improvements, list) else []
+            col_x, col_y = st.columns(2)
+            with col_x:
+                st.slider(
+                    "↔️ X Position (inches)",
+                    0.0, 8.5,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"slider_x_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("slider", page_key, field_name, "x")
+                )
             
-            for i in range(min(4, max(len(epas), len(rubrics), len(strengths), len(improvements)))):
-                row_num = i + 1
-                
-                if i < len(epas):
-                    draw_text(str(epas[i]), page2_specs[f'epa_row{row_num}'], page_height)
-                
-                if i < len(rubrics):
-                    draw_text(str(rubrics[i]), page2_specs[f'rubric_row{row_num}'], page_height)
-                
-                if i < len(strengths):
-                    draw_text(str(strengths[i]), page2_specs[f'strength_row{row_num}'], page_height)
-                
-                if i < len(improvements):
-                    draw_text(str(improvements[i]), page2_specs[f'improve_row{row_num}'], page_height)
-        
-        c.save()
-        overlay_buffer.seek(0)
-        
-        # Merge
-        original_pdf = PdfReader(BytesIO(pdf_bytes))
-        overlay_pdf = PdfReader(overlay_buffer)
-        writer = PdfWriter()
-        
-        for page_num in range(len(original_pdf.pages)):
-            page = original_pdf.pages[page_num]
-            if page_num < len(overlay_pdf.pages):
-                overlay_page = overlay_pdf.pages[page_num]
-                page.merge_page(overlay_page)
-            writer.add_page(page)
+            with col_y:
+                st.slider(
+                    "↕️ Y Position (inches)",
+                    0.0, 11.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"slider_y_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("slider", page_key, field_name, "y")
+                )
+            
+            col_w, col_h = st.columns(2)
+            with col_w:
+                st.slider(
+                    "📐 Width (inches)",
+                    0.1, 8.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"slider_w_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("slider", page_key, field_name, "w")
+                )
+            
+            with col_h:
+                st.slider(
+                    "📏 Height (inches)",
+                    0.1, 3.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"slider_h_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("slider", page_key, field_name, "h")
+                )
         
-        output_buffer = BytesIO()
-        writer.write(output_buffer)
-        output_buffer.seek(0)
-        return output_buffer.getvalue()
+        with input_tabs[1]:
+            # NUMBER INPUT CONTROLS
+            st.markdown("**Enter exact values (inches):**")
+            
+            col_x_num, col_y_num = st.columns(2)
+            with col_x_num:
+                st.number_input(
+                    "X Position",
+                    min_value=0.0,
+                    max_value=8.5,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"num_x_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("num", page_key, field_name, "x")
+                )
+            
+            with col_y_num:
+                st.number_input(
+                    "Y Position",
+                    min_value=0.0,
+                    max_value=11.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"num_y_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("num", page_key, field_name, "y")
+                )
+            
+            col_w_num, col_h_num = st.columns(2)
+            with col_w_num:
+                st.number_input(
+                    "Width",
+                    min_value=0.1,
+                    max_value=8.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"num_w_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("num", page_key, field_name, "w")
+                )
+            
+            with col_h_num:
+                st.number_input(
+                    "Height",
+                    min_value=0.1,
+                    max_value=3.0,
+                    step=0.01,
+                    format="%.2f",
+                    key=f"num_h_{page_key}_{field_name}",
+                    on_change=on_position_input,
+                    args=("num", page_key, field_name, "h")
+                )
         
-    except Exception as e:
-        st.error(f"Error creating PDF: {str(e)}")
-        return None
+        # Current position display
+        st.markdown("---")
+        if st.session_state.has_unsaved_changes[page_key]:
+            st.warning(f"⚠️ **Current Position (UNSAVED):** X={spec['x']:.2f}\", Y={spec['y']:.2f}\", W={spec['w']:.2f}\", H={spec['h']:.2f}\"")
+        else:
+            st.success(f"✅ **Saved Position:** X={spec['x']:.2f}\", Y={spec['y']:.2f}\", W={spec['w']:.2f}\", H={spec['h']:.2f}\"")
 
 def main():
     """Main application with proper positioning controls"""
@@ -617,6 +920,7 @@ def main():
             st.session_state.data_loaded = False
             st.session_state.loading_error = None
             st.session_state.cases_data = []
+            st.session_state.cases_count = 0
             st.rerun()
         return
     
@@ -624,7 +928,7 @@ def main():
     st.sidebar.header("📁 Data Status")
     st.sidebar.success(f"✅ PDF: {PDF_FILE}")
     
-    cases_count = len(st.session_state.cases_data) if isinstance(st.session_state.cases_data, list) else 0
+    cases_count = st.session_state.cases_count
     st.sidebar.success(f"✅ Cases: {cases_count} loaded")
     
     if st.session_state.font_bytes:
@@ -639,6 +943,7 @@ def main():
     
     page1_changed = st.session_state.has_unsaved_changes["page1"]
     page2_changed = st.session_state.has_unsaved_changes["page2"]
+    st.session_state.unsaved_changes_shown = dict(st.session_state.has_unsaved_changes)
     
     if page1_changed or page2_changed:
         st.sidebar.error("⚠️ **Unsaved Changes**")
@@ -672,6 +977,21 @@ def main():
         - Improvements: **16pt**
         """)
     
+    # Filled after a run as well, so the panel shows the run that just finished
+    run_metrics_panel = st.sidebar.empty()
+    show_run_metrics(run_metrics_panel)
+    
+    # Preview background encoding
+    st.sidebar.markdown("---")
+    st.sidebar.selectbox(
+        "🖼️ Preview image",
+        list(PREVIEW_FORMATS.keys()),
+        index=list(PREVIEW_FORMATS.keys()).index(DEFAULT_PREVIEW_FORMAT),
+        format_func=lambda key: PREVIEW_FORMATS[key][0],
+        key="preview_format",
+        help="Smaller images make the preview repaint faster; field positions are unaffected"
+    )
+    
     # Reset button
     st.sidebar.markdown("---")
     if st.sidebar.button("🔄 Reset All to Defaults", type="secondary", use_container_width=True):
@@ -682,8 +1002,9 @@ def main():
     if cases_count > 0:
         st.sidebar.markdown("---")
         st.sidebar.subheader("📊 Cases")
-        for i, case in enumerate(st.session_state.cases_data[:3]):
-            date = case.get('date', 'No date')
+        cases = st.session_state.cases_data
+        for i in range(min(3, cases_count)):
+            date = cases.value(i, 'date', 'No date')
             st.sidebar.text(f"{i+1}. {date}")
         if cases_count > 3:
             st.sidebar.text(f"... +{cases_count - 3} more")
@@ -699,8 +1020,8 @@ def main():
             st.success(f"✅ {st.session_state.show_success_message}")
             st.session_state.show_success_message = None
         
-        # Page selection and save
-        col_page, col_field, col_save = st.columns([1, 2, 1])
+        # Page selection
+        col_page, col_field = st.columns([1, 2])
         
         with col_page:
             page_option = st.selectbox("📄 Page", ["Page 1", "Page 2"], key="page_selector")
@@ -723,162 +1044,12 @@ def main():
                 )
                 st.session_state.selected_field = selected_field
         
-        with col_save:
-            page_key = f"page{current_page}"
-            has_changes = st.session_state.has_unsaved_changes[page_key]
-            
-            if st.button(
-                f"💾 **SAVE PAGE {current_page}**" if has_changes else f"✅ Page {current_page} Saved",
-                type="primary" if has_changes else "secondary",
-                disabled=not has_changes,
-                use_container_width=True,
-                key=f"save_button_{current_page}"
-            ):
-                save_page_positions(page_key)
-                st.rerun()
-        
-        # Visual preview
-        if current_page in st.session_state.pdf_images:
-            fig = create_visual_preview(current_page)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True, key=f"preview_{current_page}")
+        # Save button, preview and position controls rerun on their own
+        position_editor(current_page)
         
-        # Position Controls
-        st.subheader(f"⚙️ Position '{st.session_state.selected_field}'")
-        
-        if st.session_state.selected_field:
-            page_key = f"page{current_page}"
-            field_name = st.session_state.selected_field
-            spec = st.session_state.working_positions[page_key][field_name]
-            
-            # Display font size
-            st.info(f"📝 **Font Size:** {spec['font']}pt (fixed per field type)")
-            
-            # Choose input method
-            input_tabs = st.tabs(["🎚️ Sliders", "🔢 Number Input"])
-            
-            with input_tabs[0]:
-                # SLIDER CONTROLS
-                st.markdown("**Use sliders for visual adjustment:**")
-                
-                col_x, col_y = st.columns(2)
-                with col_x:
-                    new_x = st.slider(
-                        "↔️ X Position (inches)",
-                        0.0, 8.5,
-                        value=float(spec['x']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"slider_x_{page_key}_{field_name}"
-                    )
-                    if new_x != spec['x']:
-                        update_working_position(page_key, field_name, 'x', new_x)
-                
-                with col_y:
-                    new_y = st.slider(
-                        "↕️ Y Position (inches)",
-                        0.0, 11.0,
-                        value=float(spec['y']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"slider_y_{page_key}_{field_name}"
-                    )
-                    if new_y != spec['y']:
-                        update_working_position(page_key, field_name, 'y', new_y)
-                
-                col_w, col_h = st.columns(2)
-                with col_w:
-                    new_w = st.slider(
-                        "📐 Width (inches)",
-                        0.1, 8.0,
-                        value=float(spec['w']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"slider_w_{page_key}_{field_name}"
-                    )
-                    if new_w != spec['w']:
-                        update_working_position(page_key, field_name, 'w', new_w)
-                
-                with col_h:
-                    new_h = st.slider(
-                        "📏 Height (inches)",
-                        0.1, 3.0,
-                        value=float(spec['h']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"slider_h_{page_key}_{field_name}"
-                    )
-                    if new_h != spec['h']:
-                        update_working_position(page_key, field_name, 'h', new_h)
-            
-            with input_tabs[1]:
-                # NUMBER INPUT CONTROLS
-                st.markdown("**Enter exact values (inches):**")
-                
-                col_x_num, col_y_num = st.columns(2)
-                with col_x_num:
-                    num_x = st.number_input(
-                        "X Position",
-                        min_value=0.0,
-                        max_value=8.5,
-                        value=float(spec['x']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"num_x_{page_key}_{field_name}"
-                    )
-                    if num_x != spec['x']:
-                        update_working_position(page_key, field_name, 'x', num_x)
-                        st.rerun()
-                
-                with col_y_num:
-                    num_y = st.number_input(
-                        "Y Position",
-                        min_value=0.0,
-                        max_value=11.0,
-                        value=float(spec['y']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"num_y_{page_key}_{field_name}"
-                    )
-                    if num_y != spec['y']:
-                        update_working_position(page_key, field_name, 'y', num_y)
-                        st.rerun()
-                
-                col_w_num, col_h_num = st.columns(2)
-                with col_w_num:
-                    num_w = st.number_input(
-                        "Width",
-                        min_value=0.1,
-                        max_value=8.0,
-                        value=float(spec['w']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"num_w_{page_key}_{field_name}"
-                    )
-                    if num_w != spec['w']:
-                        update_working_position(page_key, field_name, 'w', num_w)
-                        st.rerun()
-                
-                with col_h_num:
-                    num_h = st.number_input(
-                        "Height",
-                        min_value=0.1,
-                        max_value=3.0,
-                        value=float(spec['h']),
-                        step=0.01,
-                        format="%.2f",
-                        key=f"num_h_{page_key}_{field_name}"
-                    )
-                    if num_h != spec['h']:
-                        update_working_position(page_key, field_name, 'h', num_h)
-                        st.rerun()
-            
-            # Current position display
-            st.markdown("---")
-            if st.session_state.has_unsaved_changes[page_key]:
-                st.warning(f"⚠️ **Current Position (UNSAVED):** X={spec['x']:.2f}\", Y={spec['y']:.2f}\", W={spec['w']:.2f}\", H={spec['h']:.2f}\"")
-            else:
-                st.success(f"✅ **Saved Position:** X={spec['x']:.2f}\", Y={spec['y']:.2f}\", W={spec['w']:.2f}\", H={spec['h']:.2f}\"")
+        # Runs before the Tools column, so Generate sees the selection
+        if cases_count > 0:
+            case_browser()
     
     with col2:
         st.header("🎛️ Tools")
@@ -934,16 +1105,29 @@ def main():
                         'Y': f"{sp['y']:.2f}",
                         'W': f"{sp['w']:.2f}",
                         'H': f"{sp['h']:.2f}",
-                        'Font': f"{sp['font']}"
+                        'Font': f"≤{sp['font']} (fit)" if sp.get('fit') else f"{sp['font']}"
                     })
                 st.dataframe(data, use_container_width=True, height=200)
         
+        # Saved positions for the headless renderer (python -m handwriting_tool render --positions ...)
+        st.download_button(
+            "📥 Export Positions JSON",
+            data=json.dumps(st.session_state.permanent_saved_positions, indent=2),
+            file_name="positions.json",
+            mime="application/json",
+            use_container_width=True
+        )
+        
         st.markdown("---")
         
         # Generate PDFs
         st.subheader("📄 Generate PDFs")
         
-        st.write(f"**Cases:** {cases_count}")
+        case_subset = st.session_state.case_subset
+        if case_subset is not None:
+            st.write(f"**Cases:** {len(case_subset)} of {cases_count} selected")
+        else:
+            st.write(f"**Cases:** {cases_count}")
         
         has_any_unsaved = page1_changed or page2_changed
         
@@ -952,76 +1136,77 @@ def main():
         
         if cases_count > 0:
             if st.button(
-                "🚀 Generate All PDFs",
-                type="primary" if not has_any_unsaved else "secondary",
+                "🔍 Check Fit",
                 disabled=has_any_unsaved,
                 use_container_width=True,
-                help="Save all changes first" if has_any_unsaved else "Generate PDFs"
+                help="Find text that will overflow its box, without generating anything"
             ):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
+                show_fit_check()
+            
+            output_mode = st.radio(
+                "📦 Output",
+                list(OUTPUT_MODES.keys()),
+                format_func=lambda key: OUTPUT_MODES[key],
+                key="output_mode",
+                help="One PDF per case in a ZIP, or every case in a single bookmarked PDF"
+            )
+            
+            if output_mode == "zip":
+                workers = st.number_input(
+                    "🧵 Worker processes",
+                    min_value=1,
+                    max_value=max(default_workers(), 1) * 2,
+                    value=default_workers(),
+                    step=1,
+                    key="batch_workers",
+                    help="Cases are rendered in parallel across this many processes"
+                )
                 
-                filled_pdfs = {}
-                failed_cases = []
+                compression = st.selectbox(
+                    "🗜️ ZIP compression",
+                    list(COMPRESSION_OPTIONS.keys()),
+                    index=list(COMPRESSION_OPTIONS.keys()).index(DEFAULT_COMPRESSION),
+                    format_func=lambda key: COMPRESSION_OPTIONS[key][0],
+                    key="zip_compression",
+                    help="PDFs are already compressed - storing them is fastest"
+                )
+                
+                backend = st.selectbox(
+                    "🖨️ Rendering backend",
+                    list(BACKENDS.keys()),
+                    index=list(BACKENDS.keys()).index(DEFAULT_BACKEND),
+                    format_func=lambda key: BACKENDS[key].label,
+                    key="render_backend",
+                    help="Engine that draws the handwriting onto the template"
+                )
                 
-                try:
-                    for i, case in enumerate(st.session_state.cases_data):
-                        if not isinstance(case, dict):
-                            failed_cases.append(f"Case {i+1}: Invalid")
-                            continue
-                        
-                        case_id = case.get('case_id', f'case_{i+1:03d}')
-                        status_text.text(f"Processing {i+1}/{cases_count}")
-                        progress_bar.progress((i + 1) / cases_count)
-                        
-                        try:
-                            filled_pdf = create_filled_pdf(
-                                case, 
-                                st.session_state.pdf_bytes, 
-                                st.session_state.font_bytes
-                            )
-                            
-                            if filled_pdf:
-                                filename = f"{case_id}_filled.pdf"
-                                filled_pdfs[filename] = filled_pdf
-                        except Exception as e:
-                            failed_cases.append(f"{case_id}: {str(e)[:50]}")
-                    
-                    status_text.empty()
-                    progress_bar.empty()
-                    
-                    if filled_pdfs:
-                        # Create ZIP
-                        zip_buffer = BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                            for filename, pdf_data in filled_pdfs.items():
-                                zf.writestr(filename, pdf_data)
-                        
-                        zip_buffer.seek(0)
-                        
-                        st.success(f"✅ Generated {len(filled_pdfs)} PDFs!")
-                        
-                        st.download_button(
-                            label=f"💾 Download ZIP ({len(filled_pdfs)} PDFs)",
-                            data=zip_buffer.getvalue(),
-                            file_name=f"filled_forms_{len(filled_pdfs)}.zip",
-                            mime="application/zip",
-                            use_container_width=True
-                        )
-                        
-                        if failed_cases:
-                            with st.expander("⚠️ Issues"):
-                                for err in failed_cases:
-                                    st.text(err)
-                        
-                        st.balloons()
+                use_cache = st.checkbox(
+                    "♻️ Reuse cached renders",
+                    value=True,
+                    key="render_cache",
+                    help="Cases whose data, positions, template and font are unchanged are not re-rendered"
+                )
+            
+            job = current_generation_job()
+            
+            if job is not None and job.running:
+                generation_progress(job.id)
+            else:
+                if st.button(
+                    "🚀 Generate All PDFs" if case_subset is None else f"🚀 Generate {len(case_subset)} Selected PDFs",
+                    type="primary" if not has_any_unsaved else "secondary",
+                    disabled=has_any_unsaved or (case_subset is not None and not len(case_subset)),
+                    use_container_width=True,
+                    help="Save all changes first" if has_any_unsaved else "Generate PDFs in the background"
+                ):
+                    if output_mode == "combined":
+                        start_generation_job(output_mode)
                     else:
-                        st.error("❌ No PDFs generated")
-                        
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    status_text.empty()
-                    progress_bar.empty()
+                        start_generation_job(output_mode, workers, compression, backend, use_cache)
+                    st.rerun()
+                
+                if job is not None:
+                    show_generation_result(job, run_metrics_panel)
         
         st.markdown("---")
         
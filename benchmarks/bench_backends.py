@@ -0,0 +1,100 @@
+"""Rendering backends: per-case time, output size and visual equivalence
+
+Renders the bundled sample cases with every backend, times them, then
+rasterizes each page with PyMuPDF and compares every backend against
+reportlab. Exits non-zero when a page differs by more than the tolerance.
+
+    python benchmarks/bench_backends.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from handwriting_tool.backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from handwriting_tool.cases import parse_cases
+from handwriting_tool.specs import DEFAULT_SPECS
+
+
+def read_bytes(*parts):
+    with open(os.path.join(ROOT, *parts), 'rb') as f:
+        return f.read()
+
+
+def sample_cases():
+    cases = []
+    for name in (os.path.join("input", "cases_data.json"), "sample_cases_data.json"):
+        loaded, _ = parse_cases(json.loads(read_bytes(name)), name)
+        cases.extend(loaded)
+    return cases
+
+
+def rasterize(pdf_bytes, dpi):
+    """Grayscale page arrays of a PDF"""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        pages = []
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            pages.append(np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width))
+        return pages
+
+
+def page_difference(expected, actual, ink_threshold):
+    """Share of pixels whose gray level differs by more than ink_threshold"""
+    if expected.shape != actual.shape:
+        return 1.0
+    diff = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    return float(np.count_nonzero(diff > ink_threshold)) / diff.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="Render the sample set this many times for timing")
+    parser.add_argument('--dpi', type=int, default=72)
+    parser.add_argument('--ink-threshold', type=int, default=96, help="Gray-level change that counts as a different pixel")
+    parser.add_argument('--tolerance', type=float, default=0.001, help="Allowed share of different pixels per page")
+    args = parser.parse_args()
+
+    pdf_bytes = read_bytes("input", "empty_form.pdf")
+    font_bytes = read_bytes("input", "AzzamHandwriting-Regular.ttf")
+    cases = sample_cases()
+
+    outputs = {}
+    for name in BACKENDS:
+        backend = get_backend(name, pdf_bytes, font_bytes, DEFAULT_SPECS)
+        backend.render(cases[0])  # warm caches
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            rendered = [backend.render(case) for case in cases]
+        per_case = (time.perf_counter() - start) / (args.repeat * len(cases))
+
+        outputs[name] = rendered
+        average_size = sum(len(pdf) for pdf in rendered) / len(rendered)
+        print(f"{name:10s} {per_case * 1000:8.2f} ms/case  {average_size:10.0f} bytes/case")
+
+    worst = 0.0
+    reference = outputs[DEFAULT_BACKEND]
+    for name, rendered in outputs.items():
+        if name == DEFAULT_BACKEND:
+            continue
+        for case, expected_pdf, actual_pdf in zip(cases, reference, rendered):
+            for page_num, (expected, actual) in enumerate(zip(rasterize(expected_pdf, args.dpi), rasterize(actual_pdf, args.dpi)), start=1):
+                share = page_difference(expected, actual, args.ink_threshold)
+                worst = max(worst, share)
+                if share > args.tolerance:
+                    print(f"DIFFERENT {name} {case.get('case_id')} page {page_num}: {share:.4%} of pixels")
+
+    print(f"worst page difference vs {DEFAULT_BACKEND}: {worst:.4%} (tolerance {args.tolerance:.2%})")
+    return 1 if worst > args.tolerance else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Case browser index: build time and query latency on a large case file
+
+Loads a synthetic case file into a CaseStore the way app.py does, builds
+the CaseIndex over it and runs a set of browser queries (date ranges,
+theme, EPAs, rubric levels, summary words and combinations) many times,
+reporting p50/p95 latency per query and the time to read one table page.
+Every query result is checked against a plain scan over the case dicts.
+Exits with status 1 when a result differs or a query's p95 is over
+--budget-ms.
+
+    python benchmarks/bench_case_index.py --cases 100000
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from handwriting_tool.index import CaseIndex
+from handwriting_tool.store import load_case_store
+from synthetic import make_cases
+
+QUERIES = {
+    "one month": dict(date_from="2025-03-01", date_to="2025-03-31"),
+    "theme": dict(theme="asthma"),
+    "EPA 3 or 7": dict(epas=["EPA 3", "EPA 7"]),
+    "level A": dict(rubric_levels=["Level A"]),
+    "word": dict(text="fever"),
+    "word prefixes": dict(text="ultra refer"),
+    "everything": dict(date_from="2025-06-01", date_to="2025-09-30", theme="otitis", epas=["EPA 1", "EPA 2"],
+                       rubric_levels=["Level B"], text="wheeze"),
+}
+
+DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+WORD = re.compile(r'[^\W_]+')
+
+
+def scan(cases, date_from=None, date_to=None, theme=None, epas=None, rubric_levels=None, text=None):
+    """Positions matching a query, one case dict at a time"""
+    def day(value):
+        match = DATE.match(value) if isinstance(value, str) else None
+        return tuple(int(part) for part in match.groups()) if match else None
+
+    low, high = day(date_from) if date_from else None, day(date_to) if date_to else None
+    query_words = WORD.findall((text or "").lower())
+    found = []
+    for position, case in enumerate(cases):
+        epa = case.get('epa_assessment', {})
+        if low or high:
+            case_day = day(case.get('date'))
+            if case_day is None or (low and case_day < low) or (high and case_day > high):
+                continue
+        if theme and theme.lower() not in case.get('main_theme', '').lower():
+            continue
+        if epas and not set(epas) & set(map(str, epa.get('epa_tested', []))):
+            continue
+        if rubric_levels and not set(rubric_levels) & set(map(str, epa.get('rubric_levels', []))):
+            continue
+        if query_words:
+            words = WORD.findall(case.get('case_summary', '').lower())
+            if not all(any(word.startswith(query) for word in words) for query in query_words):
+                continue
+        found.append(position)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=50, help="Timed runs per query")
+    parser.add_argument('--budget-ms', type=float, default=50.0, help="p95 a query must stay under")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cases_data.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"cases": make_cases(args.cases)}, f)
+        store = load_case_store(path)
+
+    start = time.perf_counter()
+    index = CaseIndex(store)
+    build_time = time.perf_counter() - start
+    cases = list(store)
+
+    print(f"{len(store)} cases, index built in {build_time:.2f} s, "
+          f"{len(index.vocabulary)} summary words, {len(index.themes)} themes")
+    print(f"{'query':<16}{'matches':>9}{'p50 ms':>9}{'p95 ms':>9}{'page ms':>9}")
+    problems = []
+    for name, query in QUERIES.items():
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            positions = index.search(**query)
+            times.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        index.rows(positions, 0, 50)
+        page_ms = (time.perf_counter() - start) * 1000
+
+        p50 = statistics.median(times)
+        p95 = sorted(times)[int(len(times) * 0.95) - 1]
+        print(f"{name:<16}{len(positions):>9}{p50:9.2f}{p95:9.2f}{page_ms:9.2f}")
+        if positions.tolist() != scan(cases, **query):
+            problems.append(f"{name}: index and scan disagree")
+        if p95 > args.budget_ms:
+            problems.append(f"{name}: p95 {p95:.1f} ms over the {args.budget_ms:.0f} ms budget")
+
+    start = time.perf_counter()
+    scan(cases, **QUERIES["everything"])
+    print(f"Plain scan of every case for 'everything': {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    for problem in problems:
+        print(f"FAIL {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
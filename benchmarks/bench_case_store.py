@@ -0,0 +1,79 @@
+"""Memory per case: a list of normalized case dicts vs the columnar CaseStore
+
+Both are loaded from the same synthetic case file, the way app.py reads
+input/cases_data.json, and measured with tracemalloc. Also times building
+the store, materializing every case and reading one field of every case.
+Run from the repository root:
+
+    python benchmarks/bench_case_store.py --cases 100000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from handwriting_tool.ingest import CaseFile
+from handwriting_tool.store import load_case_store
+from synthetic import make_cases
+
+
+def measure(load):
+    """(result, bytes still allocated by it, seconds to build it)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--summary', choices=("short", "long"), default="short")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cases_data.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"cases": make_cases(args.cases, args.summary)}, f)
+
+        cases, dict_bytes, dict_time = measure(lambda: list(CaseFile(path)))
+        store, store_bytes, store_time = measure(lambda: load_case_store(path))
+
+    count = len(store)
+    assert count == len(cases) == args.cases
+
+    start = time.perf_counter()
+    for index, case in enumerate(store):
+        if case != cases[index]:
+            raise SystemExit(f"case {index} differs after the round trip")
+    iterate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dates = [store.value(index, 'date') for index in range(count)]
+    field_time = time.perf_counter() - start
+    assert dates == [case.get('date') for case in cases]
+
+    print(f"{count} {args.summary} cases")
+    print(f"{'':<14}{'bytes/case':>12}{'total MB':>10}{'load s':>9}")
+    print(f"{'list of dicts':<14}{dict_bytes / count:12.0f}{dict_bytes / 1e6:10.1f}{dict_time:9.2f}")
+    print(f"{'CaseStore':<14}{store_bytes / count:12.0f}{store_bytes / 1e6:10.1f}{store_time:9.2f}")
+    print(f"Memory per case: {store_bytes / dict_bytes:.1%} of the dicts "
+          f"({dict_bytes / store_bytes:.1f}x smaller), {len(store._raw)} cases stored as is")
+    print(f"Materialize all: {iterate_time:.2f} s ({iterate_time / count * 1e6:.1f} us/case)")
+    print(f"One field of all: {field_time:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
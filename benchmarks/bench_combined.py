@@ -0,0 +1,192 @@
+"""ZIP of per-case PDFs vs one combined PDF: size and wall time
+
+The bundled htn_*/ped_* PDFs are finished forms without their source case
+JSON, so the batch is built from input/cases_data.json and
+sample_cases_data.json (ten cases, the same size as the htn + ped sets),
+repeated up to --cases. The htn/ped file sizes are printed as reference.
+
+The combined PDF is also written with SharedText, which draws each
+repeated (text, font, size) once as a Form XObject; its dedup ratio
+(references per form) and the bytes it saves are printed per batch, for
+each minimum line length in --share-min-chars. It lives here rather than
+in the package: on this template a form reference costs about as much as
+the line it replaces, so sharing has made the combined PDF larger and
+slower to write in every measured run.
+
+    python benchmarks/bench_combined.py --cases 10 100
+    python benchmarks/bench_combined.py --cases 100 --share-min-chars 0 20 40 60
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from handwriting_tool import combined
+from handwriting_tool.archive import StreamingZip
+from handwriting_tool.batch import generate_batch
+from handwriting_tool.cases import parse_cases
+from handwriting_tool.combined import render_combined
+from handwriting_tool.render import FONT_COLOR, OVERLAY_PAGES, resolve_font
+from handwriting_tool.specs import DEFAULT_SPECS
+from handwriting_tool.template import get_compiled_template
+
+
+class SharedText:
+    """One Form XObject per repeated (text, font, size) drawn on a canvas
+
+    A line is drawn inline until its text, font and size come up for the
+    min_uses-th time; from then on every occurrence references one form.
+    Lines shorter than min_chars are always drawn inline. Bound to a single
+    canvas, since forms live in that canvas's document.
+    """
+
+    def __init__(self, min_uses=2, min_chars=0):
+        self.min_uses = min_uses
+        self.min_chars = min_chars
+        self.forms = {}
+        self.seen = {}
+        # Lines placed, and how many of them referenced a form
+        self.lines = 0
+        self.shared = 0
+
+    @property
+    def dedup_ratio(self):
+        """Form references per form drawn; 0 when nothing was shared"""
+        return self.shared / len(self.forms) if self.forms else 0.0
+
+    def form_for(self, c, text, font_name, font_size):
+        """Name of the form drawing text at the origin, or None to draw this line inline"""
+        self.lines += 1
+        if len(text) < self.min_chars:
+            return None
+        key = (text, font_name, font_size)
+        form_name = self.forms.get(key)
+        if form_name is None:
+            uses = self.seen[key] = self.seen.get(key, 0) + 1
+            if uses < self.min_uses:
+                return None
+            del self.seen[key]
+            form_name = self.forms[key] = f"T{len(self.forms)}"
+            # Generous box: handwriting glyphs reach well past their advance and the baseline
+            width = stringWidth(text, font_name, font_size)
+            c.beginForm(form_name, -font_size, -font_size, width + font_size, 2 * font_size)
+            c.setFont(font_name, font_size)
+            c.setFillColor(FONT_COLOR)
+            c.drawString(0, 0, text)
+            c.endForm()
+        self.shared += 1
+        return form_name
+
+    def draw_runs(self, c, runs, font_name):
+        """render.draw_runs, placing shared lines as form references"""
+        page_index = 0
+        for run_page, font_size, lines in runs:
+            while page_index < run_page:
+                c.showPage()
+                page_index += 1
+            font_set = False
+            for x, y, line in lines:
+                form_name = self.form_for(c, line, font_name, font_size)
+                if form_name is not None:
+                    c.saveState()
+                    c.translate(x, y)
+                    c.doForm(form_name)
+                    c.restoreState()
+                    continue
+                if not font_set:
+                    c.setFont(font_name, font_size)
+                    c.setFillColor(FONT_COLOR)
+                    font_set = True
+                c.drawString(x, y, line)
+
+        while page_index < OVERLAY_PAGES - 1:
+            c.showPage()
+            page_index += 1
+
+
+@contextlib.contextmanager
+def drawing_shared(shared_text):
+    """Have render_combined draw through shared_text while the block runs"""
+    original = combined.draw_runs
+    combined.draw_runs = shared_text.draw_runs
+    try:
+        yield shared_text
+    finally:
+        combined.draw_runs = original
+
+
+def read_bytes(*parts):
+    with open(os.path.join(ROOT, *parts), 'rb') as f:
+        return f.read()
+
+
+def sample_cases():
+    cases = []
+    for name in (os.path.join("input", "cases_data.json"), "sample_cases_data.json"):
+        loaded, _ = parse_cases(json.loads(read_bytes(name)), name)
+        cases.extend(loaded)
+    return cases
+
+
+def zip_run(cases, pdf_bytes, font_bytes):
+    with StreamingZip() as archive:
+        for result in generate_batch(cases, pdf_bytes, font_bytes, DEFAULT_SPECS, workers=1):
+            archive.add(f"{result.case_id}_filled.pdf", result.pdf)
+        archive.finish()
+        return archive.size
+
+
+def combined_run(cases, pdf_bytes, font_bytes):
+    pdf, _, _ = render_combined(cases, get_compiled_template(pdf_bytes), resolve_font(font_bytes), DEFAULT_SPECS)
+    return len(pdf)
+
+
+def timed(run, *args):
+    start = time.perf_counter()
+    size = run(*args)
+    return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--share-min-chars', type=int, nargs='+', default=[0, 40],
+                        help="Shortest lines shared as Form XObjects, one shared-text run each")
+    args = parser.parse_args()
+
+    pdf_bytes = read_bytes("input", "empty_form.pdf")
+    font_bytes = read_bytes("input", "AzzamHandwriting-Regular.ttf")
+    base_cases = sample_cases()
+
+    # Warm the template and font caches so both paths start equal
+    combined_run(base_cases[:1], pdf_bytes, font_bytes)
+
+    reference = sorted(glob.glob(os.path.join(ROOT, "input", "htn_*.pdf")) + glob.glob(os.path.join(ROOT, "input", "ped_*.pdf")))
+    print(f"reference htn+ped set: {len(reference)} PDFs, {sum(os.path.getsize(p) for p in reference)} bytes")
+
+    for count in args.cases:
+        cases = [base_cases[i % len(base_cases)] for i in range(count)]
+        zip_time, zip_size = timed(zip_run, cases, pdf_bytes, font_bytes)
+        combined_time, combined_size = timed(combined_run, cases, pdf_bytes, font_bytes)
+        print(f"{count:6d} cases  zip: {zip_time:7.2f}s {zip_size:12d} bytes   "
+              f"combined: {combined_time:7.2f}s {combined_size:10d} bytes   "
+              f"({zip_time / combined_time:.1f}x faster, {zip_size / combined_size:.1f}x smaller)")
+
+        for min_chars in args.share_min_chars:
+            with drawing_shared(SharedText(min_chars=min_chars)) as shared_text:
+                shared_time, shared_size = timed(combined_run, cases, pdf_bytes, font_bytes)
+            print(f"{'':6}        shared text >= {min_chars:3d} chars: {shared_time:7.2f}s {shared_size:10d} bytes   "
+                  f"{shared_text.shared}/{shared_text.lines} lines from {len(shared_text.forms)} forms "
+                  f"(dedup {shared_text.dedup_ratio:.1f}x), saved {combined_size - shared_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Batch case normalization vs transform_case_format one case at a time
+
+Writes a synthetic case file, decodes it once and times a per-dict loop
+over transform_case_format against case_columns over the whole table. A
+set of edge cases (missing keys, non-list EPA values, reflections without
+'Did well:', non-binary, non-string values that make
+transform_case_format raise) must give the same results or the same
+errors through normalize_batches. Also times loading the whole file into
+a CaseStore both ways: from one dict per case (CaseStore.from_cases over
+CaseFile) and with the normalized columns extended straight into the
+store's columns (load_case_store). Both stores must hold every case as
+transform_case_format gives it, with the same key order. Exits with
+status 1 on any mismatch.
+
+    python benchmarks/bench_normalize.py --cases 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from handwriting_tool.cases import BATCH_SIZE, case_columns, case_dicts, normalize_batches, transform_case_format
+from handwriting_tool.ingest import CaseFile
+from handwriting_tool.store import CaseStore, load_case_store
+from synthetic import make_cases
+
+EDGE_CASES = [
+    {},
+    {"Date": "2025-01-02"},
+    {"Age & Gender": "no digits, nonbinary"},
+    {"Age & Gender": "34 y/o Non-Binary"},
+    {"Age & Gender": "7 yo FEMALE", "Main theme of the case": "Croup / stridor at night with fever"},
+    {"Age & Gender": "unknown"},
+    {"Self Reflection": "Just a note"},
+    {"Self Reflection": "Did well: history Plan: reread"},
+    {"Self Reflection": "Did well: a Needs work: b Needs work: c Plan: d"},
+    {"Self Reflection": "Needs work: only Did well: later"},
+    {"EPA tested": "3", "Rubric": "Level B", "Strength points": None, "Points needing improvement": {}},
+    {"EPA tested": [1, 2.5, True, "EPA 4", None]},
+    {"Date": "", "Main theme of the case": ""},
+    {"Date": "2025-03-04", "Case Summary": ["not", "text"], "Signature of the MI": 7},
+    {"Date": 20250304},
+    {"Age & Gender": 42},
+    {"Main theme of the case": ["a", "b"]},
+    {"Self Reflection": ["Did well:", "x"]},
+    {"Date": None, "Main theme of the case": "Theme"},
+]
+
+
+def reference(cases):
+    """transform_case_format per case: (result or None, error text or None)"""
+    results = []
+    for case in cases:
+        try:
+            results.append((transform_case_format(case), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def ordered(value):
+    """Value with every dict turned into its item list, so key order is compared too"""
+    if isinstance(value, dict):
+        return [(key, ordered(item)) for key, item in value.items()]
+    if isinstance(value, list):
+        return [ordered(item) for item in value]
+    return value
+
+
+def check_edge_cases():
+    problems = []
+    # Results and errors of the batched loader line up with the per-case ones
+    errors = []
+    normalized = [
+        case for columns, cases in normalize_batches(EDGE_CASES, errors, from_cases_array=True)
+        for case in (case_dicts(columns) if cases is None else cases)
+    ]
+    expected = [result for result, _ in reference(EDGE_CASES) if result is not None]
+    expected_errors = [f"Case {i+1} transformation error: {error}"
+                       for i, (_, error) in enumerate(reference(EDGE_CASES)) if error is not None]
+    if ordered(normalized) != ordered(expected) or errors != expected_errors:
+        problems.append(f"normalize_batches: {errors} != {expected_errors}")
+    return problems
+
+
+def best_of(runs, function):
+    """(result, fastest seconds)"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--summary', choices=("short", "long"), default="short")
+    parser.add_argument('--runs', type=int, default=3, help="Timed runs per method; the fastest counts")
+    args = parser.parse_args()
+
+    problems = check_edge_cases()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cases_data.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"cases": make_cases(args.cases, args.summary)}, f)
+        with open(path, 'r', encoding='utf-8') as f:
+            raw_cases = json.load(f)["cases"]
+
+        per_case, per_case_time = best_of(args.runs, lambda: [transform_case_format(case) for case in raw_cases])
+        _, columns_only_time = best_of(args.runs, lambda: [
+            case_columns(raw_cases[start:start + BATCH_SIZE]) for start in range(0, len(raw_cases), BATCH_SIZE)
+        ])
+        from_dicts, dicts_time = best_of(args.runs, lambda: CaseStore.from_cases(CaseFile(path)))
+        from_columns, columns_time = best_of(args.runs, lambda: load_case_store(path))
+
+    if ordered(list(from_columns)) != ordered(per_case) or ordered(list(from_dicts)) != ordered(per_case):
+        problems.append("stored cases differ from transform_case_format")
+
+    count = len(raw_cases)
+    print(f"{count} {args.summary} cases, {len(EDGE_CASES)} edge cases")
+    print(f"{'':<34}{'s':>8}{'cases/s':>12}")
+    rows = (
+        ("transform_case_format per case", per_case_time),
+        ("case_columns (no dicts)", columns_only_time),
+        ("file -> store, dict per case", dicts_time),
+        ("file -> store, columns", columns_time),
+    )
+    for name, seconds in rows:
+        print(f"{name:<34}{seconds:8.3f}{count / seconds:12.0f}")
+    print(f"Normalize to columns: {per_case_time / columns_only_time:.2f}x, "
+          f"load into a store: {dicts_time / columns_time:.2f}x")
+    for problem in problems:
+        print(f"MISMATCH {problem}", file=sys.stderr)
+    if problems:
+        return 1
+    print("All cases match transform_case_format")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
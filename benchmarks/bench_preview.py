@@ -0,0 +1,109 @@
+"""Preview repaint cost: re-encoding the page background vs the cached encoding
+
+Times one positioning rerun the way create_visual_preview builds it - the
+background data URI, a Plotly figure with a rectangle and label per field,
+and the figure JSON Streamlit sends to the browser.
+
+    python benchmarks/bench_preview.py --reruns 20
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+import numpy as np
+import plotly.graph_objects as go
+from PIL import Image
+
+from handwriting_tool.preview import PREVIEW_FORMATS, encode_background
+from handwriting_tool.specs import DEFAULT_SPECS
+
+DPI = 150
+
+
+def page_raster(pdf_bytes, page_num):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+        pix = pdf_doc.load_page(page_num - 1).get_pixmap(matrix=fitz.Matrix(DPI/72, DPI/72))
+        return np.array(Image.open(BytesIO(pix.tobytes("ppm"))))
+
+
+def legacy_background(img):
+    """The previous per-rerun encoding: full-size PNG, base64"""
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format='PNG')
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def legacy_figure(background, img, specs):
+    """The previous figure build: one add_shape/add_annotation call per field"""
+    img_height, img_width = img.shape[:2]
+    fig = go.Figure()
+    fig.add_layout_image(dict(source=background, xref="x", yref="y", x=0, y=img_height,
+                              sizex=img_width, sizey=img_height, sizing="stretch", layer="below"))
+    for field_name, spec in specs.items():
+        x_px, w_px, h_px = spec['x'] * DPI, spec['w'] * DPI, spec['h'] * DPI
+        y_px = img_height - (spec['y'] + spec['h']) * DPI
+        fig.add_shape(type="rect", x0=x_px, y0=y_px, x1=x_px + w_px, y1=y_px + h_px,
+                      line=dict(color='red', width=2), fillcolor='red', opacity=0.3, layer="above")
+        fig.add_annotation(x=x_px + w_px/2, y=y_px + h_px/2, text=f"<b>{field_name}</b>", showarrow=False)
+    fig.update_layout(xaxis=dict(range=[0, img_width]), yaxis=dict(range=[0, img_height]))
+    return fig
+
+
+def layered_figure(background, img, specs):
+    """The current figure build: all field rectangles passed in one layout"""
+    img_height, img_width = img.shape[:2]
+    images = [dict(source=background, xref="x", yref="y", x=0, y=img_height,
+                   sizex=img_width, sizey=img_height, sizing="stretch", layer="below")]
+    shapes = []
+    annotations = []
+    for field_name, spec in specs.items():
+        x_px, w_px, h_px = spec['x'] * DPI, spec['w'] * DPI, spec['h'] * DPI
+        y_px = img_height - (spec['y'] + spec['h']) * DPI
+        shapes.append(dict(type="rect", x0=x_px, y0=y_px, x1=x_px + w_px, y1=y_px + h_px,
+                           line=dict(color='red', width=2), fillcolor='red', opacity=0.3, layer="above"))
+        annotations.append(dict(x=x_px + w_px/2, y=y_px + h_px/2, text=f"<b>{field_name}</b>", showarrow=False))
+    fig = go.Figure(layout=dict(images=images, shapes=shapes, annotations=annotations))
+    fig.update_layout(xaxis=dict(range=[0, img_width]), yaxis=dict(range=[0, img_height]))
+    return fig
+
+
+def time_reruns(make_background, build_figure, img, specs, reruns):
+    start = time.perf_counter()
+    for _ in range(reruns):
+        payload = build_figure(make_background(), img, specs).to_json()
+    return (time.perf_counter() - start) / reruns, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--template', default=os.path.join(ROOT, "input", "empty_form.pdf"))
+    parser.add_argument('--page', type=int, default=1, choices=(1, 2))
+    parser.add_argument('--reruns', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.template, 'rb') as f:
+        img = page_raster(f.read(), args.page)
+    specs = DEFAULT_SPECS[f"page{args.page}"]
+    print(f"Page {args.page}: {img.shape[1]}x{img.shape[0]} px at {DPI} DPI, {len(specs)} fields")
+
+    per_rerun, payload = time_reruns(lambda: legacy_background(img), legacy_figure, img, specs, args.reruns)
+    print(f"{'before: re-encode PNG, add_shape':<34} {per_rerun * 1000:8.1f} ms/rerun  {payload / 1e6:6.2f} MB sent")
+
+    for key in PREVIEW_FORMATS:
+        start = time.perf_counter()
+        background = encode_background(img, key)
+        encode_time = time.perf_counter() - start
+        per_rerun, payload = time_reruns(lambda: background, layered_figure, img, specs, args.reruns)
+        print(f"{'cached ' + key + ', one layout':<34} {per_rerun * 1000:8.1f} ms/rerun  {payload / 1e6:6.2f} MB sent"
+              f"  (encoded once in {encode_time * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Per-case merge cost: re-parsing the blank form vs the compiled template
+
+Run from the repository root:
+
+    python benchmarks/bench_template.py --cases 50
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+from handwriting_tool.template import CompiledTemplate
+
+INPUT_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "input")
+
+
+def make_overlay(page_width, page_height, case_num):
+    """Small two-page overlay similar to one filled case"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(page_width, page_height))
+    c.setFont('Helvetica', 18)
+    for row in range(8):
+        c.drawString(60, page_height - 150 - row * 40, f"Case {case_num} page 1 line {row}")
+    c.showPage()
+    c.setFont('Helvetica', 16)
+    for row in range(16):
+        c.drawString(60, page_height - 120 - row * 30, f"Case {case_num} cell {row}")
+    c.save()
+    return buffer.getvalue()
+
+
+def legacy_fill(pdf_bytes, case_num):
+    """The previous create_filled_pdf pipeline: two parses plus merge_page"""
+    first_page = PdfReader(BytesIO(pdf_bytes)).pages[0]
+    overlay_bytes = make_overlay(float(first_page.mediabox.width), float(first_page.mediabox.height), case_num)
+
+    original_pdf = PdfReader(BytesIO(pdf_bytes))
+    overlay_pdf = PdfReader(BytesIO(overlay_bytes))
+    writer = PdfWriter()
+    for page_num in range(len(original_pdf.pages)):
+        page = original_pdf.pages[page_num]
+        if page_num < len(overlay_pdf.pages):
+            page.merge_page(overlay_pdf.pages[page_num])
+        writer.add_page(page)
+    output_buffer = BytesIO()
+    writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def compiled_fill(template, case_num):
+    overlay_bytes = make_overlay(template.page_width, template.page_height, case_num)
+    return template.merge(overlay_bytes)
+
+
+def time_per_case(fill, cases):
+    start = time.perf_counter()
+    for case_num in range(cases):
+        output = fill(case_num)
+    return (time.perf_counter() - start) / cases, len(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--template', default=os.path.join(INPUT_FOLDER, "empty_form.pdf"))
+    parser.add_argument('--cases', type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.template, 'rb') as f:
+        pdf_bytes = f.read()
+
+    start = time.perf_counter()
+    template = CompiledTemplate(pdf_bytes)
+    compile_time = time.perf_counter() - start
+
+    before, before_size = time_per_case(lambda n: legacy_fill(pdf_bytes, n), args.cases)
+    after, after_size = time_per_case(lambda n: compiled_fill(template, n), args.cases)
+
+    print(f"template compile (once): {compile_time * 1000:8.2f} ms")
+    print(f"before: {before * 1000:8.2f} ms/case  ({before_size} bytes)")
+    print(f"after:  {after * 1000:8.2f} ms/case  ({after_size} bytes)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
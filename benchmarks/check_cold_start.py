@@ -0,0 +1,144 @@
+"""Cold-start budget: app import time, first script run and deferred modules
+
+Every sample runs in a fresh interpreter, the way an autoscaled container
+starts. One probe imports app.py in Streamlit bare mode and lists the heavy
+modules that import pulled in; another executes the whole script once with
+streamlit.testing's AppTest (data load, page 1 preview, sidebar, tools).
+Streamlit's own import is measured too but not budgeted.
+
+The medians are checked against benchmarks/cold_start_budget.json: the
+script exits with status 1 when either time is over budget or importing the
+app loads a module that should only be imported on use. The budget keeps
+the Streamlit import time it was written with; on a machine where
+Streamlit imports slower or faster, the time budgets scale with it, so the
+same file works on a laptop and a CI runner. CI runs this on every push.
+
+    python benchmarks/check_cold_start.py
+    python benchmarks/check_cold_start.py --samples 9 --write-budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cold_start_budget.json")
+
+# Budget = measured median * (1 + HEADROOM) when written with --write-budget
+HEADROOM = 0.5
+
+IMPORT_PROBE = """
+import json, logging, sys, time
+start = time.perf_counter()
+import streamlit
+from streamlit import logger
+logger.set_log_level(logging.ERROR)
+streamlit_done = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+app_done = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_ms": (streamlit_done - start) * 1000,
+    "app_import_ms": (app_done - streamlit_done) * 1000,
+    "modules": sorted(name for name in sys.modules if "." not in name),
+}}))
+"""
+
+RUN_PROBE = """
+import json, logging, time
+from streamlit.testing.v1 import AppTest
+from streamlit import logger
+logger.set_log_level(logging.ERROR)
+at = AppTest.from_file({app!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+print(json.dumps({{
+    "first_run_ms": first * 1000,
+    "rerun_ms": (time.perf_counter() - start) * 1000,
+    "exceptions": [str(e.value) for e in at.exception],
+}}))
+"""
+
+
+def probe(code, cwd):
+    """Run code in a fresh interpreter and return the JSON it prints last"""
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(root, samples):
+    app_path = os.path.join(root, "app.py")
+    imports = [probe(IMPORT_PROBE.format(root=root), root) for _ in range(samples)]
+    runs = [probe(RUN_PROBE.format(app=app_path), root) for _ in range(samples)]
+    exceptions = sorted({e for run in runs for e in run["exceptions"]})
+    if exceptions:
+        raise SystemExit(f"app.py raised on its first run: {exceptions}")
+    return {
+        "samples": samples,
+        "streamlit_import_ms": round(statistics.median(s["streamlit_import_ms"] for s in imports), 1),
+        "app_import_ms": round(statistics.median(s["app_import_ms"] for s in imports), 1),
+        "first_run_ms": round(statistics.median(r["first_run_ms"] for r in runs), 1),
+        "rerun_ms": round(statistics.median(r["rerun_ms"] for r in runs), 1),
+        "modules": imports[0]["modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=ROOT, help="Checkout whose app.py is measured")
+    parser.add_argument('--samples', type=int, default=5, help="Fresh interpreters per probe")
+    parser.add_argument('--budget', default=BUDGET_FILE)
+    parser.add_argument('--write-budget', action='store_true',
+                        help=f"Store the measured medians plus {HEADROOM:.0%} headroom as the new budget")
+    parser.add_argument('--out', help="Also write the measurements as JSON here")
+    args = parser.parse_args()
+
+    results = measure(os.path.abspath(args.root), args.samples)
+    for name in ("streamlit_import_ms", "app_import_ms", "first_run_ms", "rerun_ms"):
+        print(f"{name:<22} {results[name]:10.1f}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+
+    if args.write_budget:
+        for name in ("app_import_ms", "first_run_ms"):
+            budget[name] = round(results[name] * (1 + HEADROOM))
+        budget["streamlit_import_ms"] = results["streamlit_import_ms"]
+        with open(args.budget, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"Budget written to {args.budget}")
+
+    # This machine's speed relative to the one the budget was written on
+    scale = results["streamlit_import_ms"] / budget["streamlit_import_ms"] if budget.get("streamlit_import_ms") else 1.0
+    if scale != 1.0:
+        print(f"Budgets scaled by {scale:.2f} for this machine's Streamlit import time")
+    problems = []
+    for name in ("app_import_ms", "first_run_ms"):
+        limit = budget[name] * scale
+        if results[name] > limit:
+            problems.append(f"{name} {results[name]:.1f} ms is over the {limit:.0f} ms budget")
+    loaded = sorted(set(budget["deferred_modules"]) & set(results["modules"]))
+    if loaded:
+        problems.append(f"importing app.py loads {', '.join(loaded)}, which should be imported on use")
+
+    for problem in problems:
+        print(f"OVER BUDGET: {problem}", file=sys.stderr)
+    if problems:
+        return 1
+    print(f"Within budget ({args.budget})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
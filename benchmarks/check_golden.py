@@ -0,0 +1,274 @@
+"""Golden-image regression check: rendered pages vs stored low-DPI rasters
+
+Renders the bundled sample cases and a few long synthetic ones with a
+backend, rasterizes every page in grayscale with PyMuPDF at the golden DPI
+and compares it to the PNGs in benchmarks/golden. A pixel differs when its
+gray level moved by more than the pixel threshold; differing pixels are
+counted per field box (from the default positions) with one summed-area
+table per page, plus the pixels outside every box. A field fails when its
+share of differing pixels is over its tolerance, the rest of the page when
+its share is over the 'outside' tolerance. Tolerances live in
+golden/manifest.json and can be set per field name. At the default 48 DPI
+a field moved by 2 points or more fails; write the goldens with a higher
+--dpi to catch smaller moves.
+
+For every failing page a heatmap PNG is written: the golden page faded,
+ink that appeared in red, ink that disappeared in blue, failing boxes
+outlined. Exits with status 1 when anything fails. CI runs it on every
+push.
+
+--update only writes goldens where none exist yet; replacing existing ones
+also takes --accept, after the heatmaps of the failing check have been
+reviewed. The manifest records the backend and the git commit (marked
+dirty when the tree had uncommitted changes) that the goldens came from.
+
+    python benchmarks/check_golden.py
+    python benchmarks/check_golden.py --backend pymupdf
+    python benchmarks/check_golden.py --update --accept     # after reviewing an intended change
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageDraw
+
+from handwriting_tool.backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from handwriting_tool.cases import parse_cases
+from handwriting_tool.specs import DEFAULT_SPECS
+from synthetic import make_cases
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+DEFAULT_OUT = os.path.join(tempfile.gettempdir(), "handwriting_tool-golden-diffs")
+
+# Used when --update writes a manifest for the first time
+DEFAULT_SETTINGS = {
+    "dpi": 48,
+    "pixel_threshold": 48,
+    # Share of a field box's pixels (or of the page outside every box) allowed to differ
+    "tolerances": {"default": 0.02, "outside": 0.0005},
+}
+SYNTHETIC_CASES = 2
+
+
+def golden_cases():
+    """(name, case dict) for every case with a golden, in a fixed order"""
+    with open(os.path.join(ROOT, "input", "cases_data.json"), 'r', encoding='utf-8') as f:
+        cases, _ = parse_cases(json.load(f))
+    named = [(f"input-{i + 1:02d}", case) for i, case in enumerate(cases)]
+    long_cases, _ = parse_cases(make_cases(SYNTHETIC_CASES, "long"))
+    named += [(f"long-{i + 1:02d}", case) for i, case in enumerate(long_cases)]
+    return named
+
+
+def rasterize(pdf_bytes, dpi):
+    """Grayscale uint8 array per page"""
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    pages = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+            pages.append(np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width])
+    return pages
+
+
+def field_boxes(page_specs, dpi, shape):
+    """Field names, their (x0, y0, x1, y1) pixel boxes clipped to the page, and the mask of all boxes"""
+    names = list(page_specs)
+    inches = np.array([[s['x'], s['y'], s['x'] + s['w'], s['y'] + s['h']] for s in page_specs.values()])
+    boxes = np.rint(inches * dpi).astype(np.intp)
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    covered = np.zeros(shape, dtype=bool)
+    for x0, y0, x1, y1 in boxes:
+        covered[y0:y1, x0:x1] = True
+    return names, boxes, covered
+
+
+def compare_page(actual, golden, names, boxes, covered, settings):
+    """(differing pixel mask, per-box counts, per-box limits, outside count and limit, failing names)"""
+    tolerances = settings["tolerances"]
+    if actual.shape != golden.shape:
+        return None, None, None, None, None, [f"page size {actual.shape} != golden {golden.shape}"]
+
+    diff = np.abs(actual.astype(np.int16) - golden.astype(np.int16)) > settings["pixel_threshold"]
+
+    # Differing pixels in every box at once from one summed-area table
+    table = np.zeros((diff.shape[0] + 1, diff.shape[1] + 1), dtype=np.int32)
+    table[1:, 1:] = diff.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+    x0, y0, x1, y1 = boxes.T
+    counts = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+    areas = (x1 - x0) * (y1 - y0)
+    shares = np.array([tolerances.get(name, tolerances["default"]) for name in names])
+    limits = np.floor(areas * shares)
+
+    outside = int(np.count_nonzero(diff & ~covered))
+    outside_limit = int((covered.size - np.count_nonzero(covered)) * tolerances["outside"])
+
+    failing = [name for name, count, limit in zip(names, counts, limits) if count > limit]
+    if outside > outside_limit:
+        failing.append("outside")
+    return diff, counts, limits, (outside, outside_limit), failing
+
+
+def write_heatmap(path, actual, golden, diff, failing_boxes):
+    """Faded golden page, new ink red, lost ink blue, failing boxes outlined"""
+    faded = (255 - (255 - golden.astype(np.uint16)) * 2 // 5).astype(np.uint8)
+    rgb = np.repeat(faded[:, :, None], 3, axis=2)
+    darker = diff & (actual < golden)
+    rgb[darker] = (220, 30, 30)
+    rgb[diff & ~darker] = (30, 80, 220)
+    image = Image.fromarray(rgb)
+    draw = ImageDraw.Draw(image)
+    for x0, y0, x1, y1 in failing_boxes:
+        draw.rectangle((x0, y0, max(x0, x1 - 1), max(y0, y1 - 1)), outline=(255, 140, 0))
+    image.save(path)
+
+
+def golden_path(name, page_num):
+    return os.path.join(GOLDEN_DIR, f"{name}-p{page_num}.png")
+
+
+def load_manifest():
+    path = os.path.join(GOLDEN_DIR, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def source_commit():
+    """HEAD of the checkout, with '-dirty' when it has uncommitted changes; None outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if status.strip() else commit
+
+
+def update(backend, renderer, settings, cases):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    pages = {}
+    for name, case in cases:
+        rasters = rasterize(renderer.render(case), settings["dpi"])
+        for page_num, raster in enumerate(rasters, 1):
+            Image.fromarray(raster).save(golden_path(name, page_num), optimize=True)
+        pages[name] = len(rasters)
+    manifest = dict(settings, backend=backend, commit=source_commit(), pages=pages)
+    with open(os.path.join(GOLDEN_DIR, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {sum(pages.values())} golden pages for {len(pages)} cases to {GOLDEN_DIR}")
+    return 0
+
+
+def check(backend, renderer, manifest, cases, out_dir):
+    page_specs = (DEFAULT_SPECS['page1'], DEFAULT_SPECS['page2'])
+    boxes_by_page = {}
+    failures = []
+    timings = {"render": 0.0, "rasterize": 0.0, "compare": 0.0}
+    checked = 0
+
+    for name, case in cases:
+        start = time.perf_counter()
+        pdf = renderer.render(case)
+        timings["render"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rasters = rasterize(pdf, manifest["dpi"])
+        timings["rasterize"] += time.perf_counter() - start
+
+        expected_pages = manifest["pages"].get(name)
+        if expected_pages != len(rasters):
+            failures.append(f"{name}: {len(rasters)} pages, golden has {expected_pages}")
+            continue
+
+        for page_index, actual in enumerate(rasters):
+            page_num = page_index + 1
+            golden = np.asarray(Image.open(golden_path(name, page_num)).convert("L"))
+            start = time.perf_counter()
+            key = (page_index, golden.shape)
+            if key not in boxes_by_page:
+                boxes_by_page[key] = field_boxes(page_specs[min(page_index, 1)], manifest["dpi"], golden.shape)
+            names, boxes, covered = boxes_by_page[key]
+            diff, counts, limits, outside, failing = compare_page(actual, golden, names, boxes, covered, manifest)
+            timings["compare"] += time.perf_counter() - start
+            checked += 1
+            if not failing:
+                continue
+
+            if diff is None:
+                failures.append(f"{name} page {page_num}: {failing[0]}")
+                continue
+            details = [
+                f"{field} {count}/{int(limit)} px" for field, count, limit in zip(names, counts, limits) if field in failing
+            ]
+            if "outside" in failing:
+                details.append(f"outside boxes {outside[0]}/{outside[1]} px")
+            os.makedirs(out_dir, exist_ok=True)
+            heatmap = os.path.join(out_dir, f"{name}-p{page_num}-{backend}.png")
+            write_heatmap(heatmap, actual, golden, diff, boxes[[names.index(f) for f in failing if f in names]])
+            failures.append(f"{name} page {page_num}: {', '.join(details)}\n    heatmap: {heatmap}")
+
+    total = sum(timings.values())
+    print(f"{checked} pages of {len(cases)} cases checked with {backend} at {manifest['dpi']} DPI "
+          f"in {total * 1000:.0f} ms (render {timings['render'] * 1000:.0f}, "
+          f"rasterize {timings['rasterize'] * 1000:.0f}, compare {timings['compare'] * 1000:.0f})")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        return 1
+    print("All pages match their goldens")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=list(BACKENDS), default=None,
+                        help="Backend to check (default: the one the goldens were written with)")
+    parser.add_argument('--update', action='store_true', help="Write the goldens from the current output")
+    parser.add_argument('--accept', action='store_true',
+                        help="With --update, replace existing goldens (review the failing check's heatmaps first)")
+    parser.add_argument('--dpi', type=int, help="Golden resolution, with --update (default: the current one, or 48)")
+    parser.add_argument('--out', default=DEFAULT_OUT, help="Folder for heatmaps of failing pages")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    backend = args.backend or (manifest or {}).get("backend", DEFAULT_BACKEND)
+    with open(os.path.join(ROOT, "input", "empty_form.pdf"), 'rb') as f:
+        pdf_bytes = f.read()
+    with open(os.path.join(ROOT, "input", "AzzamHandwriting-Regular.ttf"), 'rb') as f:
+        font_bytes = f.read()
+    renderer = get_backend(backend, pdf_bytes, font_bytes, DEFAULT_SPECS)
+    cases = golden_cases()
+
+    if args.update:
+        if manifest is not None and not args.accept:
+            print(f"Goldens in {GOLDEN_DIR} were written from {manifest.get('commit') or 'an unrecorded commit'} "
+                  f"with {manifest.get('backend')}; run the check, review its heatmaps and rerun with "
+                  f"--update --accept to replace them", file=sys.stderr)
+            return 1
+        settings = {key: (manifest or DEFAULT_SETTINGS)[key] for key in DEFAULT_SETTINGS}
+        if args.dpi:
+            settings["dpi"] = args.dpi
+        return update(backend, renderer, settings, cases)
+    if manifest is None:
+        print(f"No goldens in {GOLDEN_DIR}; write them with --update", file=sys.stderr)
+        return 1
+    return check(backend, renderer, manifest, cases, args.out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Check that handwriting_tool.layout wraps exactly like the old draw_text loop
+
+Wraps every text field of the bundled sample cases (plus long synthetic
+summaries) at every configured field width, with the handwriting font and
+the Helvetica fallback, and compares against the original stringWidth
+loop. Then checks the pieces the wrap is built from: GlyphAdvances widths
+against stringWidth, fitted_font_size against a linear scan of the sizes,
+and that warm wrap_text and fitted_font_size caches return what a cold
+call does for every font, size and box. Exits non-zero when anything
+differs and prints the timings; CI runs it on every push.
+
+    python benchmarks/check_layout.py
+"""
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.pdfbase import pdfmetrics
+
+from handwriting_tool.cases import parse_cases
+from handwriting_tool.fonts import register_font
+from handwriting_tool.layout import (
+    FIT_STEP, MIN_FONT_SIZE, _fitted_font_size, field_fit, fitted_font_size, get_advances, wrap_text
+)
+from handwriting_tool.specs import DEFAULT_SPECS
+
+
+def legacy_wrap(text, font_name, font_size, w_pts):
+    """The word-wrap loop draw_text used before the layout module"""
+    words = text.split()
+    lines = []
+    current_line = ""
+
+    for word in words:
+        test_line = f"{current_line} {word}".strip()
+        text_width = pdfmetrics.stringWidth(test_line, font_name, font_size)
+
+        if text_width <= w_pts - 10:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+
+    if current_line:
+        lines.append(current_line)
+    return tuple(lines)
+
+
+def case_texts(case):
+    reflection = case.get('self_reflection', {}) or {}
+    epa = case.get('epa_assessment', {}) or {}
+    yield case.get('main_theme', '')
+    yield case.get('case_summary', '')
+    yield case.get('age_gender', '')
+    yield reflection.get('what_did_right', '')
+    yield reflection.get('needs_development', '')
+    yield case.get('signature_mi', '')
+    for key in ('epa_tested', 'rubric_levels', 'strength_points', 'points_needing_improvement'):
+        for item in epa.get(key, []) or []:
+            yield str(item)
+
+
+def load_texts():
+    texts = []
+    for name in (os.path.join("input", "cases_data.json"), "sample_cases_data.json"):
+        with open(os.path.join(ROOT, name), 'r', encoding='utf-8') as f:
+            cases, _ = parse_cases(json.load(f), name)
+        for case in cases:
+            texts.extend(str(t).strip() for t in case_texts(case) if t)
+
+    # Worst case: very long summaries, unicode punctuation, overlong words
+    base = " ".join(texts)
+    texts.append(base)
+    texts.append((base + " ") * 5)
+    texts.append("Traveler’s diarrhea — “quoted” " + "x" * 400 + " tail words here")
+    return texts
+
+
+def linear_fit(text, spec, font_name):
+    """fitted_font_size by trying every size from the largest down"""
+    size = spec['font']
+    if size <= MIN_FONT_SIZE or not field_fit(text, spec, font_name, size):
+        return size
+    steps = int((size - MIN_FONT_SIZE) / FIT_STEP)
+    if MIN_FONT_SIZE + steps * FIT_STEP >= size:
+        steps -= 1
+    for step in range(steps, 0, -1):
+        if not field_fit(text, spec, font_name, MIN_FONT_SIZE + step * FIT_STEP):
+            return MIN_FONT_SIZE + step * FIT_STEP
+    return MIN_FONT_SIZE
+
+
+def check_advances(fonts, texts):
+    """GlyphAdvances.width matches stringWidth; returns the mismatches"""
+    problems = []
+    for font_name in fonts:
+        advances = get_advances(font_name)
+        for text in texts:
+            for font_size in (6, 9.5, 12, 24):
+                expected = pdfmetrics.stringWidth(text, font_name, font_size)
+                actual = advances.width(text, font_size)
+                if actual != expected:
+                    problems.append(f"width font={font_name} size={font_size}: {actual} != {expected} for {text[:60]!r}")
+    return problems
+
+
+def check_fit(fonts, texts):
+    """fitted_font_size matches a linear scan, cold and warm; returns the mismatches"""
+    specs = [spec for page in DEFAULT_SPECS.values() for spec in page.values()]
+    problems = []
+    for font_name in fonts:
+        for spec in specs:
+            for text in texts[:40] + texts[-3:]:
+                expected = linear_fit(text, spec, font_name)
+                _fitted_font_size.cache_clear()
+                cold = fitted_font_size(text, spec, font_name)
+                if cold != expected:
+                    problems.append(f"fit font={font_name} box={spec}: {cold} != {expected} for {text[:60]!r}")
+    # Warm: every (text, font, box) cached together, each must still get its own answer
+    for font_name in fonts:
+        for spec in specs:
+            for text in texts[:40] + texts[-3:]:
+                if fitted_font_size(text, spec, font_name) != linear_fit(text, spec, font_name):
+                    problems.append(f"cached fit font={font_name} box={spec}: wrong size for {text[:60]!r}")
+    return problems
+
+
+def check_wrap_cache(fonts, boxes, texts):
+    """Warm wrap_text calls return what cold ones do; returns the mismatches"""
+    expected = {}
+    for font_name in fonts:
+        for w_pts, font_size in boxes:
+            for text in texts:
+                wrap_text.cache_clear()
+                expected[text, font_name, font_size, w_pts] = wrap_text(text, font_name, font_size, w_pts)
+    # Fill the cache with every combination, then read them all back
+    wrap_text.cache_clear()
+    for key in expected:
+        wrap_text(*key)
+    return [
+        f"cached wrap font={key[1]} size={key[2]} width={key[3]}: {key[0][:60]!r}"
+        for key, lines in expected.items() if wrap_text(*key) != lines
+    ]
+
+
+def main():
+    with open(os.path.join(ROOT, "input", "AzzamHandwriting-Regular.ttf"), 'rb') as f:
+        fonts = [register_font(f.read()), 'Helvetica']
+
+    boxes = {(spec['w'] * 72, spec['font']) for page in DEFAULT_SPECS.values() for spec in page.values()}
+    texts = load_texts()
+
+    checked = 0
+    legacy_time = new_time = 0.0
+    for font_name in fonts:
+        for w_pts, font_size in sorted(boxes):
+            for text in texts:
+                start = time.perf_counter()
+                expected = legacy_wrap(text, font_name, font_size, w_pts)
+                legacy_time += time.perf_counter() - start
+
+                wrap_text.cache_clear()
+                start = time.perf_counter()
+                actual = wrap_text(text, font_name, font_size, w_pts)
+                new_time += time.perf_counter() - start
+
+                if actual != expected:
+                    print(f"MISMATCH font={font_name} size={font_size} width={w_pts}: {text[:60]!r}")
+                    return 1
+                checked += 1
+
+    print(f"{checked} wraps identical")
+    print(f"legacy loop: {legacy_time * 1000:8.1f} ms")
+    print(f"layout (uncached): {new_time * 1000:8.1f} ms  ({legacy_time / new_time:.1f}x)")
+
+    problems = check_advances(fonts, texts) + check_fit(fonts, texts) + check_wrap_cache(fonts, sorted(boxes), texts)
+    for problem in problems[:20]:
+        print(f"MISMATCH {problem}")
+    if problems:
+        print(f"{len(problems)} mismatches in glyph advances, auto-fit or the layout caches")
+        return 1
+    print("Glyph advances, auto-fit sizes and cached layouts match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Localhost load test of the render service: latency percentiles, throughput, identical PDFs
+
+Starts the service of handwriting_tool.service on a free port in this
+process (or uses --url), then sends every synthetic case as a POST
+/render from --concurrency client threads, each on its own keep-alive
+connection. Cases are sent in the export format of a cases file. Every
+response must be byte-identical to the PDF the same backend renders in
+this process for the normalized case with the default positions. The
+script exits with status 1 when one is not, or when a request fails.
+
+Client latency percentiles and throughput are printed per concurrency,
+next to the mean micro-batch size and the server's own queue and render
+percentiles from GET /metrics. --compare also runs every level with
+micro-batching off (--max-batch 1) on a fresh service.
+
+    python benchmarks/load_service.py --cases 200 --concurrency 1 8 32
+    python benchmarks/load_service.py --workers 4 --compare
+    python benchmarks/load_service.py --url http://127.0.0.1:8750 --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from handwriting_tool.backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from handwriting_tool.cases import parse_cases
+from handwriting_tool.metrics import percentiles
+from handwriting_tool.service import DEFAULT_BATCH_WAIT, DEFAULT_MAX_BATCH, DEFAULT_MAX_QUEUE, RenderService, make_server
+from handwriting_tool.specs import DEFAULT_SPECS
+from synthetic import make_cases
+
+def get_json(address, path):
+    connection = http.client.HTTPConnection(*address, timeout=60)
+    try:
+        connection.request("GET", path)
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def send_all(address, bodies, expected, concurrency):
+    """(latencies in seconds, failures, wall seconds) of posting every body from concurrency threads"""
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    next_index = iter(range(len(bodies)))
+
+    def client():
+        connection = http.client.HTTPConnection(*address, timeout=120)
+        try:
+            while True:
+                with lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    connection.request("POST", "/render", bodies[index], {"Content-Type": "application/json"})
+                    response = connection.getresponse()
+                    pdf = response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    with lock:
+                        failures.append(f"case {index + 1}: {e!r}")
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status != 200:
+                        failures.append(f"case {index + 1}: HTTP {response.status} {pdf[:200]!r}")
+                    elif pdf != expected[index]:
+                        failures.append(f"case {index + 1}: PDF differs from the direct render")
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - start
+
+
+def run_levels(address, label, bodies, expected, levels):
+    """One printed row per concurrency level; returns every failure"""
+    failures = []
+    for concurrency in levels:
+        before = get_json(address, "/metrics")
+        latencies, found, wall = send_all(address, bodies, expected, concurrency)
+        after = get_json(address, "/metrics")
+        failures += found
+        client = {name: value * 1000 for name, value in percentiles(latencies).items()}
+        batches = after["batches"] - before["batches"]
+        served = after["requests"] - before["requests"]
+        server = after["latency_ms"]
+        print(f"{label:<10}{concurrency:>6}{len(latencies) / wall:9.1f}"
+              f"{client['p50']:8.1f}{client['p90']:8.1f}{client['p95']:8.1f}{client['p99']:8.1f}"
+              f"{served / batches if batches else 0:8.2f}{server['queue'].get('p99', 0):9.1f}"
+              f"{server['render'].get('p50', 0):9.1f}{len(found):>6}")
+    return failures
+
+
+def local_service(pdf_bytes, font_bytes, args, max_batch):
+    service = RenderService(pdf_bytes, font_bytes, DEFAULT_SPECS, workers=args.workers, backend=args.backend,
+                            max_batch=max_batch, batch_wait=args.batch_wait_ms / 1000,
+                            max_queue=max(DEFAULT_MAX_QUEUE, *args.concurrency))
+    start = time.perf_counter()
+    service.start()
+    server = make_server(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Service with {service.workers} workers, batches of up to {max_batch}, "
+          f"ready in {time.perf_counter() - start:.2f}s")
+    return service, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=200, help="Synthetic cases sent per concurrency level")
+    parser.add_argument('--summary', choices=("short", "long"), default="short")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help="Client threads per run")
+    parser.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument('--workers', type=int, default=None, help="Service workers (default: CPU count)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--batch-wait-ms', type=float, default=DEFAULT_BATCH_WAIT * 1000)
+    parser.add_argument('--compare', action='store_true', help="Also run with micro-batching off")
+    parser.add_argument('--url', help="Load an already running service (started with the bundled form and font) instead")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "input", "empty_form.pdf"), 'rb') as f:
+        pdf_bytes = f.read()
+    with open(os.path.join(ROOT, "input", "AzzamHandwriting-Regular.ttf"), 'rb') as f:
+        font_bytes = f.read()
+
+    raw_cases = make_cases(args.cases, args.summary)
+    cases, _ = parse_cases(raw_cases)
+    bodies = [json.dumps(case).encode() for case in raw_cases]
+    # The direct render of each case with the default positions
+    renderer = get_backend(args.backend, pdf_bytes, font_bytes, DEFAULT_SPECS)
+    expected = [renderer.render(case) for case in cases]
+
+    header = (f"{'':<10}{'conc':>6}{'req/s':>9}{'p50 ms':>8}{'p90 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"
+              f"{'batch':>8}{'queue99':>9}{'render50':>9}{'fail':>6}")
+    failures = []
+    if args.url:
+        url = urlsplit(args.url)
+        print(header)
+        failures += run_levels((url.hostname, url.port or 80), "service", bodies, expected, args.concurrency)
+    else:
+        runs = [("batched", args.max_batch)] + ([("unbatched", 1)] if args.compare else [])
+        for label, max_batch in runs:
+            service, server = local_service(pdf_bytes, font_bytes, args, max_batch)
+            try:
+                print(header)
+                failures += run_levels(server.server_address[:2], label, bodies, expected, args.concurrency)
+            finally:
+                server.shutdown()
+                server.server_close()
+                service.close()
+
+    for failure in failures[:20]:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        return 1
+    print(f"All {len(bodies) * len(args.concurrency)} responses per run identical to the direct render")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
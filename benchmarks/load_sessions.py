@@ -0,0 +1,153 @@
+"""Concurrent-session load test: resident memory as sessions are added
+
+Each run starts a fresh interpreter that opens sessions of app.py with
+streamlit.testing's AppTest, all held open at once like browser tabs on
+one server process (opened one after another: AppTest is not thread
+safe). Every session loads the inputs, previews page 1 and then page 2. Resident memory (VmRSS, split into
+anonymous and file-backed pages) is read from /proc after the first
+session and after all of them, so the per-session cost is
+(RSS at N - RSS at 1) / (N - 1). It also counts how many distinct
+objects hold the template, font and cases across the sessions: 1 when
+they are shared, N when every session keeps its own copy. RSS moves with
+allocator reuse, so --heap also traces the Python heap grown by sessions 2
+to N (tracemalloc's own overhead then shows up in RSS).
+
+The app runs from a scratch folder that links app.py and handwriting_tool
+from --root next to an input folder with the bundled form and font and,
+with --cases, that many synthetic cases. Point --root at another checkout
+to compare before and after a change. Linux only.
+
+    python benchmarks/load_sessions.py --sessions 1 10 --cases 20000
+    python benchmarks/load_sessions.py --root /tmp/old-checkout --sessions 10
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_cases
+
+INPUT_FILES = ("empty_form.pdf", "AzzamHandwriting-Regular.ttf")
+
+PROBE = """
+import gc, json, logging, sys, tracemalloc
+from streamlit.testing.v1 import AppTest
+from streamlit import logger
+logger.set_log_level(logging.ERROR)
+
+def memory_kb():
+    fields = {{}}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+def open_session(_):
+    at = AppTest.from_file({app!r}, default_timeout=300)
+    at.run()
+    page = [box for box in at.selectbox if "Page 2" in box.options][0]
+    page.set_value("Page 2").run()
+    return at, [str(e.value) for e in at.exception] + [e.value for e in at.error]
+
+sessions = []
+first, problems = open_session(0)
+sessions.append(first)
+one = memory_kb()
+if {heap}:
+    gc.collect()
+    tracemalloc.start()
+for index in range(1, {sessions}):
+    at, found = open_session(index)
+    sessions.append(at)
+    problems += found
+# Distinct objects behind each loaded input across all sessions: 1 when shared
+distinct = {{
+    key: len({{id(at.session_state[key]) for at in sessions if key in at.session_state}})
+    for key in ("pdf_bytes", "font_bytes", "cases_data")
+}}
+gc.collect()
+heap = tracemalloc.get_traced_memory()[0] if {heap} else None
+print(json.dumps({{"one": one, "all": memory_kb(), "heap": heap, "distinct": distinct, "problems": sorted(set(problems))}}))
+"""
+
+
+def make_app_folder(folder, root, cases):
+    """Scratch folder running root's app.py against a generated input folder"""
+    for name in ("app.py", "handwriting_tool"):
+        os.symlink(os.path.join(root, name), os.path.join(folder, name))
+    input_folder = os.path.join(folder, "input")
+    os.mkdir(input_folder)
+    for name in INPUT_FILES:
+        shutil.copy(os.path.join(ROOT, "input", name), input_folder)
+    cases_path = os.path.join(input_folder, "cases_data.json")
+    if cases:
+        with open(cases_path, 'w', encoding='utf-8') as f:
+            json.dump({"cases": make_cases(cases)}, f)
+    else:
+        shutil.copy(os.path.join(ROOT, "input", "cases_data.json"), cases_path)
+    return os.path.join(folder, "app.py")
+
+
+def run(app_path, sessions, heap):
+    code = PROBE.format(app=app_path, sessions=sessions, heap=heap)
+    process = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(app_path), capture_output=True, text=True
+    )
+    if process.returncode:
+        raise SystemExit(f"load test with {sessions} sessions failed:\n{process.stderr[-2000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=ROOT, help="Checkout whose app.py is measured")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[10], help="Concurrent sessions per run")
+    parser.add_argument('--cases', type=int, default=0, help="Synthetic cases instead of the bundled file")
+    parser.add_argument('--heap', action='store_true', help="Also report Python heap growth per session")
+    parser.add_argument('--out', help="Also write the results as JSON here")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        app_path = make_app_folder(folder, os.path.abspath(args.root), args.cases)
+        print(f"{'sessions':>8}{'RSS 1 MB':>10}{'RSS N MB':>10}{'anon N MB':>11}{'file N MB':>11}"
+              f"{'MB/session':>12}  copies of pdf/font/cases")
+        for sessions in args.sessions:
+            measured = run(app_path, sessions, args.heap)
+            one, all_ = measured["one"], measured["all"]
+            extra = max(sessions - 1, 1)
+            row = {
+                "sessions": sessions,
+                "rss_one_mb": one["VmRSS"] / 1024,
+                "rss_all_mb": all_["VmRSS"] / 1024,
+                "mb_per_session": (all_["VmRSS"] - one["VmRSS"]) / 1024 / extra,
+                "anon_all_mb": all_["RssAnon"] / 1024,
+                "file_all_mb": all_["RssFile"] / 1024,
+                "heap_mb_per_session": measured["heap"] / 1e6 / extra if measured["heap"] is not None else None,
+                "copies": measured["distinct"],
+                "problems": measured["problems"],
+            }
+            results.append(row)
+            copies = "/".join(str(row["copies"][key]) for key in ("pdf_bytes", "font_bytes", "cases_data"))
+            print(f"{sessions:>8}{row['rss_one_mb']:10.1f}{row['rss_all_mb']:10.1f}{row['anon_all_mb']:11.1f}"
+                  f"{row['file_all_mb']:11.1f}{row['mb_per_session']:12.2f}  {copies}")
+            if row["heap_mb_per_session"] is not None:
+                print(f"{'':>8}Python heap: {row['heap_mb_per_session']:.2f} MB/session")
+            for problem in measured["problems"]:
+                print(f"  session problem: {problem}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({"root": os.path.abspath(args.root), "cases": args.cases, "runs": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Stage-by-stage benchmark suite with a regression check
+
+For every synthetic case set (benchmarks/synthetic.py) the rendering
+pipeline is timed one stage at a time: transform_case_format, text layout,
+overlay drawing, overlay serialization, the merge with empty_form.pdf,
+filled-PDF serialization and ZIP packaging. Page rasterization (the
+load_page_image metrics) and app.py's create_visual_preview are timed
+without a Streamlit server.
+
+Results are written as JSON. With --baseline, any metric slower than the
+baseline by more than --threshold (and --min-delta ms) is reported and the
+script exits with status 1. Single-sample metrics (1-case sets, the first
+uncached preview) are recorded but not checked.
+
+    python benchmarks/run_suite.py --sizes 1 100 10000 --out bench.json
+    python benchmarks/run_suite.py --baseline bench.json --out bench_new.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+from handwriting_tool.archive import StreamingZip
+from handwriting_tool.cases import transform_case_format
+from handwriting_tool.metrics import StageTimes
+from handwriting_tool.render import OVERLAY_PAGES, draw_runs, layout_case, resolve_font
+from handwriting_tool.specs import DEFAULT_SPECS
+from handwriting_tool.template import get_compiled_template
+from synthetic import SUMMARY_LENGTHS, make_cases
+
+# Outside the checkout, so a run does not leave an untracked file behind
+DEFAULT_OUT = os.path.join(tempfile.gettempdir(), "handwriting_tool-bench_results.json")
+PIPELINE_STAGES = ("transform", "layout", "draw", "overlay_save", "merge", "write", "zip")
+
+
+def read_bytes(*parts):
+    with open(os.path.join(ROOT, *parts), 'rb') as f:
+        return f.read()
+
+
+def run_pipeline(raw_cases, template, font_name):
+    """Time every stage over a case set; returns per-case milliseconds and totals"""
+    clock = StageTimes()
+    clock.update(dict.fromkeys(PIPELINE_STAGES, 0.0))
+    output_bytes = 0
+
+    clock.restart()
+    cases = [transform_case_format(case) for case in raw_cases]
+    clock.lap("transform")
+
+    with StreamingZip() as archive:
+        for case in cases:
+            clock.restart()
+            runs = layout_case(case, font_name, DEFAULT_SPECS, template.page_height)
+            clock.lap("layout")
+
+            # Drawn from the runs laid out above, so layout is not timed twice
+            overlay_buffer = BytesIO()
+            c = canvas.Canvas(overlay_buffer, pagesize=(template.page_width, template.page_height))
+            draw_runs(c, runs, font_name)
+            clock.lap("draw")
+
+            c.save()
+            clock.lap("overlay_save")
+
+            overlay_pdf = PdfReader(BytesIO(overlay_buffer.getvalue()))
+            writer = PdfWriter()
+            shared = {}
+            for page_num, page in enumerate(template.add_pages(writer)):
+                if page_num < OVERLAY_PAGES:
+                    template.stamp(writer, page, overlay_pdf.pages[page_num], page_num + 1, shared)
+            clock.lap("merge")
+
+            output_buffer = BytesIO()
+            writer.write(output_buffer)
+            pdf = output_buffer.getvalue()
+            clock.lap("write")
+
+            archive.add(f"{case['case_id']}_filled.pdf", pdf)
+            clock.lap("zip")
+            output_bytes += len(pdf)
+        archive.finish()
+
+    count = len(cases)
+    return {
+        "cases": count,
+        "total_s": round(sum(clock.values()), 4),
+        "output_bytes": output_bytes,
+        "ms_per_case": {stage: round(seconds * 1000 / count, 4) for stage, seconds in clock.items()},
+    }
+
+
+def run_app_stages(pdf_bytes, repeat):
+    """Page rasterization and create_visual_preview from app.py, in bare mode"""
+    import streamlit as st
+    from streamlit import logger as st_logger
+
+    # Bare mode warns on every session_state access
+    st_logger.set_log_level(logging.ERROR)
+    import app
+
+    from handwriting_tool.resources import content_hash, rasterize_page
+
+    # Rasterization itself: load_page_image maps the stored raster after the first call
+    template_digest = content_hash(pdf_bytes)
+    results = {}
+    for page_num in (1, 2):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            rasterize_page(pdf_bytes, page_num, app.PREVIEW_DPI)
+        results[f"load_page_image_p{page_num}_ms"] = round((time.perf_counter() - start) * 1000 / repeat, 3)
+
+    app.initialize_session_state()
+    st.session_state.pdf_bytes = pdf_bytes
+    st.session_state.template_digest = template_digest
+    for page_num in (1, 2):
+        start = time.perf_counter()
+        app.create_visual_preview(page_num)
+        results[f"create_visual_preview_p{page_num}_cold_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            app.create_visual_preview(page_num)
+        results[f"create_visual_preview_p{page_num}_ms"] = round((time.perf_counter() - start) * 1000 / repeat, 3)
+    return results
+
+
+def flatten(results):
+    """metric name -> milliseconds, for baseline comparison"""
+    metrics = {}
+    for set_name, run in results["sets"].items():
+        for stage, ms in run["ms_per_case"].items():
+            metrics[f"{set_name}/{stage}_ms_per_case"] = ms
+    metrics.update(results.get("app", {}))
+    return metrics
+
+
+def is_single_sample(name):
+    """Metrics from one measurement are too noisy to gate on"""
+    return name.startswith("1/") or "_cold_" in name
+
+
+def find_regressions(current, baseline, threshold, min_delta):
+    regressions = []
+    previous_metrics = flatten(baseline)
+    for name, value in flatten(current).items():
+        previous = previous_metrics.get(name)
+        if previous is None or is_single_sample(name):
+            continue
+        if value > previous * (1 + threshold) and value - previous > min_delta:
+            regressions.append((name, previous, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100], help="Case counts (10000 for the full run)")
+    parser.add_argument('--summaries', nargs='+', choices=list(SUMMARY_LENGTHS), default=list(SUMMARY_LENGTHS))
+    parser.add_argument('--template', default=os.path.join(ROOT, "input", "empty_form.pdf"))
+    parser.add_argument('--font', default=os.path.join(ROOT, "input", "AzzamHandwriting-Regular.ttf"))
+    parser.add_argument('--repeat', type=int, default=5, help="Repeats for the app stages")
+    parser.add_argument('--skip-app', action='store_true', help="Skip load_page_image/create_visual_preview")
+    parser.add_argument('--out', default=DEFAULT_OUT, help=f"Results JSON (default: {DEFAULT_OUT})")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.5, help="Ignore slowdowns smaller than this many ms")
+    args = parser.parse_args()
+
+    with open(args.template, 'rb') as f:
+        pdf_bytes = f.read()
+    template = get_compiled_template(pdf_bytes)
+    font_name = resolve_font(read_bytes(args.font) if os.path.exists(args.font) else None)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "sets": {},
+    }
+
+    print(f"{'set':<14}" + "".join(f"{stage:>13}" for stage in PIPELINE_STAGES) + f"{'total s':>10}")
+    for summary in args.summaries:
+        for size in args.sizes:
+            set_name = f"{size}/{summary}"
+            run = run_pipeline(make_cases(size, summary), template, font_name)
+            results["sets"][set_name] = run
+            print(f"{set_name:<14}" + "".join(f"{run['ms_per_case'][stage]:>10.3f} ms" for stage in PIPELINE_STAGES)
+                  + f"{run['total_s']:>10.2f}")
+
+    if not args.skip_app:
+        results["app"] = run_app_stages(pdf_bytes, args.repeat)
+        for name, ms in results["app"].items():
+            print(f"{name:<40} {ms:10.2f}")
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold, args.min_delta)
+        for name, previous, value in regressions:
+            print(f"REGRESSION {name}: {previous:.3f} -> {value:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Synthetic case sets in the schema of input/cases_data.json
+
+Cases are built deterministically from a seed, so every run of the suite
+measures the same text. 'short' summaries are the length of the bundled
+cases (about 240 characters); 'long' ones are the worst case, several
+times what the summary box holds, with every other field filled to its
+longest realistic value.
+
+    python benchmarks/synthetic.py --cases 10000 --summary long --out cases_10k.json
+"""
+import argparse
+import json
+import random
+
+SUMMARY_LENGTHS = {"short": 240, "long": 2400}
+
+WORDS = (
+    "afebrile cramps dehydration mucosa travel antibiotics viral regimen feeding education review "
+    "return flags hypertension headache vision nocturia palpitations creatinine potassium lipid "
+    "titration adherence counselling follow-up referral ultrasound history examination differential "
+    "management outpatient emergency pediatric wheeze fever cough otitis immunization growth chart"
+).split()
+
+THEMES = (
+    "Viral gastroenteritis mild dehydration",
+    "Uncontrolled essential hypertension follow-up",
+    "Acute otitis media in a toddler",
+    "Asthma exacerbation moderate severity",
+    "Type 2 diabetes medication review",
+)
+
+GENDERS = ("male", "female")
+
+
+def text_of_length(rng, length):
+    """Sentence-like text of roughly length characters"""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+
+def make_case(rng, index, summary="short"):
+    """One case dict in the export format read by transform_case_format"""
+    long_fields = summary == "long"
+    detail_length = 140 if long_fields else 50
+    return {
+        "Date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Age & Gender": f"{rng.randint(1, 90)} year old {rng.choice(GENDERS)}",
+        "Main theme of the case": f"{rng.choice(THEMES)} {index}",
+        "Case Summary": text_of_length(rng, SUMMARY_LENGTHS[summary]),
+        "Self Reflection": (
+            f"Did well: {text_of_length(rng, detail_length)} "
+            f"Needs work: {text_of_length(rng, detail_length)} "
+            f"Plan: {text_of_length(rng, 40)}"
+        ),
+        "Signature of the MI": "Ahmed Yasser Elsayed Azzam",
+        "EPA tested": rng.sample(range(1, 14), 4),
+        "Rubric": [rng.choice(("Level A", "Level B", "Level C", "Level D")) for _ in range(4)],
+        "Strength points": [text_of_length(rng, 60 if long_fields else 15) for _ in range(4)],
+        "Points needing improvement": [text_of_length(rng, 60 if long_fields else 15) for _ in range(4)],
+    }
+
+
+def make_cases(count, summary="short", seed=0):
+    """count export-format cases with short or long summaries"""
+    rng = random.Random(f"{seed}-{summary}")
+    return [make_case(rng, index, summary) for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=100)
+    parser.add_argument('--summary', choices=list(SUMMARY_LENGTHS), default="short")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jsonl', action='store_true', help="Write JSON Lines instead of {'cases': [...]}")
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    cases = make_cases(args.cases, args.summary, args.seed)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        if args.jsonl:
+            for case in cases:
+                f.write(json.dumps(case) + "\n")
+        else:
+            json.dump({"cases": cases}, f, indent=2)
+    print(f"Wrote {len(cases)} {args.summary}-summary cases to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Rendering core for the PDF Medical Form Filler"""
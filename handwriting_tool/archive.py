@@ -0,0 +1,72 @@
+"""Disk-backed ZIP assembly for generated PDFs"""
+import os
+import tempfile
+import zipfile
+
+# Key -> (label, zipfile compression, compresslevel). The PDFs are already
+# compressed, so storing them is usually the right trade-off.
+COMPRESSION_OPTIONS = {
+    "store": ("Store (no compression)", zipfile.ZIP_STORED, None),
+    "fast": ("Deflate - fast (level 1)", zipfile.ZIP_DEFLATED, 1),
+    "default": ("Deflate - default (level 6)", zipfile.ZIP_DEFLATED, 6),
+    "smallest": ("Deflate - smallest (level 9)", zipfile.ZIP_DEFLATED, 9),
+}
+DEFAULT_COMPRESSION = "store"
+
+# Archives smaller than this stay in memory, larger ones roll over to disk
+SPOOL_LIMIT = 16 * 1024 * 1024
+
+
+class StreamingZip:
+    """ZIP written entry by entry into a spooled temporary file
+
+    Each PDF is written as soon as it is produced and can be dropped by the
+    caller right away, so peak memory does not grow with the case count.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION, path=None, spool_limit=SPOOL_LIMIT):
+        _, zip_compression, compresslevel = COMPRESSION_OPTIONS[compression]
+        if path:
+            self.file = open(path, 'w+b')
+        else:
+            self.file = tempfile.SpooledTemporaryFile(max_size=spool_limit)
+        self._zip = zipfile.ZipFile(self.file, 'w', zip_compression, compresslevel=compresslevel)
+        self._names = set()
+        self.count = 0
+
+    def add(self, filename, data):
+        """Write one file into the archive, renaming duplicates instead of shadowing them"""
+        name = filename
+        stem, ext = os.path.splitext(filename)
+        suffix = 2
+        while name in self._names:
+            name = f"{stem}_{suffix}{ext}"
+            suffix += 1
+        self._names.add(name)
+        self._zip.writestr(name, data)
+        self.count += 1
+        return name
+
+    def finish(self):
+        """Write the central directory and rewind the archive for reading"""
+        self._zip.close()
+        self.file.seek(0)
+        return self.file
+
+    @property
+    def size(self):
+        position = self.file.tell()
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        self.file.seek(position)
+        return size
+
+    def close(self):
+        self._zip.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,197 @@
+"""Interchangeable engines that turn a laid-out case into filled PDF bytes
+
+Every backend places text with render.layout_case, so line breaks and
+baselines are the same whichever engine draws them.
+
+Listing BACKENDS loads no PDF library; each engine imports its rendering
+stack when it is first built.
+"""
+from abc import ABC, abstractmethod
+
+
+class RenderBackend(ABC):
+    """Filled-PDF renderer bound to one template, font and set of positions"""
+
+    name = None
+    label = None
+
+    def __init__(self, pdf_bytes, font_bytes, saved_specs):
+        from .render import resolve_font
+
+        self.saved_specs = saved_specs
+        # Layout always measures with reportlab's metrics for the same font file
+        self.font_name = resolve_font(font_bytes)
+        self.page_count = 0
+
+    @abstractmethod
+    def render(self, case_data, stages=None):
+        """Return the filled PDF for a case dict, or None for anything else
+
+        stages, a metrics.StageTimes, collects per-stage times when given.
+        """
+
+    @staticmethod
+    @abstractmethod
+    def count_pages(pdf_bytes):
+        """Pages of the template, read with this engine's PDF library"""
+
+
+class ReportlabBackend(RenderBackend):
+    """reportlab overlay canvas stamped onto the compiled template with PyPDF2"""
+
+    name = 'reportlab'
+    label = "reportlab + PyPDF2 (overlay merge)"
+
+    def __init__(self, pdf_bytes, font_bytes, saved_specs):
+        super().__init__(pdf_bytes, font_bytes, saved_specs)
+        from .render import render_case
+        from .template import get_compiled_template
+
+        self._render_case = render_case
+        self.template = get_compiled_template(pdf_bytes)
+        self.page_count = self.template.page_count
+
+    def render(self, case_data, stages=None):
+        return self._render_case(case_data, self.template, self.font_name, self.saved_specs, stages)
+
+    @staticmethod
+    def count_pages(pdf_bytes):
+        from .template import get_compiled_template
+
+        return get_compiled_template(pdf_bytes).page_count
+
+
+class PyMuPDFBackend(RenderBackend):
+    """Text drawn straight onto the template pages with PyMuPDF in one pass
+
+    No intermediate overlay document is built. The template is parsed and
+    its own fonts subset once; each case copies its pages with insert_pdf,
+    and only the handwriting font is embedded from memory and subset to the
+    glyphs the form uses.
+
+    Worth choosing when output size matters more than speed: forms come out
+    at about half the size of the reportlab engine's (whose template fonts
+    are kept whole) but take about 1.5x as long, mostly in the per-case font
+    subsetting. reportlab stays the default for throughput.
+
+    Glyphs are advanced by the widths the reportlab output is displayed
+    with, so lines match it. reportlab's cmap lookup misses a few characters
+    of the bundled font ('.', '-', ':'); it writes them as code 0 with that
+    code's width, where PyMuPDF draws the real glyph.
+    """
+
+    name = 'pymupdf'
+    label = "PyMuPDF (direct, single pass)"
+
+    def __init__(self, pdf_bytes, font_bytes, saved_specs):
+        super().__init__(pdf_bytes, font_bytes, saved_specs)
+        import fitz  # PyMuPDF
+        from .layout import get_advances
+        from .render import DEFAULT_FONT, FONT_COLOR, layout_case
+
+        self._fitz = fitz
+        self._layout_case = layout_case
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as template_doc:
+            self.page_height = template_doc[0].rect.height
+            self.page_count = len(template_doc)
+            template_doc.subset_fonts()
+            compact = template_doc.tobytes(garbage=1, deflate=True)
+        self._template = fitz.open(stream=compact, filetype="pdf")
+        if self.font_name == DEFAULT_FONT:
+            self.font = fitz.Font("helv")
+        else:
+            self.font = fitz.Font(fontbuffer=font_bytes)
+        self.color = FONT_COLOR.rgb()
+        self.advances = get_advances(self.font_name)
+        self._advance_differs = {}
+
+    def render(self, case_data, stages=None):
+        if not isinstance(case_data, dict):
+            return None
+
+        runs = self._layout_case(case_data, self.font_name, self.saved_specs, self.page_height)
+        if stages is not None:
+            stages.lap('layout')
+
+        doc = self._fitz.open()
+        try:
+            doc.insert_pdf(self._template)
+            writers = {}
+            for page_index, font_size, lines in runs:
+                if page_index >= len(doc):
+                    continue
+                writer = writers.get(page_index)
+                if writer is None:
+                    writer = self._fitz.TextWriter(doc[page_index].rect, color=self.color)
+                    writers[page_index] = writer
+                for x, y, line in lines:
+                    # PyMuPDF measures y from the top of the page
+                    for segment_x, segment in self._segments(x, line, font_size):
+                        writer.append((segment_x, self.page_height - y), segment, font=self.font, fontsize=font_size)
+
+            for page_index, writer in writers.items():
+                writer.write_text(doc[page_index])
+            # Text goes straight onto the template pages, so there is no merge stage
+            if stages is not None:
+                stages.lap('draw')
+
+            # The copied pages hold no unused objects, and a deflate pass would cost as much again.
+            # Without a file /ID the same case always renders to the same bytes
+            doc.subset_fonts()
+            pdf = doc.tobytes(no_new_id=True)
+            if stages is not None:
+                stages.lap('write')
+            return pdf
+        finally:
+            doc.close()
+
+    @staticmethod
+    def count_pages(pdf_bytes):
+        import fitz  # PyMuPDF
+
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as template_doc:
+            return len(template_doc)
+
+    def _displayed_units(self, char):
+        face = self.advances.face
+        if self.advances.is_truetype and ord(char) not in face.charWidths:
+            return face.getCharWidth(0)
+        return self.advances.char_units(char)
+
+    def _segments(self, x, line, font_size):
+        """Split a line after every glyph whose PyMuPDF advance disagrees with the layout"""
+        segments = []
+        segment_start = 0
+        segment_x = cursor = x
+        for i, char in enumerate(line):
+            units = self._displayed_units(char)
+            cursor += units * 0.001 * font_size
+            differs = self._advance_differs.get(char)
+            if differs is None:
+                differs = abs(self.font.glyph_advance(ord(char)) * 1000 - units) > 0.01
+                self._advance_differs[char] = differs
+            if differs:
+                segments.append((segment_x, line[segment_start:i + 1]))
+                segment_start = i + 1
+                segment_x = cursor
+        if segment_start < len(line):
+            segments.append((segment_x, line[segment_start:]))
+        return segments
+
+
+BACKENDS = {backend.name: backend for backend in (ReportlabBackend, PyMuPDFBackend)}
+DEFAULT_BACKEND = ReportlabBackend.name
+
+
+def get_backend(name, pdf_bytes, font_bytes, saved_specs):
+    """Build the named backend for a run"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown rendering backend: {name}")
+    return BACKENDS[name](pdf_bytes, font_bytes, saved_specs)
+
+
+def template_page_count(name, pdf_bytes):
+    """Pages of the template as the named backend reads it, without building the backend"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown rendering backend: {name}")
+    return BACKENDS[name].count_pages(pdf_bytes)
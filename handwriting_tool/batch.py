@@ -0,0 +1,176 @@
+"""Batch generation of filled PDFs across CPU cores"""
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from .backends import DEFAULT_BACKEND, get_backend
+from .cache import render_key
+from .metrics import StageTimes
+
+# One finished case: position in the input, its id, the PDF bytes or a failure
+# line, whether the PDF came from the render cache, and its stage times
+BatchResult = namedtuple('BatchResult', ['index', 'case_id', 'pdf', 'error', 'cached', 'stages'], defaults=(False, None))
+
+# Cases kept in flight per worker so finished results stream out steadily
+_PENDING_PER_WORKER = 4
+
+# Per-process render state, filled once by init_worker
+_worker_state = {}
+
+
+def default_workers():
+    """Worker count used when none is configured"""
+    return os.cpu_count() or 1
+
+
+def case_id_for(case, index):
+    """Case id used for file names and error reports"""
+    if isinstance(case, dict):
+        return case.get('case_id', f'case_{index+1:03d}')
+    return f'case_{index+1:03d}'
+
+
+def load_render_state(pdf_bytes, font_bytes, saved_specs, backend=DEFAULT_BACKEND):
+    """Everything a render needs besides the case itself"""
+    return {'backend': get_backend(backend, pdf_bytes, font_bytes, saved_specs)}
+
+
+def render_batch_case(index, case, state):
+    """Render one case, turning any failure into a report line"""
+    case_id = case_id_for(case, index)
+    if not isinstance(case, dict):
+        return BatchResult(index, case_id, None, f"Case {index+1}: Invalid")
+    stages = StageTimes()
+    try:
+        pdf = state['backend'].render(case, stages)
+    except Exception as e:
+        return BatchResult(index, case_id, None, f"{case_id}: {str(e)[:50]}")
+    if not pdf:
+        return BatchResult(index, case_id, None, f"{case_id}: No output")
+    return BatchResult(index, case_id, pdf, None, False, stages)
+
+
+def init_worker(pdf_bytes, font_bytes, saved_specs, backend):
+    """Compile the template and register the font once per worker process
+
+    The initializer of any executor whose tasks call render_many_in_worker.
+    """
+    _worker_state.update(load_render_state(pdf_bytes, font_bytes, saved_specs, backend))
+
+
+def _render_in_worker(index, case):
+    return render_batch_case(index, case, _worker_state)
+
+
+def render_many_in_worker(items):
+    """BatchResult of every (index, case) pair, rendered in one task
+
+    Runs in a process set up by init_worker; the render service sends it
+    its micro-batches.
+    """
+    return [render_batch_case(index, case, _worker_state) for index, case in items]
+
+
+def _cache_keys(pdf_bytes, font_bytes, saved_specs, backend, cache):
+    """Function giving a case's render cache key, or None when nothing is cached"""
+    if cache is None:
+        return lambda case: None
+    # Imported here so listing worker defaults does not load reportlab and PyPDF2
+    from .fonts import font_hash
+    from .template import template_hash
+
+    template_digest = template_hash(pdf_bytes)
+    font_digest = font_hash(font_bytes) if font_bytes else None
+    return lambda case: render_key(case, saved_specs, template_digest, font_digest, backend) if isinstance(case, dict) else None
+
+
+def generate_batch(cases, pdf_bytes, font_bytes, saved_specs, workers=None, backend=DEFAULT_BACKEND, cache=None):
+    """Render every case and yield a BatchResult for each one as it finishes
+
+    With a single worker the cases are rendered in this process. Otherwise
+    they are spread over a process pool; the template and font bytes are
+    sent to each worker once, and finished results are held until every
+    earlier case is out. Either way results arrive in input order, so
+    archive names given to duplicate case ids are the same on every run.
+    Both paths run the same backend code, so each PDF is byte-identical
+    whichever path produced it.
+
+    With a RenderCache, cases whose inputs were rendered before are served
+    from it without rendering, and new renders are stored in it.
+    """
+    workers = default_workers() if workers is None else max(1, int(workers))
+    key_for = _cache_keys(pdf_bytes, font_bytes, saved_specs, backend, cache)
+
+    def cached(index, case, key):
+        pdf = cache.get(key) if key else None
+        return BatchResult(index, case_id_for(case, index), pdf, None, True) if pdf else None
+
+    def store(result, key):
+        if key and result.pdf:
+            cache.put(key, result.pdf)
+        return result
+
+    if workers == 1:
+        state = None
+        for index, case in enumerate(cases):
+            key = key_for(case)
+            hit = cached(index, case, key)
+            if hit:
+                yield hit
+                continue
+            if state is None:
+                state = load_render_state(pdf_bytes, font_bytes, saved_specs, backend)
+            yield store(render_batch_case(index, case, state), key)
+        return
+
+    # spawn keeps workers clear of the threads of the host process (Streamlit)
+    context = multiprocessing.get_context('spawn')
+    max_pending = workers * _PENDING_PER_WORKER
+
+    # Started on the first cache miss, so a fully cached batch spawns nothing
+    executor = None
+    pending = {}
+    # Finished results waiting for every earlier case, by input position
+    ready = {}
+    next_index = 0
+
+    def in_order():
+        nonlocal next_index
+        while next_index in ready:
+            yield ready.pop(next_index)
+            next_index += 1
+
+    def collect():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = store(future.result(), pending.pop(future))
+            ready[result.index] = result
+
+    try:
+        for index, case in enumerate(cases):
+            key = key_for(case)
+            hit = cached(index, case, key)
+            if hit:
+                ready[index] = hit
+            else:
+                if executor is None:
+                    executor = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=context,
+                        initializer=init_worker,
+                        initargs=(pdf_bytes, font_bytes, saved_specs, backend),
+                    )
+                pending[executor.submit(_render_in_worker, index, case)] = key
+            # Held results count too, so a slow case cannot grow the buffer unbounded
+            while pending and len(pending) + len(ready) >= max_pending:
+                collect()
+                yield from in_order()
+            yield from in_order()
+
+        while pending:
+            collect()
+            yield from in_order()
+    finally:
+        # Also reached when the caller stops consuming early
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
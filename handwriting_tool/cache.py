@@ -0,0 +1,140 @@
+"""Content-addressed on-disk cache of rendered case PDFs"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Bump whenever a code change alters the PDFs rendered for the same inputs
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'HANDWRITING_TOOL_CACHE',
+    os.path.join(os.path.expanduser("~"), ".cache", "handwriting_tool", "renders")
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Directory -> RenderCache, so sessions share one index per cache directory
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def relevant_specs(case_data, saved_specs):
+    """Saved position specs that can change how this case renders
+
+    Exactly the fields render.layout_case places for the case, taken from
+    the same render.case_fields it lays out.
+    """
+    # reportlab is loaded only once a key is actually computed
+    from .render import case_fields
+
+    specs = {'page1': {}, 'page2': {}}
+    for page_index, field_name, _ in case_fields(case_data):
+        page = ('page1', 'page2')[page_index]
+        specs[page][field_name] = saved_specs[page][field_name]
+    return specs
+
+
+def render_key(case_data, saved_specs, template_digest, font_digest, backend):
+    """Hash of everything that determines a case's PDF"""
+    payload = json.dumps(
+        [CACHE_VERSION, backend, template_digest, font_digest, case_data, relevant_specs(case_data, saved_specs)],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Rendered PDFs on local disk, capped in size with least-recently-used eviction
+
+    Entries are files named by render_key; a hit refreshes the file's mtime
+    so eviction removes the entries untouched for longest.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> (last use, size), loaded once from disk
+        self._entries = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith('.pdf'):
+                    stat = os.stat(os.path.join(root, name))
+                    self._entries[name[:-4]] = (stat.st_mtime, stat.st_size)
+        self._total = sum(size for _, size in self._entries.values())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def get(self, key):
+        """Cached PDF bytes for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                if key in self._entries:
+                    self._total -= self._entries.pop(key)[1]
+            return None
+        with self._lock:
+            # Also counts files another process wrote since the directory was scanned
+            if key in self._entries:
+                self._total -= self._entries[key][1]
+            self._entries[key] = (os.path.getmtime(path), len(data))
+            self._total += len(data)
+            self._evict()
+        return data
+
+    def put(self, key, data):
+        """Store a rendered PDF, evicting least recently used entries past the cap"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._entries[key][1]
+            self._entries[key] = (os.path.getmtime(path), len(data))
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            del self._entries[key]
+            self._total -= size
+
+    @property
+    def size(self):
+        return self._total
+
+
+def get_render_cache(directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Process-wide RenderCache for a directory, shared by every session"""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(directory)
+        if cache is None:
+            cache = RenderCache(directory, max_bytes)
+            _CACHES[directory] = cache
+        cache.max_bytes = max_bytes
+        return cache
@@ -0,0 +1,343 @@
+"""Case data loading and normalization - no Streamlit dependency"""
+import re
+from itertools import accumulate, chain, islice, repeat
+from operator import is_, itemgetter
+
+# Export-format key -> normalized key and how the value is converted, in the
+# order transform_case_format writes them:
+#   copy        taken as it is
+#   age_gender  taken as it is, with age and gender derived from it
+#   reflection  split into the self_reflection dict
+#   epa_labels  list of EPA numbers -> "EPA n" labels, in epa_assessment
+#   list        taken when it is a list (else []), in epa_assessment
+FIELD_MAP = (
+    ('Date', 'date', 'copy'),
+    ('Age & Gender', 'age_gender', 'age_gender'),
+    ('Main theme of the case', 'main_theme', 'copy'),
+    ('Case Summary', 'case_summary', 'copy'),
+    ('Signature of the MI', 'signature_mi', 'copy'),
+    ('Self Reflection', 'self_reflection', 'reflection'),
+    ('EPA tested', 'epa_tested', 'epa_labels'),
+    ('Rubric', 'rubric_levels', 'list'),
+    ('Strength points', 'strength_points', 'list'),
+    ('Points needing improvement', 'points_needing_improvement', 'list'),
+)
+
+AGE_PATTERN = re.compile(r'(\d+)')
+
+# Cases normalized together by normalize_batches
+BATCH_SIZE = 1024
+
+# Column value of a case that does not have the key
+MISSING = object()
+_first = itemgetter(0)
+
+
+def transform_case_format(original_case):
+    """Transform case from user's format to expected format"""
+    transformed = {}
+    epa_assessment = {}
+
+    for old_key, new_key, kind in FIELD_MAP:
+        if old_key not in original_case:
+            continue
+        value = original_case[old_key]
+        if kind == 'copy':
+            transformed[new_key] = value
+        elif kind == 'age_gender':
+            transformed[new_key] = value
+            age, gender = _age_and_gender(value)
+            if age is not MISSING:
+                transformed['age'] = age
+            transformed['gender'] = gender
+        elif kind == 'reflection':
+            transformed[new_key] = _reflection(value)
+        elif kind == 'epa_labels':
+            epa_assessment[new_key] = list(map(_epa_label, value)) if isinstance(value, list) else []
+        else:
+            epa_assessment[new_key] = value if isinstance(value, list) else []
+
+    transformed['epa_assessment'] = epa_assessment
+
+    if 'case_id' not in transformed:
+        date_part = transformed.get('date', '').replace('-', '')
+        theme_part = transformed.get('main_theme', 'case')[:20].replace(' ', '_').replace('/', '_')
+        transformed['case_id'] = f"case_{date_part}_{theme_part}" if date_part else f"case_{theme_part}"
+
+    return transformed
+
+
+def _age_and_gender(age_gender):
+    """(age or MISSING, gender) derived from an 'Age & Gender' value"""
+    age_match = AGE_PATTERN.search(age_gender)
+    gender_lower = age_gender.lower()
+    if 'male' in gender_lower and 'female' not in gender_lower:
+        gender = 'Male'
+    elif 'female' in gender_lower:
+        gender = 'Female'
+    elif 'non-binary' in gender_lower or 'nonbinary' in gender_lower:
+        gender = 'Non-binary'
+    else:
+        gender = ''
+    return (age_match.group(1) if age_match else MISSING), gender
+
+
+def _reflection(reflection_text):
+    """self_reflection dict of a 'Self Reflection' value"""
+    reflection = {}
+    if 'Did well:' in reflection_text:
+        parts = reflection_text.split('Needs work:')
+        if len(parts) >= 1:
+            did_well = parts[0].replace('Did well:', '').strip()
+            if 'Plan:' in did_well:
+                did_well = did_well.split('Plan:')[0].strip()
+            reflection['what_did_right'] = did_well
+
+        if len(parts) >= 2:
+            needs_work = parts[1].strip()
+            reflection['needs_development'] = needs_work
+    else:
+        reflection['what_did_right'] = reflection_text
+        reflection['needs_development'] = ''
+    return reflection
+
+
+def _epa_label(epa):
+    return f"EPA {epa}" if isinstance(epa, (int, float)) else str(epa)
+
+
+def _reflections(column):
+    """'Self Reflection' column -> what_did_right and needs_development columns, split by str methods mapped over it"""
+    did_well_texts = [value for value in column if value is not MISSING and 'Did well:' in value]
+    parts = list(map(str.partition, did_well_texts, repeat('Needs work:')))
+    heads, found, rests = zip(*parts) if parts else ((), (), ())
+    did_well = map(str.strip, map(str.replace, heads, repeat('Did well:'), repeat('')))
+    did_well = list(map(str.strip, map(_first, map(str.partition, did_well, repeat('Plan:')))))
+    needs_work = list(map(str.strip, map(_first, map(str.partition, rests, repeat('Needs work:')))))
+    if not all(found):
+        needs_work = [needs if has_needs else MISSING for needs, has_needs in zip(needs_work, found)]
+    if len(did_well_texts) == len(column):
+        return did_well, needs_work
+
+    # Only some cases have a 'Did well:' part: put the split ones back in place
+    did_well, needs_work = iter(did_well), iter(needs_work)
+    right, needs = [], []
+    for value in column:
+        if value is MISSING:
+            right.append(MISSING)
+            needs.append(MISSING)
+        elif 'Did well:' in value:
+            right.append(next(did_well))
+            needs.append(next(needs_work))
+        else:
+            right.append(value)
+            needs.append('')
+    return right, needs
+
+
+def _epa_labels(column):
+    """'EPA tested' column -> label lists, each distinct EPA value converted once"""
+    lists = [value if isinstance(value, list) else () for value in column]
+    flat = list(chain.from_iterable(lists))
+    # bool and int compare equal but label differently, so keep the type in the key
+    keys = list(zip(map(type, flat), flat))
+    try:
+        labels = {key: _epa_label(key[1]) for key in set(keys)}
+        labels_flat = list(map(labels.__getitem__, keys))
+    except TypeError:
+        # Unhashable EPA values: convert them one by one
+        labels_flat = list(map(_epa_label, flat))
+
+    ends = list(accumulate(map(len, lists)))
+    result = list(map(labels_flat.__getitem__, map(slice, [0] + ends[:-1], ends)))
+    if has_missing(column):
+        result = [MISSING if value is MISSING else labels for value, labels in zip(column, result)]
+    return result
+
+
+def has_missing(column):
+    """Whether a column holds MISSING anywhere"""
+    # Identity test only: == against every string would cost more
+    return any(map(is_, column, repeat(MISSING)))
+
+
+def _dicts(keys, columns):
+    """One dict per row of the columns, leaving out MISSING values"""
+    rows = zip(*columns)
+    if any(map(has_missing, columns)):
+        return [{key: value for key, value in zip(keys, row) if value is not MISSING} for row in rows]
+    return list(map(dict, map(zip, repeat(keys), rows)))
+
+
+def case_columns(cases):
+    """transform_case_format over a list of export-format dicts, one column at a time
+
+    Each FIELD_MAP source key becomes a column, converted with str methods
+    mapped over the whole column; values that repeat across cases (ages and
+    genders, dates, EPA numbers) are converted once per distinct value.
+    Returns (columns, odd rows): columns maps every key of a normalized case
+    in order (the self_reflection and epa_assessment keys flattened) to one
+    value per case, MISSING where the case does not have the key. Odd rows
+    are the positions of cases with a non-string date, theme, age and
+    gender or reflection: only transform_case_format handles those exactly,
+    including what it raises, and their column values are meaningless.
+    """
+    count = len(cases)
+    sources = {}
+    odd_rows = set()
+    for source, target, kind in FIELD_MAP:
+        column = list(map(dict.get, cases, repeat(source, count), repeat(MISSING, count)))
+        if kind in ('age_gender', 'reflection') or target in ('date', 'main_theme'):
+            if not set(map(type, column)) <= {str, object}:
+                odd_rows.update(i for i, value in enumerate(column) if value is not MISSING and type(value) is not str)
+        sources[target] = column
+    if odd_rows:
+        for column in sources.values():
+            for i in odd_rows:
+                column[i] = MISSING
+
+    columns = {}
+    for _, target, kind in FIELD_MAP:
+        column = sources[target]
+        if kind == 'age_gender':
+            ages_genders = {value: _age_and_gender(value) for value in set(column) if value is not MISSING}
+            ages_genders[MISSING] = (MISSING, MISSING)
+            columns[target] = column
+            columns['age'], columns['gender'] = (
+                [list(part) for part in zip(*map(ages_genders.__getitem__, column))] or [[], []]
+            )
+        elif kind == 'reflection':
+            columns['what_did_right'], columns['needs_development'] = _reflections(column)
+        elif kind == 'epa_labels':
+            columns[target] = _epa_labels(column)
+        elif kind == 'list':
+            if not set(map(type, column)) <= {list, object}:
+                column = [value if value is MISSING or isinstance(value, list) else [] for value in column]
+            columns[target] = column
+        else:
+            columns[target] = column
+
+    date_parts = {value: value.replace('-', '') for value in set(sources['date']) if value is not MISSING}
+    date_parts[MISSING] = ''
+    theme_parts = [
+        'case' if theme is MISSING else theme[:20].replace(' ', '_').replace('/', '_') for theme in sources['main_theme']
+    ]
+    columns['case_id'] = [
+        f"case_{date_parts[date]}_{theme}" if date_parts[date] else f"case_{theme}"
+        for date, theme in zip(sources['date'], theme_parts)
+    ]
+    return columns, odd_rows
+
+
+def case_dicts(columns):
+    """Normalized case dicts, in transform_case_format's key order, from case_columns() columns"""
+    reflection_keys = ('what_did_right', 'needs_development')
+    epa_keys = tuple(target for _, target, kind in FIELD_MAP if kind in ('epa_labels', 'list'))
+    reflections = _dicts(reflection_keys, [columns[key] for key in reflection_keys])
+    if has_missing(columns['what_did_right']):
+        # No 'Self Reflection' at all, rather than an empty one
+        reflections = [MISSING if right is MISSING else reflection
+                       for right, reflection in zip(columns['what_did_right'], reflections)]
+    epa = _dicts(epa_keys, [columns[key] for key in epa_keys])
+
+    keys = [key for key in columns if key not in reflection_keys + epa_keys + ('case_id',)]
+    keys += ['self_reflection', 'epa_assessment', 'case_id']
+    values = [columns[key] for key in keys[:-3]] + [reflections, epa, columns['case_id']]
+    return _dicts(keys, values)
+
+
+def normalize_case(case, from_cases_array):
+    """Normalized dict for one raw case, or None when the entry is skipped
+
+    Entries of a 'cases' array are always in the export format. Entries of
+    a bare array or JSON Lines file are transformed only when they look like
+    the export format and are otherwise taken as already normalized.
+    """
+    if not isinstance(case, dict):
+        return None
+    if _in_export_format(case, from_cases_array):
+        return transform_case_format(case)
+    return case
+
+
+def _in_export_format(case, from_cases_array):
+    return isinstance(case, dict) and (from_cases_array or 'Date' in case or 'Age & Gender' in case)
+
+
+def normalize_batches(entries, errors, from_cases_array=False):
+    """Lazily normalize raw case entries BATCH_SIZE at a time, appending problems to errors
+
+    Yields (columns, cases) per batch. When every entry of the batch is an
+    export-format case the column operations handle, columns are its
+    case_columns() and cases is None, so a columnar consumer never builds
+    the dicts; otherwise columns is None and cases the normalized dicts.
+    """
+    entries = iter(entries)
+    start = 0
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        export = [_in_export_format(case, from_cases_array) for case in batch]
+        columns, odd_rows = case_columns([case for case, flag in zip(batch, export) if flag])
+        if not odd_rows and all(export):
+            yield columns, None
+            start += len(batch)
+            continue
+
+        transformed = iter(case_dicts(columns))
+        odd_rows = iter(sorted(odd_rows))
+        next_odd = next(odd_rows, None)
+        cases = []
+        position = 0
+        for i, (case, flag) in enumerate(zip(batch, export), start):
+            try:
+                if flag:
+                    normalized = next(transformed)
+                    position += 1
+                    if position - 1 == next_odd:
+                        next_odd = next(odd_rows, None)
+                        normalized = transform_case_format(case)
+                else:
+                    normalized = normalize_case(case, from_cases_array)
+            except Exception as e:
+                errors.append(f"Case {i+1} transformation error: {str(e)}")
+                continue
+            if normalized is not None:
+                cases.append(normalized)
+        yield None, cases
+        start += len(batch)
+
+
+def normalize_cases(entries, errors, from_cases_array=False):
+    """Lazily normalize raw case entries, appending problems to errors"""
+    for i, case in enumerate(entries):
+        try:
+            normalized = normalize_case(case, from_cases_array)
+        except Exception as e:
+            errors.append(f"Case {i+1} transformation error: {str(e)}")
+            continue
+        if normalized is not None:
+            yield normalized
+
+
+def parse_cases(loaded_data, source_name="cases file"):
+    """Turn loaded case JSON into normalized case dicts
+
+    Accepts an object with a 'cases' array or a bare array. Returns the
+    valid cases and a list of problems found along the way.
+    """
+    errors = []
+
+    if isinstance(loaded_data, dict) and 'cases' in loaded_data:
+        cases_array = loaded_data['cases']
+        if isinstance(cases_array, list):
+            return list(normalize_cases(cases_array, errors, from_cases_array=True)), errors
+        errors.append("'cases' property is not an array")
+        return [], errors
+
+    if isinstance(loaded_data, list):
+        return list(normalize_cases(loaded_data, errors)), errors
+
+    errors.append(f"{source_name} must contain JSON array or object with 'cases' array")
+    return [], errors
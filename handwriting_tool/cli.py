@@ -0,0 +1,270 @@
+"""Headless batch rendering without Streamlit
+
+    python -m handwriting_tool render --cases cases_data.json \
+        --template empty_form.pdf --positions positions.json --out out.zip
+    python -m handwriting_tool check --cases cases_data.json --positions positions.json
+    python -m handwriting_tool serve --template empty_form.pdf --positions positions.json --port 8750
+"""
+import argparse
+import json
+import sys
+import time
+
+# Only the rendering stack (reportlab, PyPDF2) is imported - never Streamlit or plotly
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _load_positions(args):
+    """Saved positions from --positions (or the defaults) with --fit applied"""
+    from .specs import DEFAULT_SPECS, load_positions, with_auto_fit
+
+    positions = load_positions(args.positions) if args.positions else DEFAULT_SPECS
+    if not args.fit:
+        return positions
+    try:
+        return with_auto_fit(positions, args.fit)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+
+
+def render_command(args):
+    """Render every case into a ZIP (or one combined PDF) and print a throughput summary"""
+    from .archive import StreamingZip
+    from .batch import generate_batch
+    from .ingest import CaseFile
+    from .metrics import RunMetrics, to_json, to_prometheus
+
+    # Streamed: cases are decoded and normalized as the batch consumes them
+    cases = CaseFile(args.cases)
+
+    positions = _load_positions(args)
+    pdf_bytes = _read_bytes(args.template)
+    font_bytes = _read_bytes(args.font) if args.font else None
+
+    failed_cases = []
+    cache_stats = None
+    metrics = RunMetrics("combined" if args.combined else "zip")
+    start = time.perf_counter()
+    if args.combined:
+        from .combined import render_combined
+        from .render import resolve_font
+        from .template import get_compiled_template
+
+        combined_pdf, generated, failed_cases = render_combined(
+            cases, get_compiled_template(pdf_bytes), resolve_font(font_bytes), positions, metrics=metrics
+        )
+        with open(args.out, 'wb') as f:
+            f.write(combined_pdf)
+        output_size = len(combined_pdf)
+    else:
+        from .backends import template_page_count
+
+        cache = None
+        if args.cache:
+            from .cache import RenderCache
+
+            cache = RenderCache(args.cache, args.cache_size * 1024 * 1024)
+            cache_stats = {'hits': 0, 'misses': 0}
+
+        page_count = template_page_count(args.backend, pdf_bytes)
+        with StreamingZip(args.compression, path=args.out) as archive:
+            results = generate_batch(cases, pdf_bytes, font_bytes, positions, workers=args.workers, backend=args.backend, cache=cache)
+            for result in results:
+                if cache_stats is not None:
+                    cache_stats['hits' if result.cached else 'misses'] += 1
+                zip_start = time.perf_counter()
+                if result.error:
+                    failed_cases.append(result.error)
+                else:
+                    archive.add(f"{result.case_id}_filled.pdf", result.pdf)
+                metrics.add_result(result, page_count, time.perf_counter() - zip_start)
+            archive.finish()
+            generated = archive.count
+            output_size = archive.size
+    elapsed = time.perf_counter() - start
+    run_metrics = metrics.finish().summary()
+    for err in cases.errors:
+        print(f"warning: {err}", file=sys.stderr)
+    total = generated + len(failed_cases)
+
+    summary = {
+        'cases': total,
+        'generated': generated,
+        'failed': len(failed_cases),
+        'seconds': round(elapsed, 3),
+        'cases_per_second': round(generated / elapsed, 2) if elapsed > 0 else None,
+        'output_bytes': output_size,
+        'output': args.out,
+    }
+    if cache_stats is not None:
+        summary['cache_hits'] = cache_stats['hits']
+        summary['cache_misses'] = cache_stats['misses']
+    summary['stage_seconds'] = run_metrics['stage_seconds']
+    summary['pages_per_second'] = run_metrics['pages_per_second']
+    summary['bytes_per_second'] = run_metrics['bytes_per_second']
+    if args.report and any(spec.get('fit') for fields in positions.values() for spec in fields.values()):
+        from .fit import check_cases
+        from .render import resolve_font
+
+        # Render-free, so this costs a fraction of the render itself
+        font_sizes = check_cases(cases, resolve_font(font_bytes), positions)[3]
+        summary['font_sizes'] = [{'case_id': case_id, 'font_sizes': sizes} for case_id, sizes in font_sizes]
+
+    for err in failed_cases:
+        print(f"failed: {err}", file=sys.stderr)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(run_metrics) if args.metrics.endswith('.prom') else to_json(run_metrics))
+    if not args.quiet:
+        print(f"Generated {generated}/{total} PDFs in {elapsed:.2f}s "
+              f"({summary['cases_per_second']} cases/s) -> {args.out} ({output_size} bytes)")
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in run_metrics['stage_seconds'].items())
+        print(f"Stages: {stages}; {run_metrics['pages_per_second']} pages/s")
+        if cache_stats is not None:
+            print(f"Render cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+    return 1 if failed_cases or not generated else 0
+
+
+def check_command(args):
+    """Report fields whose text would not fit its box, without rendering anything"""
+    from .fit import check_cases
+    from .ingest import CaseFile
+    from .render import resolve_font
+
+    cases = CaseFile(args.cases)
+    positions = _load_positions(args)
+    font_name = resolve_font(_read_bytes(args.font) if args.font else None)
+
+    start = time.perf_counter()
+    checked, issues, counts, font_sizes = check_cases(cases, font_name, positions)
+    elapsed = time.perf_counter() - start
+    for err in cases.errors:
+        print(f"warning: {err}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'cases': checked,
+                'seconds': round(elapsed, 3),
+                'counts': dict(counts),
+                'issues': [issue._asdict() for issue in issues],
+                'font_sizes': [{'case_id': case_id, 'font_sizes': sizes} for case_id, sizes in font_sizes],
+            }, f, indent=2)
+    if not args.quiet:
+        for issue in issues[:args.limit]:
+            print(f"{issue.case_id} page {issue.page} {issue.field}: {issue.kind} - {issue.detail}")
+        if len(issues) > args.limit:
+            print(f"... {len(issues) - args.limit} more")
+        if font_sizes:
+            configured = {name: spec['font'] for fields in positions.values() for name, spec in fields.items()}
+            shrunk = sum(size < configured[name] for _, sizes in font_sizes for name, size in sizes.items())
+            print(f"Auto-fit: {shrunk} fields shrunk across {len(font_sizes)} cases")
+        kinds = ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())) or "no issues"
+        print(f"Checked {checked} cases in {elapsed:.2f}s: {kinds}")
+    return 1 if issues else 0
+
+
+def serve_command(args):
+    """Answer render requests over HTTP until interrupted, then print the latency summary"""
+    from .service import RenderService, make_server
+
+    service = RenderService(
+        _read_bytes(args.template), _read_bytes(args.font) if args.font else None, _load_positions(args),
+        workers=args.workers, backend=args.backend, max_batch=args.max_batch,
+        batch_wait=args.batch_wait_ms / 1000, max_queue=args.max_queue,
+    )
+    start = time.perf_counter()
+    with service:
+        server = make_server(service, args.host, args.port, verbose=args.verbose)
+        host, port = server.server_address[:2]
+        print(f"Serving {args.backend} renders on http://{host}:{port}/render with {service.workers} warm workers "
+              f"(ready in {time.perf_counter() - start:.2f}s; batches of up to {service.max_batch}, "
+              f"{args.batch_wait_ms:g} ms wait)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        summary = service.stats.summary()
+    total = summary['latency_ms']['total']
+    print(f"Served {summary['requests']} requests ({summary['failed']} failed, {summary['rejected']} rejected) "
+          f"in {summary['batches']} batches; latency p50 {total.get('p50')} ms, p99 {total.get('p99')} ms")
+    return 0
+
+
+def build_parser():
+    from .archive import COMPRESSION_OPTIONS, DEFAULT_COMPRESSION
+    from .backends import BACKENDS, DEFAULT_BACKEND
+    from .cache import DEFAULT_MAX_BYTES
+    from .service import DEFAULT_BATCH_WAIT, DEFAULT_HOST, DEFAULT_MAX_BATCH, DEFAULT_MAX_QUEUE, DEFAULT_PORT
+
+    parser = argparse.ArgumentParser(prog="python -m handwriting_tool", description="PDF Medical Form Filler")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render = commands.add_parser('render', help="Fill the template for every case and write a ZIP")
+    render.add_argument('--cases', required=True, help="Cases JSON ({'cases': [...]} or a bare array) or JSON Lines")
+    render.add_argument('--template', required=True, help="Blank PDF form")
+    render.add_argument('--out', required=True, help="ZIP file to write (a PDF with --combined)")
+    render.add_argument('--positions', help="Saved positions JSON (defaults to the built-in layout)")
+    render.add_argument('--font', help="Handwriting TTF (defaults to Helvetica)")
+    render.add_argument('--fit', nargs='+', metavar='FIELD',
+                        help="Shrink these fields' font per case until the text fits ('all' for every field)")
+    render.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    render.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="Rendering engine for ZIP output (combined output always uses reportlab)")
+    render.add_argument('--compression', choices=list(COMPRESSION_OPTIONS), default=DEFAULT_COMPRESSION)
+    render.add_argument('--combined', action='store_true', help="Write one bookmarked PDF with every case instead of a ZIP")
+    render.add_argument('--cache', metavar='DIR', help="Reuse and store rendered PDFs in this cache directory (ZIP output)")
+    render.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar='MB',
+                        help="Evict least recently used cache entries beyond this size")
+    render.add_argument('--report', help="Also write the run summary as JSON here")
+    render.add_argument('--metrics', help="Write stage timings and the latency histogram here (.prom for Prometheus text, else JSON)")
+    render.add_argument('--quiet', action='store_true', help="Only print problems")
+    render.set_defaults(handler=render_command)
+
+    check = commands.add_parser('check', help="Find text that would overflow its box, without rendering")
+    check.add_argument('--cases', required=True, help="Cases JSON ({'cases': [...]} or a bare array) or JSON Lines")
+    check.add_argument('--positions', help="Saved positions JSON (defaults to the built-in layout)")
+    check.add_argument('--font', help="Handwriting TTF (defaults to Helvetica)")
+    check.add_argument('--fit', nargs='+', metavar='FIELD',
+                       help="Shrink these fields' font per case until the text fits ('all' for every field)")
+    check.add_argument('--json', help="Also write every issue as JSON here")
+    check.add_argument('--limit', type=int, default=50, help="Issues to print (default: 50)")
+    check.add_argument('--quiet', action='store_true', help="Print nothing; the exit status says whether every field fits")
+    check.set_defaults(handler=check_command)
+
+    serve = commands.add_parser('serve', help="Render one case per HTTP request with warm workers")
+    serve.add_argument('--template', required=True, help="Blank PDF form")
+    serve.add_argument('--positions', help="Saved positions JSON (defaults to the built-in layout)")
+    serve.add_argument('--font', help="Handwriting TTF (defaults to Helvetica)")
+    serve.add_argument('--fit', nargs='+', metavar='FIELD',
+                       help="Shrink these fields' font per case until the text fits ('all' for every field)")
+    serve.add_argument('--backend', choices=list(BACKENDS), default=DEFAULT_BACKEND, help="Rendering engine")
+    serve.add_argument('--workers', type=int, default=None,
+                       help="Worker processes (default: CPU count; 1 renders in the server process)")
+    serve.add_argument('--host', default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}; 0 for any)")
+    serve.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                       help=f"Most requests rendered together in one worker task (default: {DEFAULT_MAX_BATCH})")
+    serve.add_argument('--batch-wait-ms', type=float, default=DEFAULT_BATCH_WAIT * 1000,
+                       help=f"How long a batch waits for more requests (default: {DEFAULT_BATCH_WAIT * 1000:g} ms)")
+    serve.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                       help=f"Waiting requests beyond which new ones get 503 (default: {DEFAULT_MAX_QUEUE})")
+    serve.add_argument('--verbose', action='store_true', help="Log every request")
+    serve.set_defaults(handler=serve_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
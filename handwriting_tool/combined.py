@@ -0,0 +1,90 @@
+"""One multi-case PDF for a whole batch, with a bookmark per case"""
+import time
+from io import BytesIO
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from .batch import case_id_for
+from .metrics import StageTimes
+from .render import OVERLAY_PAGES, draw_runs, layout_case
+
+
+def render_combined(cases, template, font_name, saved_specs, bookmarks=True, progress=None, metrics=None):
+    """Render every case into a single PDF
+
+    All overlays are drawn on one reportlab canvas, so the handwriting font
+    is embedded once for the whole batch. Each case gets fresh copies of the
+    template pages that share the template's content streams, images and
+    fonts by reference, plus its own overlay Form XObject.
+
+    With a metrics.RunMetrics, each case's layout, draw and merge times are
+    recorded, and the single write of the combined file is added as a stage.
+
+    progress(done, failed=...) is called after each case is drawn with the
+    cases seen so far, then with that final count after each merge, so a
+    cancel can still stop the merge.
+
+    Returns (pdf bytes, number of cases rendered, failure lines).
+    """
+    overlay_buffer = BytesIO()
+    c = canvas.Canvas(overlay_buffer, pagesize=(template.page_width, template.page_height))
+
+    drawn = []
+    failed_cases = []
+    overlay_start = 0
+    for index, case in enumerate(cases):
+        case_id = case_id_for(case, index)
+        if not isinstance(case, dict):
+            failed_cases.append(f"Case {index+1}: Invalid")
+            if progress:
+                progress(index + 1, failed=len(failed_cases))
+            continue
+        stages = StageTimes()
+        try:
+            runs = layout_case(case, font_name, saved_specs, template.page_height)
+            stages.lap('layout')
+            draw_runs(c, runs, font_name)
+            stages.lap('draw')
+            drawn.append((case_id, overlay_start, stages))
+        except Exception as e:
+            failed_cases.append(f"{case_id}: {str(e)[:50]}")
+        if progress:
+            progress(index + 1, failed=len(failed_cases))
+        # Keep the overlay pages aligned even when a case failed half way
+        c.showPage()
+        overlay_start = c.getPageNumber() - 1
+        while overlay_start % OVERLAY_PAGES:
+            c.showPage()
+            overlay_start = c.getPageNumber() - 1
+    save_start = time.perf_counter()
+    c.save()
+    if metrics is not None:
+        metrics.add_stages({'draw': time.perf_counter() - save_start})
+
+    overlay_pdf = PdfReader(BytesIO(overlay_buffer.getvalue()))
+    writer = PdfWriter()
+    shared = {}
+
+    seen = len(drawn) + len(failed_cases)
+    for case_id, overlay_start, stages in drawn:
+        stages.restart()
+        new_pages = template.add_pages(writer)
+        for page_num, page in enumerate(new_pages):
+            if page_num < OVERLAY_PAGES:
+                template.stamp(writer, page, overlay_pdf.pages[overlay_start + page_num], page_num + 1, shared)
+        if bookmarks:
+            writer.add_outline_item(case_id, len(writer.pages) - len(new_pages))
+        stages.lap('merge')
+        if metrics is not None:
+            metrics.add_case(stages, pages=len(new_pages))
+        if progress:
+            progress(seen, failed=len(failed_cases))
+
+    write_start = time.perf_counter()
+    output_buffer = BytesIO()
+    writer.write(output_buffer)
+    if metrics is not None:
+        metrics.add_stages({'write': time.perf_counter() - write_start})
+        metrics.bytes += output_buffer.tell()
+        for _ in failed_cases:
+            metrics.add_failure()
+    return output_buffer.getvalue(), len(drawn), failed_cases
@@ -0,0 +1,70 @@
+"""Render-free check that every field's text fits its box
+
+Uses the same field list, wrapping rule and glyph metrics as layout_case,
+but never draws or writes a PDF, so a whole batch can be checked before
+committing to a render.
+"""
+from collections import Counter, namedtuple
+from .batch import case_id_for
+from .layout import field_fit, fitted_font_size
+from .render import PAGE2_ROWS, case_fields, page2_columns
+
+# kind is one of ISSUE_KINDS; page is 1 or 2
+FitIssue = namedtuple('FitIssue', ['case_id', 'page', 'field', 'kind', 'detail'])
+
+ISSUE_KINDS = {
+    'overflow': "Wrapped text is taller than its box",
+    'too_wide': "A line is wider than its box",
+    'truncated': "Entries beyond the page 2 rows are dropped",
+}
+
+
+def check_case(case_data, font_name, saved_specs, case_id=None):
+    """Fit problems of one normalized case and the sizes chosen for auto-fit fields
+
+    Returns (issues, {field name: font size}); auto-fit fields are checked
+    at the size they will be drawn at.
+    """
+    case_id = case_id or case_id_for(case_data, 0)
+    page_specs = (saved_specs['page1'], saved_specs['page2'])
+    issues = []
+    font_sizes = {}
+
+    for page_index, field_name, value in case_fields(case_data):
+        text = str(value).strip() if value else ''
+        if not text:
+            continue
+        spec = page_specs[page_index][field_name]
+        font_size = None
+        if spec.get('fit'):
+            font_size = font_sizes[field_name] = fitted_font_size(text, spec, font_name)
+        for kind, detail in field_fit(text, spec, font_name, font_size):
+            issues.append(FitIssue(case_id, page_index + 1, field_name, kind, detail))
+
+    for prefix, values in page2_columns(case_data):
+        if len(values) > PAGE2_ROWS:
+            issues.append(FitIssue(case_id, 2, f'{prefix}*', 'truncated',
+                                   f"{len(values)} entries, only {PAGE2_ROWS} rows are drawn"))
+    return issues, font_sizes
+
+
+def check_cases(cases, font_name, saved_specs):
+    """Check a whole batch
+
+    Returns (cases checked, issues, issue count per kind, [(case id, auto-fit
+    font sizes), ...]); the last lists cases with auto-fit fields in input
+    order, so cases sharing an id each keep their own sizes.
+    """
+    checked = 0
+    issues = []
+    font_sizes = []
+    for index, case in enumerate(cases):
+        if not isinstance(case, dict):
+            continue
+        checked += 1
+        case_id = case_id_for(case, index)
+        case_issues, case_sizes = check_case(case, font_name, saved_specs, case_id)
+        issues.extend(case_issues)
+        if case_sizes:
+            font_sizes.append((case_id, case_sizes))
+    return checked, issues, Counter(issue.kind for issue in issues), font_sizes
@@ -0,0 +1,37 @@
+"""Process-wide registry of handwriting fonts keyed by content hash"""
+import hashlib
+import threading
+from io import BytesIO
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# font digest -> registered reportlab font name
+_REGISTERED_FONTS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def font_hash(font_bytes):
+    """Content hash used to name registered fonts"""
+    return hashlib.sha256(font_bytes).hexdigest()
+
+
+def register_font(font_bytes):
+    """Register TTF bytes with reportlab once and return the font name to use
+
+    Every distinct font gets its own name, so swapping fonts between runs
+    never reuses a face registered for different bytes.
+    """
+    digest = font_hash(font_bytes)
+    font_name = _REGISTERED_FONTS.get(digest)
+    if font_name is not None:
+        return font_name
+
+    with _REGISTRY_LOCK:
+        font_name = _REGISTERED_FONTS.get(digest)
+        if font_name is None:
+            font_name = f"Handwriting-{digest[:16]}"
+            buffer = BytesIO(font_bytes)
+            buffer.name = f"{font_name}.ttf"
+            pdfmetrics.registerFont(TTFont(font_name, buffer))
+            _REGISTERED_FONTS[digest] = font_name
+        return font_name
@@ -0,0 +1,254 @@
+"""In-memory search index over loaded cases - no Streamlit dependency
+
+Built once per case store, then every query is a handful of NumPy
+operations over per-case arrays instead of a pass over the cases:
+
+- dates as yyyymmdd integers, so a date range is two comparisons
+- main_theme as codes into the distinct themes; a theme search scans the
+  distinct themes only
+- EPA labels and rubric levels as position lists per value
+- case_summary words as an inverted index: one sorted position list per
+  lowercased word, all in one array with offsets
+
+Queries return sorted case positions; CaseSelection turns them back into a
+sequence of cases that generation jobs can iterate.
+"""
+import bisect
+import datetime
+import re
+from array import array
+from itertools import count
+from .store import EPA_FIELDS
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_EPA_NUMBER = re.compile(r'(\d+)')
+
+# Characters of the summary shown per row of the case table
+SUMMARY_PREVIEW = 80
+
+
+def _column(cases, name, default=None):
+    """One field of every case: CaseStore.column(), or a pass over case dicts
+
+    name is a top-level key or an epa_assessment list name, as for
+    CaseStore.value().
+    """
+    if hasattr(cases, 'column'):
+        return cases.column(name, default)
+    nested = any(name == epa_name for epa_name, _ in EPA_FIELDS)
+    values = []
+    for case in cases:
+        if nested and isinstance(case, dict):
+            case = case.get('epa_assessment') or {}
+        values.append(case.get(name, default) if isinstance(case, dict) else default)
+    return values
+
+
+def _date_key(value):
+    """yyyymmdd integer of a date string or datetime.date, 0 when it has none"""
+    if isinstance(value, datetime.date):
+        return value.year * 10000 + value.month * 100 + value.day
+    match = DATE_PATTERN.match(value) if isinstance(value, str) else None
+    if not match:
+        return 0
+    year, month, day = (int(part) for part in match.groups())
+    return year * 10000 + month * 100 + day
+
+
+def _date_keys(dates):
+    """_date_key of every date, parsing each distinct string once"""
+    known = {}
+    keys = []
+    for value in dates:
+        try:
+            key = known.get(value)
+        except TypeError:
+            key = 0
+        if key is None:
+            key = known[value] = _date_key(value)
+        keys.append(key)
+    return keys
+
+
+def _epa_sort_key(label):
+    match = _EPA_NUMBER.search(label)
+    return (0, int(match.group(1)), label) if match else (1, 0, label)
+
+
+def _words(text):
+    return TOKEN_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+
+
+class CaseIndex:
+    """Date, theme, EPA, rubric level and summary word index over a sequence of cases
+
+    cases is a CaseStore or a list of normalized case dicts; it is only read.
+    """
+
+    def __init__(self, cases):
+        import numpy as np
+
+        self.cases = cases
+        dates = _column(cases, 'date')
+        self.count = len(dates)
+
+        self.date_keys = np.array(_date_keys(dates), dtype=np.int32)
+
+        # Distinct themes once each; cases hold a code
+        themes = {}
+        codes = [themes.setdefault(theme if isinstance(theme, str) else '', len(themes))
+                 for theme in _column(cases, 'main_theme')]
+        self.themes = list(themes)
+        self._themes_lower = [theme.lower() for theme in self.themes]
+        self.theme_codes = np.array(codes, dtype=np.int32)
+
+        self._epas = self._postings(_column(cases, 'epa_tested', []))
+        self._levels = self._postings(_column(cases, 'rubric_levels', []))
+        self.epa_labels = sorted(self._epas, key=_epa_sort_key)
+        self.rubric_levels = sorted(self._levels)
+        self._index_words(_column(cases, 'case_summary'))
+
+    @staticmethod
+    def _postings(lists):
+        """value -> sorted positions of the cases whose list holds it"""
+        import numpy as np
+
+        positions = {}
+        for index, items in enumerate(lists):
+            if isinstance(items, list):
+                for item in set(str(item) for item in items):
+                    positions.setdefault(item, array('I')).append(index)
+        return {value: np.frombuffer(found, dtype=np.uint32) for value, found in positions.items()}
+
+    def _index_words(self, summaries):
+        import numpy as np
+
+        # Every (case, word) pair gets a word id from a running counter: the
+        # first id handed to a word is its id, later ones are just skipped
+        word_ids = {}
+        ids = array('q')
+        counts = array('I')
+        counter = count()
+        for summary in summaries:
+            words = set(_words(summary))
+            counts.append(len(words))
+            ids.extend(map(word_ids.setdefault, words, counter))
+
+        ids = np.frombuffer(ids, dtype=np.int64)
+        positions = np.repeat(np.arange(self.count, dtype=np.uint32), np.frombuffer(counts, dtype=np.uint32))
+        # Stable, so the positions of one word stay in case order
+        order = np.argsort(ids, kind='stable')
+        self._word_positions = positions[order]
+        sorted_ids = ids[order]
+        distinct, starts = np.unique(sorted_ids, return_index=True)
+        self._word_offsets = np.append(starts, len(sorted_ids))
+
+        words = list(word_ids)
+        dense = np.searchsorted(distinct, np.fromiter(word_ids.values(), dtype=np.int64, count=len(words)))
+        self._word_ids = dict(zip(words, dense.tolist()))
+        self.vocabulary = sorted(words)
+
+    @property
+    def date_range(self):
+        """(first, last) datetime.date of the cases with a date, or None"""
+        import numpy as np
+
+        keys = self.date_keys[self.date_keys > 0]
+        if not len(keys):
+            return None
+        low, high = int(np.min(keys)), int(np.max(keys))
+        try:
+            return (datetime.date(low // 10000, low // 100 % 100, low % 100),
+                    datetime.date(high // 10000, high // 100 % 100, high % 100))
+        except ValueError:
+            return None
+
+    def word_positions(self, prefix):
+        """Sorted positions of the cases whose summary has a word starting with prefix"""
+        import numpy as np
+
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        runs = [self._word_ids[word] for word in self.vocabulary[start:end]]
+        if len(runs) == 1:
+            return self._word_positions[self._word_offsets[runs[0]]:self._word_offsets[runs[0] + 1]]
+        mask = np.zeros(self.count, dtype=bool)
+        for run in runs:
+            mask[self._word_positions[self._word_offsets[run]:self._word_offsets[run + 1]]] = True
+        return np.flatnonzero(mask)
+
+    def search(self, date_from=None, date_to=None, theme=None, epas=None, rubric_levels=None, text=None):
+        """Sorted positions of the cases matching every given filter
+
+        date_from and date_to are inclusive (date strings or datetime.date);
+        a case without a date matches neither. theme matches a case whose
+        main_theme contains it, ignoring case. epas and rubric_levels match
+        a case with any of the given labels. Every word of text must start
+        a word of the case summary.
+        """
+        import numpy as np
+
+        mask = np.ones(self.count, dtype=bool)
+        if date_from is not None or date_to is not None:
+            mask &= self.date_keys > 0
+        if date_from is not None:
+            mask &= self.date_keys >= _date_key(date_from)
+        if date_to is not None:
+            mask &= self.date_keys <= _date_key(date_to)
+
+        if theme:
+            needle = theme.lower()
+            codes = [code for code, lowered in enumerate(self._themes_lower) if needle in lowered]
+            mask &= np.isin(self.theme_codes, np.array(codes, dtype=np.int32))
+
+        for selected, postings in ((epas, self._epas), (rubric_levels, self._levels)):
+            if selected:
+                found = np.zeros(self.count, dtype=bool)
+                for value in selected:
+                    if value in postings:
+                        found[postings[value]] = True
+                mask &= found
+
+        for word in _words(text):
+            found = np.zeros(self.count, dtype=bool)
+            found[self.word_positions(word)] = True
+            mask &= found
+
+        return np.flatnonzero(mask)
+
+    def rows(self, positions, start=0, stop=None):
+        """Case table rows for positions[start:stop], reading only those cases"""
+        rows = []
+        for position in positions[start:stop]:
+            case = self.cases[int(position)]
+            epa = case.get('epa_assessment') or {}
+            summary = case.get('case_summary', '')
+            summary = summary if isinstance(summary, str) else str(summary)
+            rows.append({
+                'Case': int(position) + 1,
+                'Date': str(case.get('date', '')),
+                'Theme': str(case.get('main_theme', '')),
+                'EPAs': ", ".join(str(item) for item in epa.get('epa_tested', [])),
+                'Rubric': ", ".join(str(item) for item in epa.get('rubric_levels', [])),
+                'Summary': summary if len(summary) <= SUMMARY_PREVIEW else summary[:SUMMARY_PREVIEW - 1] + "…",
+            })
+        return rows
+
+
+class CaseSelection:
+    """Read-only sequence of some cases of a store or list, by position"""
+
+    def __init__(self, cases, positions):
+        self.cases = cases
+        self.positions = array('I', (int(position) for position in positions))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        return self.cases[self.positions[index]]
+
+    def __iter__(self):
+        for position in self.positions:
+            yield self.cases[position]
@@ -0,0 +1,190 @@
+"""Streaming case files: JSON arrays, {'cases': [...]} objects and JSON Lines
+
+Cases are decoded one entry at a time from a file, so memory use depends on
+the largest case rather than on the size of the export.
+"""
+import json
+import os
+from .cases import FIELD_MAP, normalize_batches, normalize_cases
+
+CHUNK_SIZE = 64 * 1024
+
+# How much of the first line is read to tell JSON Lines from one JSON object
+_JSONL_PROBE_LIMIT = 1024 * 1024
+
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+# Keys of a case in either format, raw or normalized
+_CASE_KEYS = frozenset(key for old_key, new_key, _ in FIELD_MAP for key in (old_key, new_key))
+
+
+class _JsonReader:
+    """Incremental JSON decoding over a text file read in chunks"""
+
+    def __init__(self, f):
+        self.f = f
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=CHUNK_SIZE):
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has been consumed before growing the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the current chunk")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill(size):
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self):
+        """Yield the items of the array starting at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError("Malformed JSON array of cases")
+
+
+def _looks_like_jsonl(path):
+    """True when the first line holds a complete case object on its own
+
+    A lone one-line object only counts when it has case keys, so a
+    minified {} or {"meta": ...} is still rejected as a JSON object
+    without a 'cases' array.
+    """
+    if path.lower().endswith(JSONL_EXTENSIONS):
+        return True
+    with open(path, 'r', encoding='utf-8') as f:
+        first_line = f.readline(_JSONL_PROBE_LIMIT).strip()
+        if not first_line.startswith('{'):
+            return False
+        try:
+            record = json.loads(first_line)
+        except ValueError:
+            return False
+        if not isinstance(record, dict) or 'cases' in record:
+            return False
+        if not _CASE_KEYS.isdisjoint(record):
+            return True
+        for line in iter(lambda: f.readline(_JSONL_PROBE_LIMIT), ''):
+            if line.strip():
+                return True
+    return False
+
+
+def _jsonl_entries(f, errors):
+    for line_num, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            errors.append(f"Line {line_num}: invalid JSON ({str(e)[:50]})")
+
+
+def _object_cases(reader):
+    """Stream the 'cases' array of a top-level object, skipping other keys"""
+    reader.expect('{')
+    if reader.peek() == '}':
+        raise ValueError("object has no 'cases' array")
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'cases':
+            if reader.peek() != '[':
+                raise ValueError("'cases' property is not an array")
+            yield from reader.array_items()
+            return
+        reader.value()
+        char = reader.peek()
+        reader.pos += 1
+        if char == '}':
+            break
+        if char != ',':
+            raise ValueError("Malformed JSON object")
+    raise ValueError("object has no 'cases' array")
+
+
+class CaseFile:
+    """Re-iterable lazy view of the normalized cases in a case file
+
+    Every iteration re-reads the file and normalizes entries with
+    transform_case_format as they are decoded, so no pass keeps more than
+    one case in memory; batches() reads it cases.BATCH_SIZE entries at a
+    time instead. Problems found during the last pass are in errors.
+    """
+
+    def __init__(self, path, source_name=None):
+        self.path = path
+        self.source_name = source_name or os.path.basename(path)
+        self.errors = []
+
+    def __iter__(self):
+        self.errors = []
+        return self._cases(self.errors)
+
+    def batches(self):
+        """Iterate the file as normalize_batches() (columns, cases) pairs, for columnar consumers"""
+        self.errors = []
+        return self._cases(self.errors, normalize_batches)
+
+    def _cases(self, errors, normalize=normalize_cases):
+        jsonl = _looks_like_jsonl(self.path)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            if jsonl:
+                yield from normalize(_jsonl_entries(f, errors), errors)
+                return
+
+            reader = _JsonReader(f)
+            start = reader.peek()
+            if start == '[':
+                yield from normalize(reader.array_items(), errors)
+            elif start == '{':
+                yield from normalize(_object_cases(reader), errors, from_cases_array=True)
+            else:
+                raise ValueError(f"{self.source_name} must contain JSON array, object with 'cases' array or JSON Lines")
@@ -0,0 +1,224 @@
+"""Background generation jobs that outlive the script run that started them
+
+A job runs its work function on a daemon thread and keeps progress,
+failures and the finished result in a process-wide registry, so a UI can
+poll it by id from any later rerun and download the result without
+generating it again. Ids are not secret: a UI should only look up the ids
+it submitted itself. To find a job again from a new session (a page
+reload), it hands out the job's token, an unguessable secret that
+find() checks. A job's output is kept in a temporary file,
+not in memory, so it can be downloaded any number of times; the file is
+deleted when the job is dismissed (discard_artifact) or dropped from the
+registry. Finished jobs are dropped per owner (a UI session), oldest first
+once that owner has more than max_finished of them, so one session's runs
+never evict another's download; any owner's jobs expire max_age seconds
+after they finish, so abandoned sessions do not keep their files forever.
+"""
+import atexit
+import hmac
+import os
+import secrets
+import tempfile
+import threading
+import time
+import uuid
+
+# Finished jobs kept for download per owner; older ones are dropped first
+MAX_FINISHED_JOBS = 8
+# Seconds a finished job is kept for download, whoever owns it
+MAX_FINISHED_AGE = 6 * 60 * 60
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_RUNNER = None
+_RUNNER_LOCK = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside the work function once the job has been cancelled"""
+
+
+class Job:
+    """One background run: progress counters, cancellation flag and result
+
+    The work function receives the job and reports through progress() and
+    watch(); both raise JobCancelled after cancel(), which ends the work at
+    the next case.
+    """
+
+    def __init__(self, label, total=0, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.token = secrets.token_urlsafe(24)
+        self.label = label
+        self.owner = owner
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.status = RUNNING
+        self.result = None
+        self.error = None
+        self.artifact = None
+        self.started = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def progress(self, done, total=None, failed=None):
+        """Record cases finished so far; raises JobCancelled once cancelled"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if failed is not None:
+            self.failed = failed
+        self.check()
+
+    def watch(self, items):
+        """Iterate items, stopping with JobCancelled before the next one once cancelled"""
+        for item in items:
+            self.check()
+            yield item
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def artifact_path(self, suffix):
+        """Path of a new temporary file for the job's output, deleted with the job"""
+        fd, self.artifact = tempfile.mkstemp(prefix=f"job-{self.id}-", suffix=suffix)
+        os.close(fd)
+        return self.artifact
+
+    @property
+    def has_artifact(self):
+        return self.artifact is not None and os.path.exists(self.artifact)
+
+    def read_artifact(self):
+        """Contents of the output file, or empty bytes once it is gone"""
+        path = self.artifact
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except (OSError, TypeError):
+            return b""
+
+    def discard_artifact(self):
+        """Delete the output file, e.g. once its result is dismissed"""
+        path, self.artifact = self.artifact, None
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @property
+    def cancelling(self):
+        return self._cancel.is_set() and self.status == RUNNING
+
+    @property
+    def running(self):
+        return self.status == RUNNING
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def eta(self):
+        """Seconds left at the rate so far, or None before the first case"""
+        if not self.running or not self.done or not self.total:
+            return None
+        return max(self.total - self.done, 0) * self.elapsed / self.done
+
+    def _finish(self, status, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.status = status
+
+
+class JobRunner:
+    """Starts jobs on background threads and looks them up by id"""
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS, max_age=MAX_FINISHED_AGE):
+        self.max_finished = max_finished
+        self.max_age = max_age
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work, label="batch", total=0, owner=None):
+        """Run work(job) in the background and return the job straight away
+
+        owner, e.g. a session id, is the group whose finished jobs count
+        toward max_finished.
+        """
+        self._prune()
+        job = Job(label, total, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+        thread = threading.Thread(target=self._run, args=(job, work), name=f"job-{job.id}", daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, token):
+        """Job whose token is token, or None"""
+        if not isinstance(token, str) or not token:
+            return None
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if hmac.compare_digest(job.token, token):
+                return job
+        return None
+
+    def _run(self, job, work):
+        try:
+            result = work(job)
+        except JobCancelled:
+            job.discard_artifact()
+            job._finish(CANCELLED)
+        except Exception as e:
+            job.discard_artifact()
+            job._finish(FAILED, error=str(e))
+        else:
+            job._finish(DONE, result)
+        self._prune()
+
+    def discard_artifacts(self):
+        """Delete the output files of every job, e.g. when the process exits"""
+        with self._lock:
+            for job in self._jobs.values():
+                job.discard_artifact()
+
+    def _prune(self):
+        expired = time.time() - self.max_age
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if not job.running), key=lambda job: job.finished)
+            by_owner = {}
+            for job in finished:
+                by_owner.setdefault(job.owner, []).append(job)
+            dropped = [job for job in finished if job.finished < expired]
+            for jobs in by_owner.values():
+                dropped.extend(jobs[:max(len(jobs) - self.max_finished, 0)])
+            for job in dropped:
+                if job.id in self._jobs:
+                    job.discard_artifact()
+                    del self._jobs[job.id]
+
+
+def get_job_runner():
+    """Process-wide JobRunner, shared by every session"""
+    global _RUNNER
+    with _RUNNER_LOCK:
+        if _RUNNER is None:
+            _RUNNER = JobRunner()
+            atexit.register(_RUNNER.discard_artifacts)
+        return _RUNNER
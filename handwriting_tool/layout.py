@@ -0,0 +1,212 @@
+"""Word wrapping and fit checks from cached glyph advances"""
+import threading
+from functools import lru_cache
+from reportlab.pdfbase import pdfmetrics
+
+# Room kept free inside a box: 5pt inset on the left plus 5pt on the right
+BOX_PADDING = 10
+
+# Auto-fit never shrinks text below MIN_FONT_SIZE and tries sizes FIT_STEP apart
+MIN_FONT_SIZE = 6
+FIT_STEP = 0.5
+
+# Font name -> GlyphAdvances. Registered font names are content-hashed, so a
+# name always refers to the same glyph metrics.
+_ADVANCES = {}
+_ADVANCES_LOCK = threading.Lock()
+
+
+class GlyphAdvances:
+    """Advance widths of one font in 1/1000 em, measured once per character
+
+    Widths are kept as integers and summed exactly, so a line measured from
+    word widths gives the same value as reportlab's stringWidth on the joined
+    string. TrueType faces with fractional widths are marked inexact and
+    measured through stringWidth instead.
+    """
+
+    def __init__(self, font_name):
+        self.font_name = font_name
+        self.font = pdfmetrics.getFont(font_name)
+        self.face = getattr(self.font, 'face', None)
+        self.is_truetype = hasattr(self.face, 'charWidths')
+        if self.is_truetype:
+            self.exact = all(float(width).is_integer() for width in self.face.charWidths.values())
+        else:
+            self.exact = True
+        self._widths = {}
+
+    def char_units(self, char):
+        width = self._widths.get(char)
+        if width is None:
+            if self.is_truetype:
+                width = self.face.charWidths.get(ord(char), self.face.defaultWidth)
+            else:
+                fonts = [self.font] + self.font.substitutionFonts
+                width = sum(sum(map(f.widths.__getitem__, t)) for f, t in pdfmetrics.unicode2T1(char, fonts))
+            self._widths[char] = width
+        return width
+
+    def text_units(self, text):
+        try:
+            return sum(map(self._widths.__getitem__, text))
+        except KeyError:
+            # First sighting of a character: measure it, then sum again
+            for char in set(text):
+                self.char_units(char)
+            return sum(map(self._widths.__getitem__, text))
+
+    def width(self, text, font_size):
+        """Width of text in points, as wrap_text measures it"""
+        if self.exact:
+            return self.to_points(self.text_units(text), font_size)
+        return self.font.stringWidth(text, font_size)
+
+    def to_points(self, units, font_size):
+        # Same operation order as reportlab so the floats compare identically
+        if self.is_truetype:
+            return 0.001 * font_size * units
+        return units * 0.001 * font_size
+
+
+def get_advances(font_name):
+    """Process-wide glyph advance table for a registered font"""
+    advances = _ADVANCES.get(font_name)
+    if advances is None:
+        with _ADVANCES_LOCK:
+            advances = _ADVANCES.get(font_name)
+            if advances is None:
+                advances = GlyphAdvances(font_name)
+                _ADVANCES[font_name] = advances
+    return advances
+
+
+@lru_cache(maxsize=32768)
+def wrap_text(text, font_name, font_size, box_width_pts):
+    """Greedy word wrap of text into a box, returned as a tuple of lines
+
+    Each word is measured once and candidate lines are priced from the
+    running width, instead of re-measuring the whole growing line.
+    """
+    advances = get_advances(font_name)
+    max_width = box_width_pts - BOX_PADDING
+    words = text.split()
+
+    if not advances.exact:
+        measure = advances.font.stringWidth
+        lines = []
+        current_line = ""
+        for word in words:
+            test_line = f"{current_line} {word}".strip()
+            if measure(test_line, font_size) <= max_width:
+                current_line = test_line
+            else:
+                if current_line:
+                    lines.append(current_line)
+                current_line = word
+        if current_line:
+            lines.append(current_line)
+        return tuple(lines)
+
+    space_units = advances.char_units(' ')
+    to_points = advances.to_points
+
+    lines = []
+    line_words = []
+    line_units = 0
+    for word in words:
+        word_units = advances.text_units(word)
+        test_units = line_units + space_units + word_units if line_words else word_units
+
+        if to_points(test_units, font_size) <= max_width:
+            line_words.append(word)
+            line_units = test_units
+        else:
+            if line_words:
+                lines.append(" ".join(line_words))
+            line_words = [word]
+            line_units = word_units
+
+    if line_words:
+        lines.append(" ".join(line_words))
+    return tuple(lines)
+
+
+def line_height_for(font_size):
+    """Baseline-to-baseline distance of wrapped lines"""
+    # Adjust line height for larger fonts
+    if font_size > 20:
+        return font_size * 1.1
+    return font_size + 2
+
+
+def wraps(text, spec):
+    """Whether a field's text is word-wrapped; short text and short boxes stay on one line"""
+    return len(text) > 50 and spec['h'] > 0.5
+
+
+def field_fit(text, spec, font_name, font_size=None):
+    """Problems with one field's text in its box, as (kind, detail) pairs"""
+    font_size = spec['font'] if font_size is None else font_size
+    advances = get_advances(font_name)
+    box_width = spec['w'] * 72
+    box_height = spec['h'] * 72
+    # Text starts inset from the left edge; anything past the right edge spills out
+    room = box_width - BOX_PADDING / 2
+
+    problems = []
+    if wraps(text, spec):
+        lines = wrap_text(text, font_name, font_size, box_width)
+        block_height = (len(lines) - 1) * line_height_for(font_size) + font_size
+        if block_height > box_height:
+            problems.append(('overflow', f"{len(lines)} lines need {block_height:.0f}pt, box is {box_height:.0f}pt"))
+        # Only a single word longer than the box can still be too wide
+        widest = max((advances.width(line, font_size) for line in lines if ' ' not in line), default=0)
+        if widest > room:
+            problems.append(('too_wide', f"unbreakable word {widest:.0f}pt wide, box fits {room:.0f}pt"))
+    else:
+        width = advances.width(text, font_size)
+        if width > room:
+            reason = "box is one line high" if spec['h'] <= 0.5 else "text is too short to wrap"
+            problems.append(('too_wide', f"{width:.0f}pt on one line, box fits {room:.0f}pt ({reason})"))
+    return problems
+
+
+def fitted_font_size(text, spec, font_name):
+    """Largest font size up to spec['font'] at which text fits its box
+
+    Falls back to MIN_FONT_SIZE when nothing fits. Memoized per text, font
+    and box, so laying out the same case again costs a dict lookup.
+    """
+    return _fitted_font_size(text, font_name, spec['w'], spec['h'], spec['font'])
+
+
+@lru_cache(maxsize=131072)
+def _fitted_font_size(text, font_name, width, height, font_size):
+    spec = {'w': width, 'h': height}
+    if font_size <= MIN_FONT_SIZE or not field_fit(text, spec, font_name, font_size):
+        return font_size
+    if field_fit(text, spec, font_name, MIN_FONT_SIZE):
+        return MIN_FONT_SIZE
+
+    # Binary search over the sizes MIN_FONT_SIZE + k * FIT_STEP below font_size.
+    # Fitting is monotonic: a smaller size never wraps into more lines.
+    low = 1
+    high = int((font_size - MIN_FONT_SIZE) / FIT_STEP)
+    if MIN_FONT_SIZE + high * FIT_STEP >= font_size:
+        high -= 1
+    unit_width = get_advances(font_name).width(text, 1)
+    if unit_width and not wraps(text, spec):
+        # One line scales linearly with the size, so the answer is next to this estimate
+        estimate = (width * 72 - BOX_PADDING / 2) / unit_width
+        high = max(low, min(high, int((estimate - MIN_FONT_SIZE) / FIT_STEP) + 1))
+    best = MIN_FONT_SIZE
+    while low <= high:
+        middle = (low + high) // 2
+        size = MIN_FONT_SIZE + middle * FIT_STEP
+        if field_fit(text, spec, font_name, size):
+            high = middle - 1
+        else:
+            best = size
+            low = middle + 1
+    return best
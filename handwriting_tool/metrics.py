@@ -0,0 +1,178 @@
+"""Per-stage timing and throughput of a generation run"""
+import bisect
+import json
+import time
+
+STAGES = ("layout", "draw", "merge", "write", "zip")
+
+# Upper bounds in seconds of the per-case latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METRIC_PREFIX = "handwriting_tool"
+
+# Latency percentiles reported by the render service and its load test
+PERCENTILES = (50, 90, 95, 99)
+
+
+class StageTimes(dict):
+    """Seconds spent per stage while rendering one case
+
+    Call lap(stage) at the end of each stage; it charges the time since the
+    previous lap (or since creation) to that stage.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._last = time.perf_counter()
+
+    def restart(self):
+        """Start timing the next stage from now"""
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self[stage] = self.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def __reduce__(self):
+        # Travels back from worker processes as a plain dict
+        return (dict, (dict(self),))
+
+
+class RunMetrics:
+    """Stage totals, per-case latency histogram and throughput of one run"""
+
+    def __init__(self, label="batch"):
+        self.label = label
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latencies = 0
+        self.cases = 0
+        self.cached = 0
+        self.failed = 0
+        self.pages = 0
+        self.bytes = 0
+        self._start = time.perf_counter()
+        self.wall_seconds = None
+        self.finished_at = None
+
+    def add_stages(self, stages):
+        for stage, seconds in stages.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_case(self, stages=None, pages=0, size=0, cached=False):
+        """Record one generated case; cached cases count towards throughput only"""
+        self.cases += 1
+        self.pages += pages
+        self.bytes += size
+        if cached:
+            self.cached += 1
+            return
+        if stages:
+            self.add_stages(stages)
+            latency = sum(stages.values())
+            self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self.latency_sum += latency
+            self.latencies += 1
+
+    def add_result(self, result, pages, zip_seconds=0.0):
+        """Record a batch.BatchResult together with the time spent zipping it"""
+        if result.error:
+            self.add_failure()
+            return
+        if result.cached:
+            self.add_stages({'zip': zip_seconds})
+            self.add_case(pages=pages, size=len(result.pdf), cached=True)
+        else:
+            self.add_case(dict(result.stages or {}, zip=zip_seconds), pages=pages, size=len(result.pdf))
+
+    def add_failure(self):
+        self.failed += 1
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._start
+        self.finished_at = time.time()
+        return self
+
+    def summary(self):
+        """Plain dict of the run, as shown in the UI and exported as JSON"""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self._start
+        cumulative = 0
+        histogram = []
+        for bound, count in zip(LATENCY_BUCKETS + (None,), self.bucket_counts):
+            cumulative += count
+            histogram.append({"le": bound if bound is not None else "+Inf", "count": count, "cumulative": cumulative})
+        return {
+            "label": self.label,
+            "finished_at": round(self.finished_at, 3) if self.finished_at else None,
+            "cases": self.cases,
+            "cached": self.cached,
+            "failed": self.failed,
+            "pages": self.pages,
+            "bytes": self.bytes,
+            "wall_seconds": round(wall, 4),
+            "pages_per_second": round(self.pages / wall, 2) if wall > 0 else None,
+            "bytes_per_second": round(self.bytes / wall, 1) if wall > 0 else None,
+            "stage_seconds": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            "case_latency": {
+                "count": self.latencies,
+                "sum_seconds": round(self.latency_sum, 4),
+                "mean_seconds": round(self.latency_sum / self.latencies, 5) if self.latencies else None,
+                "histogram": histogram,
+            },
+        }
+
+
+def percentiles(samples, points=PERCENTILES):
+    """{'p50': ..., 'p99': ...} of samples by nearest rank, None for each when there are none"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": None for point in points}
+    return {f"p{point}": ordered[max(0, -(-point * len(ordered) // 100) - 1)] for point in points}
+
+
+def to_json(summary):
+    return json.dumps(summary, indent=2)
+
+
+def to_prometheus(summary, prefix=METRIC_PREFIX):
+    """Prometheus text exposition of a run summary"""
+    label = f'run="{summary["label"]}"'
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent per rendering stage in the last run",
+        f"# TYPE {prefix}_stage_seconds gauge",
+    ]
+    for stage, seconds in summary["stage_seconds"].items():
+        lines.append(f'{prefix}_stage_seconds{{{label},stage="{stage}"}} {seconds}')
+
+    latency = summary["case_latency"]
+    lines += [
+        f"# HELP {prefix}_case_latency_seconds Render time per case in the last run",
+        f"# TYPE {prefix}_case_latency_seconds histogram",
+    ]
+    for bucket in latency["histogram"]:
+        lines.append(f'{prefix}_case_latency_seconds_bucket{{{label},le="{bucket["le"]}"}} {bucket["cumulative"]}')
+    lines.append(f"{prefix}_case_latency_seconds_sum{{{label}}} {latency['sum_seconds']}")
+    lines.append(f"{prefix}_case_latency_seconds_count{{{label}}} {latency['count']}")
+
+    gauges = (
+        ("cases", "Cases generated in the last run"),
+        ("cached", "Cases served from the render cache in the last run"),
+        ("failed", "Cases that failed in the last run"),
+        ("pages", "PDF pages produced in the last run"),
+        ("bytes", "PDF bytes produced in the last run"),
+        ("wall_seconds", "Wall time of the last run"),
+        ("pages_per_second", "Pages per second in the last run"),
+        ("bytes_per_second", "Bytes per second in the last run"),
+    )
+    for name, help_text in gauges:
+        value = summary[name]
+        if value is None:
+            continue
+        lines += [
+            f"# HELP {prefix}_{name} {help_text}",
+            f"# TYPE {prefix}_{name} gauge",
+            f"{prefix}_{name}{{{label}}} {value}",
+        ]
+    return "\n".join(lines) + "\n"
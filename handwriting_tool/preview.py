@@ -0,0 +1,37 @@
+"""Encoded page backgrounds for the positioning preview - no Streamlit dependency"""
+import base64
+from io import BytesIO
+from PIL import Image
+
+# key -> (label, PIL format, max width in pixels or None, MIME type)
+PREVIEW_FORMATS = {
+    "png": ("PNG - full resolution, lossless", "PNG", None, "image/png"),
+    "webp": ("WebP - 1000 px wide", "WEBP", 1000, "image/webp"),
+    "jpeg": ("JPEG - 1000 px wide", "JPEG", 1000, "image/jpeg"),
+}
+DEFAULT_PREVIEW_FORMAT = "webp"
+
+LOSSY_QUALITY = 85
+
+
+def encode_background(img, preview_format=DEFAULT_PREVIEW_FORMAT):
+    """Encode a page raster (PIL image or numpy array) as a data URI for the preview background
+
+    Downscaled images are still stretched over the full-resolution pixel
+    grid, so field rectangles keep their coordinates.
+    """
+    _, image_format, max_width, mime = PREVIEW_FORMATS[preview_format]
+
+    img_pil = img if isinstance(img, Image.Image) else Image.fromarray(img)
+    if max_width and img_pil.width > max_width:
+        height = round(img_pil.height * max_width / img_pil.width)
+        img_pil = img_pil.resize((max_width, height), Image.LANCZOS)
+    if image_format == "JPEG" and img_pil.mode != "RGB":
+        img_pil = img_pil.convert("RGB")
+
+    buffer = BytesIO()
+    if image_format == "PNG":
+        img_pil.save(buffer, format=image_format)
+    else:
+        img_pil.save(buffer, format=image_format, quality=LOSSY_QUALITY)
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}"
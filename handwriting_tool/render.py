@@ -0,0 +1,155 @@
+"""Fill one case onto the blank form - no Streamlit dependency"""
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.lib.colors import Color
+from .fonts import register_font
+from .layout import fitted_font_size, line_height_for, wrap_text, wraps
+
+FONT_COLOR = Color(0.102, 0.227, 0.486)
+DEFAULT_FONT = 'Helvetica'
+
+# Overlay pages drawn per case: the form has a front and a back
+OVERLAY_PAGES = 2
+
+# Page 2 table: epa_assessment list -> field name prefix, one column each
+PAGE2_COLUMNS = (
+    ('epa_tested', 'epa_row'),
+    ('rubric_levels', 'rubric_row'),
+    ('strength_points', 'strength_row'),
+    ('points_needing_improvement', 'improve_row'),
+)
+PAGE2_ROWS = 4
+
+
+def resolve_font(font_bytes):
+    """Registered font name for these bytes, falling back to Helvetica"""
+    if font_bytes:
+        try:
+            # Registered once per distinct font, no temp file
+            return register_font(font_bytes)
+        except Exception:
+            pass
+    return DEFAULT_FONT
+
+
+def render_case(case_data, template, font_name, saved_specs, stages=None):
+    """Render a case dict onto a compiled template and return the PDF bytes
+
+    stages, a metrics.StageTimes, collects the layout, draw, merge and
+    write times when given.
+    """
+    if not isinstance(case_data, dict):
+        return None
+
+    runs = layout_case(case_data, font_name, saved_specs, template.page_height)
+    if stages is not None:
+        stages.lap('layout')
+
+    overlay_buffer = BytesIO()
+    c = canvas.Canvas(overlay_buffer, pagesize=(template.page_width, template.page_height))
+    draw_runs(c, runs, font_name)
+    c.save()
+    if stages is not None:
+        stages.lap('draw')
+
+    # Merge
+    return template.merge(overlay_buffer.getvalue(), stages)
+
+
+def draw_runs(c, runs, font_name):
+    """Draw laid-out text runs over both overlay pages; the caller ends the second page"""
+    page_index = 0
+    for run_page, font_size, lines in runs:
+        while page_index < run_page:
+            c.showPage()
+            page_index += 1
+        c.setFont(font_name, font_size)
+        c.setFillColor(FONT_COLOR)
+        for x, y, line in lines:
+            c.drawString(x, y, line)
+
+    while page_index < OVERLAY_PAGES - 1:
+        c.showPage()
+        page_index += 1
+
+
+def layout_case(case_data, font_name, saved_specs, page_height):
+    """Place every text field of a case without drawing anything
+
+    Returns text runs as (page index, font size, [(x, y, line), ...]) with
+    baseline coordinates in PDF points from the bottom-left corner. Every
+    backend draws from this, so they all break and place lines the same way.
+    """
+    runs = []
+
+    def place_text(text, spec, page_height, page_index=0):
+        if not text:
+            return
+
+        text = str(text).strip()
+        if not text:
+            return
+
+        x_pts = spec['x'] * 72
+        y_pts = (page_height/72 - spec['y'] - spec['h']/2) * 72
+        w_pts = spec['w'] * 72
+
+        font_size = fitted_font_size(text, spec, font_name) if spec.get('fit') else spec['font']
+        line_height = line_height_for(font_size)
+
+        if wraps(text, spec):
+            lines = wrap_text(text, font_name, font_size, w_pts)
+
+            start_y = y_pts + (len(lines) - 1) * line_height / 2
+
+            placed = []
+            for line in lines:
+                placed.append((x_pts + 5, start_y, line))
+                start_y -= line_height
+            runs.append((page_index, font_size, placed))
+        else:
+            runs.append((page_index, font_size, [(x_pts + 5, y_pts, text)]))
+
+    page_specs = (saved_specs['page1'], saved_specs['page2'])
+    for page_index, field_name, value in case_fields(case_data):
+        place_text(value, page_specs[page_index][field_name], page_height, page_index)
+
+    return runs
+
+
+def case_fields(case_data):
+    """Yield (page index, field name, value) for every field of a case, in drawing order"""
+    yield 0, 'date', case_data.get('date', '')
+
+    if 'age_gender' in case_data:
+        yield 0, 'age_gender', case_data['age_gender']
+    else:
+        yield 0, 'age_gender', f"{case_data.get('age', '')} {case_data.get('gender', '')}".strip()
+
+    yield 0, 'main_theme', case_data.get('main_theme', '')
+    yield 0, 'case_summary', case_data.get('case_summary', '')
+
+    reflection = case_data.get('self_reflection', {})
+    if isinstance(reflection, dict):
+        yield 0, 'self_reflection_upper', reflection.get('what_did_right', '')
+        yield 0, 'self_reflection_lower', reflection.get('needs_development', '')
+
+    yield 0, 'signature_mi', case_data.get('signature_mi', '')
+
+    columns = page2_columns(case_data)
+    for i in range(min(PAGE2_ROWS, max(len(values) for _, values in columns))):
+        for prefix, values in columns:
+            if i < len(values):
+                yield 1, f'{prefix}{i + 1}', str(values[i])
+
+
+def page2_columns(case_data):
+    """(field prefix, list of values) for each page 2 column; non-lists count as empty"""
+    epa_data = case_data.get('epa_assessment', {})
+    if not isinstance(epa_data, dict):
+        epa_data = {}
+    columns = []
+    for key, prefix in PAGE2_COLUMNS:
+        values = epa_data.get(key, [])
+        columns.append((prefix, values if isinstance(values, list) else []))
+    return columns
@@ -0,0 +1,205 @@
+"""Input files, page rasters and case stores shared by every session, keyed by content hash
+
+One copy per process, whatever the number of sessions:
+
+- an input file is read into a single immutable bytes object per distinct
+  content, and every session holds a reference to that object
+- a rasterized template page is written once to a .npy file under
+  DEFAULT_RASTER_DIR and opened memory-mapped, read-only; its pixels live
+  in the OS page cache, shared with every other app process on the host
+- a case file is parsed into one read-only CaseStore per distinct content,
+  and searched through one CaseIndex per store, built on first use
+
+Files are hashed once per (path, size, mtime), so a rerun that finds the
+same file on disk only costs a stat. Case files are hashed in chunks and
+never kept as bytes. No Streamlit dependency.
+"""
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from .index import CaseIndex
+from .store import load_case_store
+
+DEFAULT_RASTER_DIR = os.environ.get(
+    'HANDWRITING_TOOL_RASTERS',
+    os.path.join(os.path.expanduser("~"), ".cache", "handwriting_tool", "rasters")
+)
+
+# Bump whenever a change alters the pixels rasterize_page produces
+RASTER_VERSION = 1
+
+# Distinct contents kept per kind; the oldest is dropped first
+_FILE_LIMIT = 8
+_RASTER_LIMIT = 16
+_STORE_LIMIT = 4
+# Bytes read at a time when hashing a case file
+_HASH_CHUNK = 1024 * 1024
+
+# One file read from disk: its bytes and their content hash
+SharedFile = namedtuple('SharedFile', ['path', 'data', 'digest'])
+
+_STAT_DIGESTS = {}  # (path, size, mtime_ns) -> digest
+_FILES = {}         # digest -> bytes
+_RASTERS = {}       # (digest, page, dpi) -> read-only numpy memmap, or None past the last page
+_STORES = {}        # digest -> CaseStore
+_INDEXES = {}       # CaseStore -> CaseIndex
+_LOCK = threading.Lock()
+
+
+def content_hash(data):
+    """SHA-256 of bytes; the same digest template_hash and font_hash give"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _remember(cache, key, value, limit):
+    if len(cache) >= limit:
+        cache.pop(next(iter(cache)))
+    cache[key] = value
+    return value
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+def file_hash(path):
+    """content_hash of a file, read in chunks and never kept in memory"""
+    path = os.path.abspath(path)
+    stat_key = _stat_key(path)
+    with _LOCK:
+        digest = _STAT_DIGESTS.get(stat_key)
+    if digest is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        with _LOCK:
+            _remember(_STAT_DIGESTS, stat_key, digest, _FILE_LIMIT * 4)
+    return digest
+
+
+def shared_file(path):
+    """SharedFile for path, its bytes the same object for every caller with the same content"""
+    path = os.path.abspath(path)
+    stat_key = _stat_key(path)
+    with _LOCK:
+        digest = _STAT_DIGESTS.get(stat_key)
+        data = _FILES.get(digest)
+        if data is not None:
+            return SharedFile(path, data, digest)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = content_hash(data)
+    with _LOCK:
+        # Another path (or an earlier mtime) may already hold the same content
+        data = _FILES.get(digest) or _remember(_FILES, digest, data, _FILE_LIMIT)
+        _remember(_STAT_DIGESTS, stat_key, digest, _FILE_LIMIT * 4)
+    return SharedFile(path, data, digest)
+
+
+def shared_case_store(path):
+    """Read-only CaseStore for a case file, built once per distinct content
+
+    The file is only hashed here, in chunks: its bytes are never held, so
+    the store is the one copy of the cases in memory.
+    """
+    digest = file_hash(path)
+    with _LOCK:
+        store = _STORES.get(digest)
+    if store is None:
+        store = load_case_store(path)
+        with _LOCK:
+            store = _STORES.get(digest) or _remember(_STORES, digest, store, _STORE_LIMIT)
+    return store
+
+
+def shared_case_index(cases):
+    """CaseIndex over a shared CaseStore, built once per store"""
+    with _LOCK:
+        index = _INDEXES.get(cases)
+    if index is None:
+        index = CaseIndex(cases)
+        with _LOCK:
+            index = _INDEXES.get(cases) or _remember(_INDEXES, cases, index, _STORE_LIMIT)
+    return index
+
+
+def rasterize_page(pdf_bytes, page_num, dpi):
+    """Render one page (1-based) to an RGB numpy array, or None when there is no such page"""
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+        if page_num > len(pdf_doc):
+            return None
+        pix = pdf_doc.load_page(page_num - 1).get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), alpha=False)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n).copy()
+
+
+def page_raster(pdf_bytes, page_num, dpi, digest=None, raster_dir=None):
+    """Memory-mapped RGB raster of a template page, rasterized once per content, page and DPI
+
+    Returns a read-only numpy array of shape (height, width, 3), or None
+    when the PDF has no such page.
+    """
+    import numpy as np
+
+    digest = digest or content_hash(pdf_bytes)
+    key = (digest, page_num, dpi)
+    with _LOCK:
+        if key in _RASTERS:
+            return _RASTERS[key]
+
+    raster_dir = raster_dir or DEFAULT_RASTER_DIR
+    path = os.path.join(raster_dir, f"{digest}-p{page_num}-{dpi}-v{RASTER_VERSION}.npy")
+    try:
+        raster = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        pixels = rasterize_page(pdf_bytes, page_num, dpi)
+        raster = None if pixels is None else _write_raster(path, pixels)
+
+    with _LOCK:
+        if key not in _RASTERS:
+            _remember(_RASTERS, key, raster, _RASTER_LIMIT)
+        return _RASTERS[key]
+
+
+def _write_raster(path, pixels):
+    """Store pixels at path and map them back read-only; the array itself if the disk is unusable"""
+    import numpy as np
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.save(f, pixels)
+        # Atomic, so a concurrent reader never maps a half-written file
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r')
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        pixels.setflags(write=False)
+        return pixels
+
+
+def resource_stats():
+    """Counts and in-process bytes of everything currently shared"""
+    with _LOCK:
+        rasters = [raster for raster in _RASTERS.values() if raster is not None]
+        return {
+            'files': len(_FILES),
+            'file_bytes': sum(len(data) for data in _FILES.values()),
+            'rasters': len(rasters),
+            'raster_bytes': sum(raster.nbytes for raster in rasters),
+            'mapped_rasters': sum(1 for raster in rasters if getattr(raster, 'filename', None)),
+            'case_stores': len(_STORES),
+            'case_store_bytes': sum(store.nbytes for store in _STORES.values()),
+            'case_indexes': len(_INDEXES),
+        }
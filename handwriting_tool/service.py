@@ -0,0 +1,385 @@
+"""Local HTTP render service: one case JSON in, its filled PDF out - no Streamlit dependency
+
+    python -m handwriting_tool serve --template empty_form.pdf --positions positions.json --port 8750
+    curl -s --data @case.json http://127.0.0.1:8750/render -o case.pdf
+    curl -s http://127.0.0.1:8750/metrics
+
+POST /render takes one case, in the export format of a cases file or
+already normalized, and answers with the same PDF bytes generate_batch and
+the app produce for it. GET /metrics reports request latency percentiles
+(end to end, waiting in the queue, rendering) with batch sizes and counts
+as JSON, or as Prometheus text with ?format=prometheus. GET /health
+answers once the workers are warm.
+
+Workers compile the template, register the font and take the positions
+once when they start (batch.init_worker) and render one warm-up case
+before the first request is accepted. Requests that arrive together are
+micro-batched: the dispatcher takes the oldest queued request, waits until
+a worker is free, then adds whatever else is queued by then (never more
+than max_batch) and sends them to that worker as one task. Under load the
+batch fills from the backlog, so a lone request is never held back; a
+batch_wait above 0 also holds each batch that long for late arrivals.
+With one worker the cases are rendered in this process, as
+generate_batch does.
+"""
+import concurrent.futures
+import json
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+from .backends import DEFAULT_BACKEND
+from .batch import init_worker, render_many_in_worker, default_workers
+from .cases import normalize_case
+from .metrics import METRIC_PREFIX, PERCENTILES, percentiles
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_WAIT = 0.0
+
+# Requests waiting for a worker beyond this are refused with 503
+DEFAULT_MAX_QUEUE = 256
+# Seconds a request may wait for its PDF before it is answered with 504
+DEFAULT_TIMEOUT = 60.0
+# Largest accepted request body
+MAX_BODY_BYTES = 1024 * 1024
+# Latest samples the percentiles are taken over
+LATENCY_WINDOW = 10000
+
+LATENCY_KINDS = ("total", "queue", "render")
+
+# Rendered by every worker before the service accepts requests
+WARMUP_CASE = {
+    "Date": "2025-01-01",
+    "Age & Gender": "40 year old female",
+    "Main theme of the case": "Warm-up",
+    "Case Summary": "Warm-up render of the template, font and layout.",
+    "Self Reflection": "Did well: warm. Needs work: none. Plan: serve",
+    "EPA tested": [1],
+    "Rubric": ["Level C"],
+}
+
+_FILENAME_UNSAFE = re.compile(r'[^\w.-]')
+
+
+class ServiceStats:
+    """Request counts, batch sizes and recent latencies of a running service"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = {kind: deque(maxlen=window) for kind in LATENCY_KINDS}
+        self.requests = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_cases = 0
+        self.largest_batch = 0
+        self.started = time.time()
+
+    def add_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batched_cases += size
+            self.largest_batch = max(self.largest_batch, size)
+
+    def add_request(self, total, waited=None, rendered=None, failed=False):
+        """Record one answered render request, its times in seconds"""
+        with self._lock:
+            self.requests += 1
+            self.failed += failed
+            for kind, seconds in zip(LATENCY_KINDS, (total, waited, rendered)):
+                if seconds is not None:
+                    self._latencies[kind].append(seconds)
+
+    def add_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def summary(self, queued=0):
+        """Plain dict served by GET /metrics; latencies in milliseconds"""
+        with self._lock:
+            latencies = {kind: list(samples) for kind, samples in self._latencies.items()}
+            summary = {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queued": queued,
+                "batches": self.batches,
+                "mean_batch": round(self.batched_cases / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+            }
+        summary["latency_ms"] = {
+            kind: dict(
+                {name: round(value * 1000, 2) for name, value in percentiles(samples).items() if value is not None},
+                count=len(samples),
+                mean=round(sum(samples) * 1000 / len(samples), 2) if samples else None,
+            )
+            for kind, samples in latencies.items()
+        }
+        return summary
+
+
+def to_prometheus(summary, prefix=METRIC_PREFIX):
+    """Prometheus text exposition of a ServiceStats summary"""
+    lines = [
+        f"# HELP {prefix}_service_latency_seconds Render request latency over the latest requests",
+        f"# TYPE {prefix}_service_latency_seconds summary",
+    ]
+    for kind, latency in summary["latency_ms"].items():
+        for point in PERCENTILES:
+            value = latency.get(f"p{point}")
+            if value is not None:
+                lines.append(f'{prefix}_service_latency_seconds{{kind="{kind}",quantile="{point / 100}"}} {value / 1000}')
+        lines.append(f'{prefix}_service_latency_seconds_count{{kind="{kind}"}} {latency["count"]}')
+
+    counters = (
+        ("requests", "counter", "Render requests answered"),
+        ("failed", "counter", "Render requests whose case failed to render"),
+        ("rejected", "counter", "Render requests refused because the queue was full"),
+        ("batches", "counter", "Micro-batches sent to the workers"),
+        ("queued", "gauge", "Render requests waiting for a worker"),
+        ("mean_batch", "gauge", "Mean cases per micro-batch"),
+        ("largest_batch", "gauge", "Largest micro-batch so far"),
+    )
+    for name, kind, help_text in counters:
+        value = summary[name]
+        if value is None:
+            continue
+        lines += [
+            f"# HELP {prefix}_service_{name} {help_text}",
+            f"# TYPE {prefix}_service_{name} {kind}",
+            f"{prefix}_service_{name} {value}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+class RenderService:
+    """Warm render workers fed micro-batches of queued cases
+
+    render() may be called from any number of threads; each call blocks
+    until its case is rendered and returns its batch.BatchResult.
+    """
+
+    def __init__(self, pdf_bytes, font_bytes, saved_specs, workers=None, backend=DEFAULT_BACKEND,
+                 max_batch=DEFAULT_MAX_BATCH, batch_wait=DEFAULT_BATCH_WAIT, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = default_workers() if workers is None else max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.batch_wait = max(0.0, batch_wait)
+        self.stats = ServiceStats()
+        self._initargs = (pdf_bytes, font_bytes, saved_specs, backend)
+        self._queue = queue.Queue(max_queue)
+        # One batch in flight per worker; later requests wait in the queue and batch up
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._ids = count()
+        self._executor = None
+        self._dispatcher = None
+
+    def start(self):
+        """Start the workers, render the warm-up case on each and begin dispatching"""
+        if self.workers == 1:
+            self._executor = ThreadPoolExecutor(1, initializer=init_worker, initargs=self._initargs)
+        else:
+            import multiprocessing
+
+            # spawn keeps workers clear of the threads of the host process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=self._initargs,
+            )
+        warmup = [(0, normalize_case(WARMUP_CASE, False))]
+        # Submitted together, so every worker process is started for one of them
+        for future in [self._executor.submit(render_many_in_worker, warmup) for _ in range(self.workers)]:
+            result = future.result()[0]
+            if result.error:
+                raise RuntimeError(f"warm-up render failed: {result.error}")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="render-dispatcher", daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def close(self):
+        """Stop dispatching and shut the workers down; queued requests are failed"""
+        if self._dispatcher is not None:
+            self._queue.put(None)
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def render(self, case, timeout=DEFAULT_TIMEOUT):
+        """BatchResult of one normalized case
+
+        Raises queue.Full when too many requests are already waiting and
+        concurrent.futures.TimeoutError when the PDF is not ready within
+        timeout seconds.
+        """
+        request = Future()
+        start = time.perf_counter()
+        try:
+            self._queue.put_nowait((next(self._ids), case, request, start))
+        except queue.Full:
+            self.stats.add_rejected()
+            raise
+        result, waited = request.result(timeout)
+        rendered = sum(result.stages.values()) if result.stages else None
+        self.stats.add_request(time.perf_counter() - start, waited, rendered, failed=result.error is not None)
+        return result
+
+    def _dispatch(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            self._slots.acquire()
+            batch = [first]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._send(batch)
+
+        # Whatever is still queued will never be rendered
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("render service stopped"))
+
+    def _send(self, batch):
+        self.stats.add_batch(len(batch))
+        sent = time.perf_counter()
+        try:
+            future = self._executor.submit(render_many_in_worker, [item[:2] for item in batch])
+        except RuntimeError as e:
+            self._slots.release()
+            for item in batch:
+                item[2].set_exception(e)
+            return
+        future.add_done_callback(lambda done: self._finish(done, batch, sent))
+
+    def _finish(self, done, batch, sent):
+        self._slots.release()
+        error = done.exception()
+        results = done.result() if error is None else [None] * len(batch)
+        for (_, _, request, enqueued), result in zip(batch, results):
+            if error is not None:
+                request.set_exception(error)
+            else:
+                # A request stops waiting when its batch is sent
+                request.set_result((result, sent - enqueued))
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    """POST /render, GET /metrics and GET /health of one RenderService"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "handwriting_tool"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        service = self.server.service
+        if url.path == '/health':
+            self._send_json(200, {"status": "ok", "workers": service.workers, "queued": service.queued})
+        elif url.path == '/metrics':
+            summary = service.stats.summary(service.queued)
+            if parse_qs(url.query).get('format') == ['prometheus']:
+                self._send(200, "text/plain; version=0.0.4", to_prometheus(summary).encode())
+            else:
+                self._send_json(200, summary)
+        else:
+            self._send_json(404, {"error": f"no such path: {url.path}"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/render':
+            # The body is left unread, so it must not be taken for the next request
+            self.close_connection = True
+            return self._send_json(404, {"error": f"no such path: {self.path}"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._send_json(413 if length > MAX_BODY_BYTES else 411,
+                                   {"error": f"send one case as JSON of at most {MAX_BODY_BYTES} bytes"})
+        try:
+            case = normalize_case(json.loads(self.rfile.read(length)), False)
+        except Exception as e:
+            return self._send_json(400, {"error": f"invalid case: {str(e)[:200]}"})
+        if case is None:
+            return self._send_json(400, {"error": "the request body must be one case object"})
+
+        try:
+            result = self.server.service.render(case)
+        except queue.Full:
+            return self._send_json(503, {"error": "too many requests waiting"})
+        except concurrent.futures.TimeoutError:
+            return self._send_json(504, {"error": "render timed out"})
+        except Exception as e:
+            return self._send_json(500, {"error": f"render failed: {str(e)[:200]}"})
+        if result.error:
+            return self._send_json(422, {"error": result.error})
+
+        filename = _FILENAME_UNSAFE.sub('_', str(result.case_id))
+        render_ms = sum(result.stages.values()) * 1000 if result.stages else 0.0
+        self._send(200, "application/pdf", result.pdf, {
+            "Content-Disposition": f'inline; filename="{filename}_filled.pdf"',
+            "X-Render-Ms": f"{render_ms:.2f}",
+        })
+
+    def _send_json(self, status, payload):
+        self._send(status, "application/json", json.dumps(payload).encode())
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _RenderServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets connections from a burst of clients
+    request_queue_size = 128
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """HTTP server answering requests with a started RenderService; port 0 picks a free one"""
+    server = _RenderServer((host, port), _RenderHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
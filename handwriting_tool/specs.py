@@ -0,0 +1,78 @@
+"""Field positions (inches) and font sizes for the two form pages
+
+A field spec may also carry "fit": true, which shrinks that field's text
+per case until it fits the box (layout.fitted_font_size); "font" is then
+the largest size used.
+"""
+import copy
+import json
+
+# Default field specifications with UPDATED PAGE 2 FONT SIZES
+DEFAULT_SPECS = {
+    "page1": {
+        # PAGE 1 FONT SIZES UNCHANGED AS REQUESTED
+        "date": {"x": 1.5, "y": 2.6, "w": 2.5, "h": 0.25, "font": 20},
+        "age_gender": {"x": 2.2, "y": 3.0, "w": 3.0, "h": 0.25, "font": 16.1},
+        "main_theme": {"x": 1.2, "y": 3.6, "w": 6.5, "h": 0.4, "font": 21},
+        "case_summary": {"x": 0.8, "y": 4.3, "w": 7.0, "h": 1.5, "font": 18},
+        "self_reflection_upper": {"x": 0.8, "y": 6.2, "w": 7.0, "h": 0.6, "font": 15},
+        "self_reflection_lower": {"x": 0.8, "y": 7.0, "w": 7.0, "h": 1.0, "font": 15},
+        "signature_mi": {"x": 0.8, "y": 9.8, "w": 3.0, "h": 0.3, "font": 24}
+    },
+    "page2": {
+        # UPDATED PAGE 2 FONT SIZES AS SPECIFIED
+        "epa_row1": {"x": 0.6, "y": 1.8, "w": 1.8, "h": 0.35, "font": 32},
+        "epa_row2": {"x": 0.6, "y": 2.4, "w": 1.8, "h": 0.35, "font": 32},
+        "epa_row3": {"x": 0.6, "y": 3.0, "w": 1.8, "h": 0.35, "font": 32},
+        "epa_row4": {"x": 0.6, "y": 3.6, "w": 1.8, "h": 0.35, "font": 32},
+        "rubric_row1": {"x": 2.5, "y": 1.8, "w": 1.5, "h": 0.35, "font": 24},
+        "rubric_row2": {"x": 2.5, "y": 2.4, "w": 1.5, "h": 0.35, "font": 24},
+        "rubric_row3": {"x": 2.5, "y": 3.0, "w": 1.5, "h": 0.35, "font": 24},
+        "rubric_row4": {"x": 2.5, "y": 3.6, "w": 1.5, "h": 0.35, "font": 24},
+        "strength_row1": {"x": 4.1, "y": 1.8, "w": 1.8, "h": 0.35, "font": 16},
+        "strength_row2": {"x": 4.1, "y": 2.4, "w": 1.8, "h": 0.35, "font": 16},
+        "strength_row3": {"x": 4.1, "y": 3.0, "w": 1.8, "h": 0.35, "font": 16},
+        "strength_row4": {"x": 4.1, "y": 3.6, "w": 1.8, "h": 0.35, "font": 16},
+        "improve_row1": {"x": 6.0, "y": 1.8, "w": 1.8, "h": 0.35, "font": 16},
+        "improve_row2": {"x": 6.0, "y": 2.4, "w": 1.8, "h": 0.35, "font": 16},
+        "improve_row3": {"x": 6.0, "y": 3.0, "w": 1.8, "h": 0.35, "font": 16},
+        "improve_row4": {"x": 6.0, "y": 3.6, "w": 1.8, "h": 0.35, "font": 16}
+    }
+}
+
+
+def load_positions(path):
+    """Read saved positions from a JSON file shaped like DEFAULT_SPECS
+
+    Pages or fields missing from the file keep their default values.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        loaded = json.load(f)
+
+    positions = copy.deepcopy(DEFAULT_SPECS)
+    for page_key, fields in loaded.items():
+        if page_key not in positions or not isinstance(fields, dict):
+            continue
+        for field_name, spec in fields.items():
+            if field_name in positions[page_key] and isinstance(spec, dict):
+                positions[page_key][field_name].update(
+                    {k: float(v) for k, v in spec.items() if k in ('x', 'y', 'w', 'h', 'font')}
+                )
+                if 'fit' in spec:
+                    positions[page_key][field_name]['fit'] = bool(spec['fit'])
+    return positions
+
+
+def with_auto_fit(positions, field_names):
+    """Copy of positions with auto-fit switched on for these fields ('all' for every field)"""
+    positions = copy.deepcopy(positions)
+    known = {field_name: spec for fields in positions.values() for field_name, spec in fields.items()}
+    for field_name in field_names:
+        if field_name == 'all':
+            for spec in known.values():
+                spec['fit'] = True
+        elif field_name in known:
+            known[field_name]['fit'] = True
+        else:
+            raise ValueError(f"Unknown field '{field_name}'")
+    return positions
@@ -0,0 +1,401 @@
+"""Compact read-only store of normalized cases
+
+Cases are kept column by column instead of as one nested dict each:
+
+- free text (summaries, reflections, themes, strength points) is UTF-8 in
+  one growing buffer per column with an offsets array
+- repeated values (dates, age and gender, the MI signature, "EPA 3",
+  "Level C") are interned: stored once, referenced by a small integer code
+- the four page 2 lists are flattened into one column each, with offsets
+
+store[i] and iteration hand out freshly built case dicts in the normalized
+format, so the renderer, cache keys and workers see exactly what
+transform_case_format produced and callers can never modify the store.
+Cases that do not follow the normalized layout are kept as they are.
+"""
+import os
+from array import array
+from itertools import accumulate, chain, islice, repeat
+from .cases import MISSING, case_dicts, has_missing
+from .ingest import CaseFile
+
+# Normalized case layout: top-level values, then the two nested dicts
+TEXT_FIELDS = ('case_id', 'main_theme', 'case_summary')
+INTERNED_FIELDS = ('date', 'age_gender', 'age', 'gender', 'signature_mi')
+REFLECTION_FIELDS = ('what_did_right', 'needs_development')
+# epa_assessment list -> True when its items are free text
+EPA_FIELDS = (
+    ('epa_tested', False),
+    ('rubric_levels', False),
+    ('strength_points', True),
+    ('points_needing_improvement', True),
+)
+
+# Key order of transform_case_format output
+_CASE_ORDER = ('date', 'age_gender', 'age', 'gender', 'main_theme', 'case_summary', 'signature_mi',
+               'self_reflection', 'epa_assessment', 'case_id')
+_SCALARS = TEXT_FIELDS + INTERNED_FIELDS
+_EPA_NAMES = tuple(name for name, _ in EPA_FIELDS)
+
+# Value types the columns hold; MISSING is an object
+_TEXT_TYPES = {str, object}
+_SCALAR_TYPES = {str, int, float, bool, type(None), object}
+
+# Bit per optional key in a case's presence mask
+_BITS = {name: 1 << bit for bit, name in enumerate(
+    _SCALARS + ('self_reflection', 'epa_assessment') + REFLECTION_FIELDS + _EPA_NAMES
+)}
+
+
+class _TextColumn:
+    """Strings stored back to back as UTF-8"""
+
+    __slots__ = ('data', 'ends')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array('Q')
+
+    def append(self, text):
+        self.data += text.encode('utf-8', 'surrogatepass')
+        self.ends.append(len(self.data))
+
+    def extend(self, texts):
+        encoded = list(map(str.encode, texts, repeat('utf-8'), repeat('surrogatepass')))
+        self.ends.extend(islice(accumulate(map(len, encoded), initial=len(self.data)), 1, None))
+        self.data += b''.join(encoded)
+
+    def __getitem__(self, index):
+        start = self.ends[index - 1] if index else 0
+        return self.data[start:self.ends[index]].decode('utf-8', 'surrogatepass')
+
+    def __iter__(self):
+        data = self.data
+        start = 0
+        for end in self.ends:
+            yield data[start:end].decode('utf-8', 'surrogatepass')
+            start = end
+
+    def __len__(self):
+        return len(self.ends)
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.ends.itemsize * len(self.ends)
+
+
+class _InternedColumn:
+    """Small integer codes into a table of distinct values"""
+
+    __slots__ = ('codes', 'values', '_index')
+
+    def __init__(self, values, index):
+        self.codes = array('I')
+        self.values = values
+        self._index = index
+
+    def append(self, value):
+        # bool and int compare equal, so keep the type in the key
+        key = (type(value), value)
+        code = self._index.get(key)
+        if code is None:
+            code = self._index[key] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def extend(self, values):
+        keys = list(zip(map(type, values), values))
+        index = self._index
+        # New values get codes in order of first appearance, as append gives them
+        for key in dict.fromkeys(keys):
+            if key not in index:
+                index[key] = len(self.values)
+                self.values.append(key[1])
+        self.codes.extend(map(index.__getitem__, keys))
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes)
+
+
+class _ListColumn:
+    """One list per case, flattened into a single column with start offsets"""
+
+    __slots__ = ('items', 'starts')
+
+    def __init__(self, items):
+        self.items = items
+        self.starts = array('I', [0])
+
+    def append(self, values):
+        for value in values:
+            self.items.append(value)
+        self.starts.append(len(self.items))
+
+    def extend(self, lists):
+        self.items.extend(list(chain.from_iterable(lists)))
+        self.starts.extend(islice(accumulate(map(len, lists), initial=self.starts[-1]), 1, None))
+
+    def __getitem__(self, index):
+        items = self.items
+        return [items[i] for i in range(self.starts[index], self.starts[index + 1])]
+
+    def __iter__(self):
+        items = list(self.items)
+        starts = self.starts
+        return map(items.__getitem__, map(slice, starts[:-1], starts[1:]))
+
+    @property
+    def nbytes(self):
+        return self.items.nbytes + self.starts.itemsize * len(self.starts)
+
+
+def _is_normalized(case):
+    """Whether a case dict uses only the normalized layout the columns hold"""
+    for key, value in case.items():
+        if key in TEXT_FIELDS:
+            if not isinstance(value, str):
+                return False
+        elif key in INTERNED_FIELDS:
+            if not isinstance(value, (str, int, float, bool, type(None))):
+                return False
+        elif key == 'self_reflection':
+            if not isinstance(value, dict) or any(
+                k not in REFLECTION_FIELDS or not isinstance(v, str) for k, v in value.items()
+            ):
+                return False
+        elif key == 'epa_assessment':
+            if not isinstance(value, dict):
+                return False
+            for name, is_text in EPA_FIELDS:
+                items = value.get(name, [])
+                if not isinstance(items, list):
+                    return False
+                if is_text and not all(isinstance(item, str) for item in items):
+                    return False
+                if not is_text and not all(isinstance(item, (str, int, float, bool, type(None))) for item in items):
+                    return False
+            if any(k not in _EPA_NAMES for k in value):
+                return False
+        else:
+            return False
+    return list(case) == [key for key in _CASE_ORDER if key in case]
+
+
+class CaseStore:
+    """Columnar, read-only collection of normalized cases
+
+    Build it with CaseStore.from_cases() or load_case_store(); afterwards it
+    is only read, so one instance can serve every session.
+    """
+
+    def __init__(self):
+        interned = []
+        index = {}
+        self._masks = array('H')
+        self._text = {name: _TextColumn() for name in TEXT_FIELDS + REFLECTION_FIELDS}
+        # Interned columns share one value table: "EPA 3" or a date is stored once in total
+        self._interned = {name: _InternedColumn(interned, index) for name in INTERNED_FIELDS}
+        self._lists = {
+            name: _ListColumn(_TextColumn() if is_text else _InternedColumn(interned, index))
+            for name, is_text in EPA_FIELDS
+        }
+        # Position -> entry kept as is because it is not in the normalized layout
+        self._raw = {}
+        self.errors = []
+
+    @classmethod
+    def from_cases(cls, cases, errors=None):
+        """Store every entry of an iterable of normalized cases, in order"""
+        store = cls()
+        for case in cases:
+            store._append(case)
+        store.errors = list(errors or [])
+        return store
+
+    @classmethod
+    def from_batches(cls, batches, errors=None):
+        """Store the (columns, cases) batches of normalize_batches() or CaseFile.batches(), in order
+
+        Column batches go into the columns directly, without a dict per case.
+        """
+        store = cls()
+        for columns, cases in batches:
+            if cases is None and store._extend(columns):
+                continue
+            for case in case_dicts(columns) if cases is None else cases:
+                store._append(case)
+        store.errors = list(errors or [])
+        return store
+
+    def _extend(self, columns):
+        """Append the cases of case_columns() columns at once; False when a value needs _append"""
+        epa = {name: [() if items is MISSING else items for items in columns[name]] for name in _EPA_NAMES}
+        if not (
+            all(_types(columns[name]) <= _TEXT_TYPES for name in TEXT_FIELDS + REFLECTION_FIELDS)
+            and all(_types(columns[name]) <= _SCALAR_TYPES for name in INTERNED_FIELDS)
+            and all(_types(chain.from_iterable(epa[name])) <= (_TEXT_TYPES if is_text else _SCALAR_TYPES)
+                    for name, is_text in EPA_FIELDS)
+        ):
+            return False
+
+        # Presence masks: one bit per key, set in bulk for keys every case has
+        presence = {name: columns[name] for name in _SCALARS + REFLECTION_FIELDS + _EPA_NAMES}
+        presence['self_reflection'] = columns['what_did_right']
+        masks = [_BITS['epa_assessment']] * len(columns['case_id'])
+        for name, column in presence.items():
+            if not has_missing(column):
+                masks = [mask | _BITS[name] for mask in masks]
+            else:
+                masks = [mask if value is MISSING else mask | _BITS[name] for mask, value in zip(masks, column)]
+
+        for name in TEXT_FIELDS + REFLECTION_FIELDS:
+            self._text[name].extend(_filled(columns[name], ''))
+        for name in INTERNED_FIELDS:
+            self._interned[name].extend(_filled(columns[name], None))
+        for name in _EPA_NAMES:
+            self._lists[name].extend(epa[name])
+        self._masks.extend(masks)
+        return True
+
+    def _append(self, case):
+        index = len(self._masks)
+        if isinstance(case, dict) and _is_normalized(case):
+            reflection = case.get('self_reflection')
+            epa = case.get('epa_assessment')
+            names = [name for name in _SCALARS if name in case]
+            if reflection is not None:
+                names += ['self_reflection'] + [name for name in REFLECTION_FIELDS if name in reflection]
+            if epa is not None:
+                names += ['epa_assessment'] + [name for name in _EPA_NAMES if name in epa]
+            mask = sum(_BITS[name] for name in names)
+        else:
+            self._raw[index] = case
+            case, reflection, epa, mask = {}, None, None, 0
+
+        # Every column gets a slot for every case, so positions line up
+        for name in TEXT_FIELDS:
+            self._text[name].append(case.get(name, ''))
+        for name in INTERNED_FIELDS:
+            self._interned[name].append(case.get(name))
+        for name in REFLECTION_FIELDS:
+            self._text[name].append((reflection or {}).get(name, ''))
+        for name in _EPA_NAMES:
+            self._lists[name].append((epa or {}).get(name, ()))
+        self._masks.append(mask)
+
+    def __len__(self):
+        return len(self._masks)
+
+    def __getitem__(self, index):
+        """The case at index as a new normalized dict"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("case index out of range")
+        if index in self._raw:
+            return _copy(self._raw[index])
+
+        mask = self._masks[index]
+        case = {}
+        for name in _CASE_ORDER:
+            if not mask & _BITS[name]:
+                continue
+            if name == 'self_reflection':
+                case[name] = {k: self._text[k][index] for k in REFLECTION_FIELDS if mask & _BITS[k]}
+            elif name == 'epa_assessment':
+                case[name] = {k: self._lists[k][index] for k in _EPA_NAMES if mask & _BITS[k]}
+            elif name in self._text:
+                case[name] = self._text[name][index]
+            else:
+                case[name] = self._interned[name][index]
+        return case
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def value(self, index, name, default=None):
+        """One field of a case without building the whole dict
+
+        name is a top-level key, a self_reflection key or an epa_assessment
+        list name; default is returned when the case does not have it.
+        """
+        if index in self._raw:
+            case = self._raw[index]
+            if not isinstance(case, dict):
+                return default
+            if name in _EPA_NAMES:
+                case = case.get('epa_assessment')
+            elif name in REFLECTION_FIELDS:
+                case = case.get('self_reflection')
+            return _copy(case.get(name, default)) if isinstance(case, dict) else default
+        if name not in _BITS or not self._masks[index] & _BITS[name]:
+            return default
+        if name in self._text:
+            return self._text[name][index]
+        if name in self._interned:
+            return self._interned[name][index]
+        if name in self._lists:
+            return self._lists[name][index]
+        return self[index][name]
+
+    def column(self, name, default=None):
+        """One field of every case, in order, like value() for each; much faster than calling it per case"""
+        if name in self._text:
+            values = list(self._text[name])
+        elif name in self._interned:
+            values = list(self._interned[name])
+        elif name in self._lists:
+            values = list(self._lists[name])
+        else:
+            return [self.value(index, name, default) for index in range(len(self))]
+        bit = _BITS[name]
+        if not all(mask & bit for mask in self._masks):
+            values = [value if mask & bit else default for value, mask in zip(values, self._masks)]
+        for index in self._raw:
+            values[index] = self.value(index, name, default)
+        return values
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column buffers, excluding the shared interned values"""
+        columns = list(self._text.values()) + list(self._interned.values()) + list(self._lists.values())
+        return sum(column.nbytes for column in columns) + self._masks.itemsize * len(self._masks)
+
+
+def _types(values):
+    return set(map(type, values))
+
+
+def _filled(column, default):
+    """column with default in place of MISSING"""
+    if not has_missing(column):
+        return column
+    return [default if value is MISSING else value for value in column]
+
+
+def _copy(case):
+    """Copy of a stored-as-is case, so callers cannot change the store"""
+    if isinstance(case, dict):
+        return {key: _copy(value) for key, value in case.items()}
+    if isinstance(case, list):
+        return [_copy(value) for value in case]
+    return case
+
+
+def load_case_store(path, source_name=None):
+    """Read a case file (any format CaseFile streams) into a CaseStore"""
+    cases = CaseFile(path, source_name or os.path.basename(path))
+    store = CaseStore.from_batches(cases.batches())
+    store.errors = list(cases.errors)
+    return store
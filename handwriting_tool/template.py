@@ -0,0 +1,157 @@
+"""Compiled blank form shared by every case in a batch"""
+import hashlib
+import threading
+from io import BytesIO
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+    StreamObject,
+)
+
+# Compiled templates per content hash - shared by every session in the process
+_TEMPLATE_CACHE = {}
+_TEMPLATE_CACHE_LIMIT = 4
+_CACHE_LOCK = threading.Lock()
+
+
+def template_hash(pdf_bytes):
+    """Content hash used to key compiled templates"""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _raw_stream(data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+class CompiledTemplate:
+    """Blank PDF parsed once: page geometry, page objects and resources"""
+
+    def __init__(self, pdf_bytes):
+        self.digest = template_hash(pdf_bytes)
+        self.reader = PdfReader(BytesIO(pdf_bytes))
+        self.pages = list(self.reader.pages)
+        first_page = self.pages[0]
+        self.page_width = float(first_page.mediabox.width)
+        self.page_height = float(first_page.mediabox.height)
+        self.resources = [page.get('/Resources') for page in self.pages]
+        self.page_count = len(self.pages)
+        # Reader objects are resolved lazily, so cloning pages must not race
+        self._lock = threading.Lock()
+
+    def merge(self, overlay_bytes, stages=None):
+        """Stamp a per-case overlay PDF onto fresh copies of the template pages
+
+        stages, a metrics.StageTimes, collects the merge and write times.
+        """
+        overlay_pdf = PdfReader(BytesIO(overlay_bytes))
+        writer = PdfWriter()
+        shared = {}
+
+        for page_num, page in enumerate(self.add_pages(writer)):
+            if page_num < len(overlay_pdf.pages):
+                self.stamp(writer, page, overlay_pdf.pages[page_num], page_num + 1, shared)
+        if stages is not None:
+            stages.lap('merge')
+
+        output_buffer = BytesIO()
+        writer.write(output_buffer)
+        if stages is not None:
+            stages.lap('write')
+        return output_buffer.getvalue()
+
+    def add_pages(self, writer):
+        """Append one copy of every template page to writer and return the new pages
+
+        Copies added to the same writer share the template content streams,
+        images and fonts by reference; only the page dictionary is new.
+        """
+        with self._lock:
+            return [writer.add_page(page) for page in self.pages]
+
+    def stamp(self, writer, page, overlay_page, page_num, shared):
+        """Draw the overlay page as a Form XObject on top of the template content
+
+        The template content streams are referenced untouched instead of being
+        decoded and re-serialized the way PageObject.merge_page does. shared
+        caches the small wrapper streams so every page of a writer reuses them.
+        """
+        form = self._overlay_form(writer, overlay_page)
+        if form is None:
+            return
+        form_ref = writer._add_object(form)
+
+        # Fresh resource dicts per page - the template's may be shared by other copies
+        resources = DictionaryObject()
+        if '/Resources' in page:
+            resources.update(page['/Resources'].get_object())
+        xobjects = DictionaryObject()
+        if '/XObject' in resources:
+            xobjects.update(resources['/XObject'].get_object())
+
+        form_name = f"/HWOverlay{page_num}"
+        while form_name in xobjects:
+            form_name += "_"
+        xobjects[NameObject(form_name)] = form_ref
+        resources[NameObject('/XObject')] = xobjects
+        page[NameObject('/Resources')] = resources
+
+        contents = []
+        if '/Contents' in page:
+            original = page.raw_get('/Contents')
+            if isinstance(original.get_object(), ArrayObject):
+                contents.extend(original.get_object())
+            else:
+                contents.append(original)
+
+        # Isolate template graphics state, then paint the overlay in page space
+        if 'push' not in shared:
+            shared['push'] = writer._add_object(_raw_stream(b"q\n"))
+        if form_name not in shared:
+            shared[form_name] = writer._add_object(_raw_stream(f"Q\nq {form_name} Do Q\n".encode()))
+        new_contents = ArrayObject([shared['push']])
+        new_contents.extend(contents)
+        new_contents.append(shared[form_name])
+        page[NameObject('/Contents')] = new_contents
+
+    @staticmethod
+    def _overlay_form(writer, overlay_page):
+        if '/Contents' not in overlay_page:
+            return None
+        contents = overlay_page['/Contents'].get_object()
+
+        if isinstance(contents, ArrayObject):
+            form = _raw_stream(b"\n".join(part.get_object().get_data() for part in contents))
+        else:
+            form = StreamObject()
+            form._data = contents._data
+            for key, value in contents.items():
+                if key != '/Length':
+                    form[NameObject(key)] = value
+
+        form[NameObject('/Type')] = NameObject('/XObject')
+        form[NameObject('/Subtype')] = NameObject('/Form')
+        form[NameObject('/BBox')] = ArrayObject(
+            [FloatObject(float(v)) for v in overlay_page.mediabox]
+        )
+        if '/Resources' in overlay_page:
+            form[NameObject('/Resources')] = overlay_page.raw_get('/Resources').clone(writer)
+        return form
+
+
+def get_compiled_template(pdf_bytes):
+    """Return the process-wide compiled template for these PDF bytes"""
+    digest = template_hash(pdf_bytes)
+    with _CACHE_LOCK:
+        template = _TEMPLATE_CACHE.get(digest)
+        if template is None:
+            template = CompiledTemplate(pdf_bytes)
+            if len(_TEMPLATE_CACHE) >= _TEMPLATE_CACHE_LIMIT:
+                _TEMPLATE_CACHE.pop(next(iter(_TEMPLATE_CACHE)))
+            _TEMPLATE_CACHE[digest] = template
+        return template